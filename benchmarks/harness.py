@@ -0,0 +1,132 @@
+"""Boot the aggregate app from a config.yaml for benchmarking, in-process or as a subprocess."""
+
+import copy
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import yaml
+
+from common.config_loader import load_config
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+SCHEMA_PATH = REPO_ROOT / "src" / "app" / "config_schema.yaml"
+HOST = "127.0.0.1"
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def prepare_config(config: dict, app_name: str, port: int, data_dir: Path) -> dict:
+    """
+    A launch config running only `app_name` on `port` with fresh SQLite databases in `data_dir`,
+    cross service urls (e.g. the user service's pet_service_url) are rewritten to that port.
+    """
+    config = copy.deepcopy(config)
+    app_config = config["apps"][app_name]
+    config["apps"] = {app_name: app_config}
+    app_config["host"] = HOST
+    app_config["port"] = port
+    app_config.pop("reload", None)
+    sub_apps = app_config.get("sub_apps", {})
+    paths = {name: sub_app.get("path", "") for name, sub_app in sub_apps.items()}
+    for name, sub_app in sub_apps.items():
+        kwargs = sub_app.setdefault("kwargs", {})
+        if "database_url" in kwargs:
+            kwargs["database_url"] = f"sqlite:///{data_dir / f'{name}.db'}"
+        for key in list(kwargs):
+            service = key.removesuffix("_url")
+            if key.endswith("_url") and service in paths:
+                kwargs[key] = f"http://{HOST}:{port}{paths[service]}"
+    return config
+
+
+def wait_until_healthy(base_url: str, timeout: float = 30.0, process=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"App exited with code {process.returncode} during startup")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise TimeoutError(f"App at {base_url} did not become healthy in {timeout}s")
+
+
+class BenchmarkApp:
+    """
+    Context manager running one app of a launch config, `base_url` is where it listens.
+
+    :param in_process: run the uvicorn server on a thread of this process instead of a
+        subprocess, simpler to debug but the load generator then competes for the GIL.
+    """
+
+    def __init__(
+        self, config_path: str | Path, data_dir: Path, app_name: str = "app", in_process=False
+    ):
+        self.config_path = Path(config_path)
+        self.data_dir = data_dir
+        self.app_name = app_name
+        self.in_process = in_process
+        self.port = free_port()
+        self.base_url = f"http://{HOST}:{self.port}"
+        self._process: subprocess.Popen | None = None
+        self._server = None
+        self._thread: threading.Thread | None = None
+
+    def __enter__(self):
+        config = load_config(self.config_path, SCHEMA_PATH)
+        config = prepare_config(config, self.app_name, self.port, self.data_dir)
+        app_config = config["apps"][self.app_name]
+        if "log_config" in app_config:
+            app_config["log_config"] = str(self.config_path.parent / app_config["log_config"])
+        # the file handlers of log_config.json write to ./logs
+        (REPO_ROOT / "logs" if not self.in_process else Path("logs")).mkdir(exist_ok=True)
+        if self.in_process:
+            self._start_in_process(config)
+        else:
+            self._start_subprocess(config)
+        return self
+
+    def _start_in_process(self, config: dict):
+        from app.main import create_server_and_config_from_config
+
+        _, self._server = create_server_and_config_from_config(
+            self.app_name, config["apps"][self.app_name]
+        )
+        self._thread = threading.Thread(target=self._server.run, name="benchmark-app")
+        self._thread.start()
+        wait_until_healthy(self.base_url)
+
+    def _start_subprocess(self, config: dict):
+        config_file = self.data_dir / "config.yaml"
+        config_file.write_text(yaml.safe_dump(config))
+        env = dict(os.environ)
+        env["PYTHONPATH"] = os.pathsep.join(
+            filter(None, [str(REPO_ROOT / "src"), env.get("PYTHONPATH")])
+        )
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "app", "--config", str(config_file)], cwd=REPO_ROOT, env=env
+        )
+        wait_until_healthy(self.base_url, process=self._process)
+
+    def __exit__(self, *exc_info):
+        if self._server is not None:
+            self._server.should_exit = True
+            self._thread.join()  # type: ignore
+        if self._process is not None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
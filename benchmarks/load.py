@@ -0,0 +1,283 @@
+"""
+End-to-end load test of the aggregate app.
+
+Boots the app from a config.yaml (see harness.py), seeds pets and users over HTTP and drives each
+workload at a fixed concurrency, reporting throughput and latency percentiles as JSON. Results
+depend on the machine, so no baseline is committed: record one, then compare later runs with the
+same workloads and concurrency against it:
+
+    python -m benchmarks.load --config config.yaml --concurrency 32 --output baseline.json
+    python -m benchmarks.load --config config.yaml --concurrency 32 --baseline baseline.json
+"""
+
+import asyncio
+import json
+import math
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable
+
+import click
+import httpx
+
+from .harness import REPO_ROOT, BenchmarkApp
+
+SPECIES = ("dog", "cat", "parrot", "rabbit", "hamster")
+PAGE_SIZE = 100
+
+
+@dataclass
+class Dataset:
+    pet_ids: list[int] = field(default_factory=list)
+    user_ids: list[int] = field(default_factory=list)
+
+
+Request = Callable[[httpx.AsyncClient, Dataset, random.Random], Awaitable[httpx.Response]]
+
+
+async def user_detail(client: httpx.AsyncClient, data: Dataset, rng: random.Random):
+    """Read heavy: a user with their pets, one pet service call per adopted pet."""
+    return await client.get(f"/user/{rng.choice(data.user_ids)}")
+
+
+async def adoption_burst(client: httpx.AsyncClient, data: Dataset, rng: random.Random):
+    return await client.post(f"/user/{rng.choice(data.user_ids)}/pets/{rng.choice(data.pet_ids)}")
+
+
+async def feed_storm(client: httpx.AsyncClient, data: Dataset, rng: random.Random):
+    """Writes concentrated on a few hot pets."""
+    return await client.post(f"/pet/{rng.choice(data.pet_ids[:10])}/feed")
+
+
+async def list_paging(client: httpx.AsyncClient, data: Dataset, rng: random.Random):
+    service, count = rng.choice((("pet", len(data.pet_ids)), ("user", len(data.user_ids))))
+    offset = rng.randrange(0, max(count, 1), PAGE_SIZE)
+    return await client.get(f"/{service}/", params={"offset": offset, "limit": PAGE_SIZE})
+
+
+WORKLOADS: dict[str, Request] = {
+    "user_detail": user_detail,
+    "adoption_burst": adoption_burst,
+    "feed_storm": feed_storm,
+    "list_paging": list_paging,
+}
+
+
+async def seed(client: httpx.AsyncClient, pets: int, users: int, pets_per_user: int, seed: int):
+    rng = random.Random(seed)
+    data = Dataset()
+    semaphore = asyncio.Semaphore(32)
+
+    async def post(url: str, **kwargs) -> httpx.Response:
+        async with semaphore:
+            response = await client.post(url, **kwargs)
+            response.raise_for_status()
+            return response
+
+    responses = await asyncio.gather(
+        *[
+            post(
+                "/pet/",
+                json={
+                    "name": f"pet-{i}",
+                    "species": rng.choice(SPECIES),
+                    "age": rng.randint(0, 20),
+                },
+            )
+            for i in range(pets)
+        ]
+    )
+    data.pet_ids = [response.json()["id"] for response in responses]
+    responses = await asyncio.gather(
+        *[post("/user/", json={"name": f"user-{i}"}) for i in range(users)]
+    )
+    data.user_ids = [response.json()["id"] for response in responses]
+    await asyncio.gather(
+        *[
+            post(f"/user/{user_id}/pets/{pet_id}")
+            for user_id in data.user_ids
+            for pet_id in rng.sample(data.pet_ids, min(pets_per_user, len(data.pet_ids)))
+        ]
+    )
+    return data
+
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Nearest rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(name: str, concurrency: int, elapsed: float, latencies: list[float], errors: int):
+    latencies = sorted(latencies)
+    return {
+        "workload": name,
+        "concurrency": concurrency,
+        "duration_seconds": round(elapsed, 3),
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            **{f"p{p}": round(percentile(latencies, p) * 1000, 3) for p in (50, 95, 99)},
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+    }
+
+
+async def run_workload(
+    client: httpx.AsyncClient,
+    name: str,
+    data: Dataset,
+    concurrency: int,
+    duration: float,
+    warmup: float = 1.0,
+    seed: int = 0,
+):
+    """Run `concurrency` closed loop workers for `duration` seconds after a warmup."""
+    request = WORKLOADS[name]
+    latencies: list[float] = []
+    errors = 0
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+
+    async def worker(worker_id: int):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + worker_id)
+        while (now := time.perf_counter()) < deadline:
+            try:
+                response = await request(client, data, rng)
+                failed = response.status_code >= 500
+            except httpx.HTTPError:
+                failed = True
+            if now >= measure_from:
+                latencies.append(time.perf_counter() - now)
+                errors += failed
+
+    await asyncio.gather(*[worker(i) for i in range(concurrency)])
+    return summarize(name, concurrency, time.perf_counter() - measure_from, latencies, errors)
+
+
+def compare(results: list[dict], baseline: list[dict], max_regression: float) -> list[dict]:
+    """Relative change of throughput and p99 against the baseline, flagging regressions."""
+    baseline_by_key = {(r["workload"], r["concurrency"]): r for r in baseline}
+    comparisons = []
+    for result in results:
+        base = baseline_by_key.get((result["workload"], result["concurrency"]))
+        if base is None:
+            continue
+        throughput = _change(result["throughput_rps"], base["throughput_rps"])
+        p99 = _change(result["latency_ms"]["p99"], base["latency_ms"]["p99"])
+        comparisons.append(
+            {
+                "workload": result["workload"],
+                "concurrency": result["concurrency"],
+                "throughput_change": throughput,
+                "p99_change": p99,
+                "regression": throughput < -max_regression or p99 > max_regression,
+            }
+        )
+    return comparisons
+
+
+def _change(value: float, base: float) -> float:
+    return round((value - base) / base, 4) if base else 0.0
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "commit": commit or None,
+        "time": time.time(),
+    }
+
+
+async def run(base_url: str, workloads, concurrency, duration, warmup, pets, users, pets_per_user):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+        data = await seed(client, pets, users, pets_per_user, seed=0)
+        return [
+            await run_workload(client, name, data, concurrency, duration, warmup)
+            for name in workloads
+        ]
+
+
+@click.command()
+@click.option("--config", type=click.Path(exists=True), default=str(REPO_ROOT / "config.yaml"))
+@click.option("--app", "app_name", default="app", help="App of the config to benchmark.")
+@click.option("--in-process", is_flag=True, help="Run the server on a thread of this process.")
+@click.option(
+    "--workload",
+    "workloads",
+    multiple=True,
+    type=click.Choice(list(WORKLOADS)),
+    help="Workloads to run, all of them by default.",
+)
+@click.option("--concurrency", default=16, show_default=True)
+@click.option("--duration", default=10.0, show_default=True, help="Seconds per workload.")
+@click.option("--warmup", default=1.0, show_default=True, help="Unmeasured seconds per workload.")
+@click.option("--pets", default=1000, show_default=True)
+@click.option("--users", default=200, show_default=True)
+@click.option("--pets-per-user", default=3, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False), help="Write the results JSON here.")
+@click.option("--baseline", type=click.Path(exists=True, dir_okay=False))
+@click.option("--max-regression", default=0.1, show_default=True)
+def main(
+    config,
+    app_name,
+    in_process,
+    workloads,
+    concurrency,
+    duration,
+    warmup,
+    pets,
+    users,
+    pets_per_user,
+    output,
+    baseline,
+    max_regression,
+):
+    with tempfile.TemporaryDirectory() as data_dir:
+        with BenchmarkApp(config, Path(data_dir), app_name, in_process) as app:
+            results = asyncio.run(
+                run(
+                    app.base_url,
+                    workloads or list(WORKLOADS),
+                    concurrency,
+                    duration,
+                    warmup,
+                    pets,
+                    users,
+                    pets_per_user,
+                )
+            )
+    report = {"environment": environment(), "results": results}
+    if baseline is not None:
+        with open(baseline) as f:
+            report["comparison"] = compare(results, json.load(f)["results"], max_regression)
+    text = json.dumps(report, indent=2)
+    if output is not None:
+        Path(output).write_text(text + "\n")
+    click.echo(text)
+    if any(comparison["regression"] for comparison in report.get("comparison", [])):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
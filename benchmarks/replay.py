@@ -0,0 +1,170 @@
+"""
+Replay requests captured by TrafficCaptureMiddleware (see the `capture` config) against a
+running app, keeping the original inter-arrival times or compressing them `--speed` times,
+and report the latency of every route against the captured one as JSON:
+
+    python -m benchmarks.replay logs/capture.jsonl --base-url http://localhost:8000 --speed 2
+
+Captured requests sharing a request id are one external request and the internal calls it made
+(e.g. the user service fetching pets), only the first one is replayed and the app makes the
+internal calls again. Requests whose body was truncated by the capture are skipped.
+Captured durations are measured inside the sub app, replayed ones by the client, so small
+deltas include the connection overhead.
+"""
+
+import asyncio
+import base64
+import json
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+import click
+import httpx
+
+from .load import environment, percentile
+
+
+def load_capture(path: str, sub_apps: tuple[str, ...] = ()) -> tuple[list[dict], dict[str, int]]:
+    """The external requests of a capture in arrival order, and how many lines were dropped."""
+    first_by_request_id: dict[str, dict] = {}
+    internal = truncated = 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            first = first_by_request_id.get(request["request_id"])
+            if first is None:
+                first_by_request_id[request["request_id"]] = request
+                continue
+            internal += 1
+            if request["time"] < first["time"]:
+                first_by_request_id[request["request_id"]] = request
+    requests = []
+    for request in first_by_request_id.values():
+        if sub_apps and request["sub_app"] not in sub_apps:
+            continue
+        if request.get("body_truncated"):
+            truncated += 1
+            continue
+        requests.append(request)
+    requests.sort(key=lambda request: request["time"])
+    return requests, {"internal": internal, "truncated": truncated}
+
+
+def _body(request: dict) -> bytes:
+    if "body_base64" in request:
+        return base64.b64decode(request["body_base64"])
+    return request.get("body", "").encode()
+
+
+async def replay(
+    client: httpx.AsyncClient, requests: list[dict], speed: float, max_in_flight: int
+) -> list[dict[str, Any]]:
+    """
+    Send every request at its captured offset from the first one divided by `speed`, a speed of
+    0 sends them as fast as `max_in_flight` allows.
+    """
+    if not requests:
+        return []
+    semaphore = asyncio.Semaphore(max_in_flight)
+    first_time = requests[0]["time"]
+    start = time.perf_counter()
+
+    async def send(request: dict) -> dict[str, Any]:
+        target = (request["time"] - first_time) / speed if speed else 0.0
+        await asyncio.sleep(max(0.0, target - (time.perf_counter() - start)))
+        async with semaphore:
+            sent = time.perf_counter()
+            try:
+                response = await client.request(
+                    request["method"],
+                    request["path"],
+                    params=request.get("query_string") or None,
+                    headers=request.get("headers"),
+                    content=_body(request),
+                )
+                status = response.status_code
+            except httpx.HTTPError:
+                status = None
+            return {
+                "sub_app": request["sub_app"],
+                "method": request["method"],
+                "route": request["route"],
+                "original_status": request["status"],
+                "status": status,
+                "original_ms": request["duration_ms"],
+                "replay_ms": (time.perf_counter() - sent) * 1000,
+                "lag_ms": (sent - start - target) * 1000,
+            }
+
+    return await asyncio.gather(*[send(request) for request in requests])
+
+
+def _latencies(values: list[float]) -> dict[str, float]:
+    values = sorted(values)
+    return {f"p{p}": round(percentile(values, p), 3) for p in (50, 95, 99)}
+
+
+def _summarize(results: list[dict]) -> dict[str, Any]:
+    original = _latencies([result["original_ms"] for result in results])
+    replayed = _latencies([result["replay_ms"] for result in results])
+    return {
+        "requests": len(results),
+        "errors": sum(result["status"] is None for result in results),
+        "status_mismatches": sum(
+            result["status"] != result["original_status"] for result in results
+        ),
+        "original_ms": original,
+        "replay_ms": replayed,
+        "delta_ms": {key: round(replayed[key] - original[key], 3) for key in original},
+    }
+
+
+def report(results: list[dict], dropped: dict[str, int], speed: float) -> dict[str, Any]:
+    by_route = defaultdict(list)
+    for result in results:
+        by_route[f"{result['method']} {result['route']}"].append(result)
+    lags = sorted(result["lag_ms"] for result in results)
+    return {
+        "environment": environment(),
+        "speed": speed,
+        "dropped": dropped,
+        "dispatch_lag_ms": {"p99": round(percentile(lags, 99), 3), "max": round(lags[-1], 3)}
+        if lags
+        else None,
+        "total": _summarize(results),
+        "routes": {route: _summarize(results) for route, results in sorted(by_route.items())},
+    }
+
+
+@click.command()
+@click.argument("capture", type=click.Path(exists=True, dir_okay=False))
+@click.option("--base-url", default="http://localhost:8000", show_default=True)
+@click.option(
+    "--speed",
+    default=1.0,
+    show_default=True,
+    help="Replay N times faster than captured, 0 sends the requests as fast as possible.",
+)
+@click.option("--sub-app", "sub_apps", multiple=True, help="Only replay requests to this sub app.")
+@click.option("--max-in-flight", default=256, show_default=True)
+@click.option("--output", type=click.Path(dir_okay=False), help="Write the report JSON here.")
+def main(capture, base_url, speed, sub_apps, max_in_flight, output):
+    requests, dropped = load_capture(capture, sub_apps)
+
+    async def run():
+        limits = httpx.Limits(max_connections=max_in_flight)
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0) as client:
+            return await replay(client, requests, speed, max_in_flight)
+
+    text = json.dumps(report(asyncio.run(run()), dropped, speed), indent=2)
+    if output is not None:
+        Path(output).write_text(text + "\n")
+    click.echo(text)
+
+
+if __name__ == "__main__":
+    main()
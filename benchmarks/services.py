@@ -0,0 +1,526 @@
+"""
+Microbenchmarks of the PetService and UserService methods, called directly with sessions.
+
+Every static method of both services runs against SQLite databases filled with a synthetic
+dataset of 10k, 1M or 10M pets (users are a tenth of the pets, each with `--pets-per-user`
+adopted pets), independent of HTTP. The pet service API used by the user service is faked in
+process, so calls to it are counted but cost nothing unless `--rpc-latency-ms` is given.
+
+Each case reports its time per call, the SQL statements and pet service calls it made and, in a
+separate tracemalloc pass so tracing does not skew the timings, the memory it allocated:
+
+    python -m benchmarks.services --rows 10k --rows 1M --data-dir /tmp/bench --output services.json
+
+Generating the larger datasets takes a while, they are kept in `--data-dir` and reused by later
+runs. The mutating cases change a few rows of a reused dataset, which does not affect the scale.
+"""
+
+import asyncio
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable
+
+import click
+from sqlalchemy import Engine, event, func, insert, select
+from sqlmodel import Session, create_engine
+
+from services.pet_service.core.database import create_tables as create_pet_tables
+from services.pet_service.core.service import PetService
+from services.pet_service.models import (
+    PetCreateObject,
+    PetResponseObject,
+    PetTableObject,
+    PetUpdateObject,
+)
+from services.user_service.core.database import create_tables as create_user_tables
+from services.user_service.core.service import UserService
+from services.user_service.models import (
+    UserCreateObject,
+    UserPetTableObject,
+    UserTableObject,
+    UserUpdateObject,
+)
+
+from .load import environment, percentile
+
+SCALES = {"10k": 10_000, "1M": 1_000_000, "10M": 10_000_000}
+SPECIES = ("dog", "cat", "parrot", "rabbit", "hamster")
+MOODS = ("happy", "sleepy", "hungry", "excited")
+PAGE_SIZE = 100
+CHUNK_SIZE = 50_000
+
+
+def parse_rows(value: str) -> int:
+    return SCALES[value] if value in SCALES else int(value)
+
+
+def _chunks(rows: int):
+    for start in range(0, rows, CHUNK_SIZE):
+        yield start, min(start + CHUNK_SIZE, rows)
+
+
+def _create_engine(path: Path) -> Engine:
+    # not the services' init_engine, the request instrumentation is not what is measured
+    return create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+
+
+def _count(engine: Engine, table) -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(table)).scalar_one()
+
+
+def generate_pets(engine: Engine, rows: int, seed: int = 0):
+    """Insert `rows` synthetic pets with ids 1..rows, in chunks of CHUNK_SIZE."""
+    rng = random.Random(seed)
+    epoch = datetime(2024, 1, 1, tzinfo=UTC)
+    table = PetTableObject.__table__  # type: ignore
+    for start, end in _chunks(rows):
+        with engine.begin() as conn:
+            conn.execute(
+                insert(table),
+                [
+                    {
+                        "id": i + 1,
+                        "name": f"pet-{i}",
+                        "species": rng.choice(SPECIES),
+                        "age": rng.randint(0, 20),
+                        "mood": rng.choice(MOODS),
+                        "last_fed": epoch + timedelta(seconds=rng.randrange(10**7)),
+                        "last_interaction": epoch + timedelta(seconds=rng.randrange(10**7)),
+                    }
+                    for i in range(start, end)
+                ],
+            )
+
+
+def generate_users(engine: Engine, users: int, pets: int, pets_per_user: int, seed: int = 0):
+    """Insert `users` synthetic users with ids 1..users, each adopting `pets_per_user` pets."""
+    rng = random.Random(seed)
+    user_table = UserTableObject.__table__  # type: ignore
+    user_pet_table = UserPetTableObject.__table__  # type: ignore
+    for start, end in _chunks(users):
+        with engine.begin() as conn:
+            conn.execute(
+                insert(user_table), [{"id": i + 1, "name": f"user-{i}"} for i in range(start, end)]
+            )
+            conn.execute(
+                insert(user_pet_table),
+                [
+                    {"pet_id": rng.randint(1, pets), "user_id": i + 1}
+                    for i in range(start, end)
+                    for _ in range(pets_per_user)
+                ],
+            )
+
+
+@dataclass
+class Dataset:
+    rows: int
+    users: int
+    pets_per_user: int
+    pet_engine: Engine
+    user_engine: Engine
+
+
+def open_dataset(data_dir: Path, rows: int, pets_per_user: int) -> Dataset:
+    """The dataset of `rows` pets in `data_dir`, generated when it is missing or incomplete."""
+    users = max(rows // 10, 1)
+    pet_engine = _create_engine(data_dir / f"pets-{rows}.db")
+    user_engine = _create_engine(data_dir / f"users-{rows}-{pets_per_user}.db")
+    create_pet_tables(pet_engine)
+    create_user_tables(user_engine)
+    if _count(pet_engine, PetTableObject.__table__) < rows:  # type: ignore
+        click.echo(f"Generating {rows} pets", err=True)
+        PetTableObject.__table__.drop(pet_engine)  # type: ignore
+        create_pet_tables(pet_engine)
+        generate_pets(pet_engine, rows)
+    if _count(user_engine, UserTableObject.__table__) < users:  # type: ignore
+        click.echo(f"Generating {users} users", err=True)
+        UserPetTableObject.__table__.drop(user_engine)  # type: ignore
+        UserTableObject.__table__.drop(user_engine)  # type: ignore
+        create_user_tables(user_engine)
+        generate_users(user_engine, users, rows, pets_per_user)
+    return Dataset(rows, users, pets_per_user, pet_engine, user_engine)
+
+
+class FakePetApi:
+    """Stands in for the generated pet service DefaultApi, answering every pet id."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self._now = datetime.now(UTC)
+
+    async def get_pet_pet_id_get(self, pet_id: int, _headers=None):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return PetResponseObject.model_construct(
+            id=pet_id,
+            name=f"pet-{pet_id}",
+            species="dog",
+            age=3,
+            mood="happy",
+            last_fed=self._now,
+            last_interaction=self._now,
+        )
+
+
+@dataclass
+class Case:
+    """
+    A benchmarked call. `prepare` runs untimed before each call and its result is passed to
+    `call`, e.g. to create the row a delete removes.
+    """
+
+    service: str
+    method: str
+    name: str
+    call: Callable[[Session, Any], Awaitable[Any]]
+    prepare: Callable[[Session], Any] | None = None
+
+
+def pet_cases(data: Dataset, rng: random.Random) -> list[Case]:
+    def pet_id() -> int:
+        return rng.randint(1, data.rows)
+
+    def new_pet(session: Session) -> int:
+        pet = PetTableObject(name="benchmark", species="dog", age=1)
+        session.add(pet)
+        session.commit()
+        return pet.id  # type: ignore
+
+    pet = PetCreateObject(name="benchmark", species="dog", age=1)
+    update = PetUpdateObject(mood="sleepy")
+    last_page = max(data.rows - PAGE_SIZE, 0)
+    return [
+        Case("pet", "create_pet", "create_pet", lambda s, _: PetService.create_pet(s, pet)),
+        Case("pet", "get_pet", "get_pet", lambda s, _: PetService.get_pet(s, pet_id())),
+        Case(
+            "pet",
+            "list_pets",
+            "list_pets_first_page",
+            lambda s, _: PetService.list_pets(s, 0, PAGE_SIZE),
+        ),
+        Case(
+            "pet",
+            "list_pets",
+            "list_pets_last_page",
+            lambda s, _: PetService.list_pets(s, last_page, PAGE_SIZE),
+        ),
+        Case(
+            "pet",
+            "update_pet",
+            "update_pet",
+            lambda s, _: PetService.update_pet(s, pet_id(), update),
+        ),
+        Case(
+            "pet",
+            "delete_pet",
+            "delete_pet",
+            lambda s, new_id: PetService.delete_pet(s, new_id),
+            prepare=new_pet,
+        ),
+        Case("pet", "hydrate_pet", "hydrate_pet", lambda s, _: PetService.hydrate_pet(s, pet_id())),
+        Case("pet", "feed_pet", "feed_pet", lambda s, _: PetService.feed_pet(s, pet_id())),
+        Case("pet", "give_treat", "give_treat", lambda s, _: PetService.give_treat(s, pet_id())),
+    ]
+
+
+def user_cases(data: Dataset, rng: random.Random, api: FakePetApi) -> list[Case]:
+    def user_id() -> int:
+        return rng.randint(1, data.users)
+
+    def existing_user(session: Session) -> UserTableObject:
+        return session.get(UserTableObject, user_id())  # type: ignore
+
+    def new_user(session: Session) -> int:
+        user = UserTableObject(name="benchmark")
+        session.add(user)
+        session.commit()
+        return user.id  # type: ignore
+
+    async def format_user_response(session: Session, user: UserTableObject):
+        return UserService.format_user_response(user, [])
+
+    user = UserCreateObject(name="benchmark")
+    update = UserUpdateObject(name="renamed")
+    last_page = max(data.users - PAGE_SIZE, 0)
+    return [
+        Case(
+            "user",
+            "get_pet_from_pet_service",
+            "get_pet_from_pet_service",
+            lambda s, _: UserService.get_pet_from_pet_service(rng.randint(1, data.rows), s, api),
+        ),
+        Case(
+            "user",
+            "format_user_response",
+            "format_user_response",
+            format_user_response,
+            prepare=existing_user,
+        ),
+        Case(
+            "user",
+            "cast_user_to_response",
+            "cast_user_to_response",
+            lambda s, u: UserService.cast_user_to_response(u, s, api),
+            prepare=existing_user,
+        ),
+        Case(
+            "user",
+            "get_user_pets_from_pet_service",
+            "get_user_pets_from_pet_service",
+            lambda s, _: UserService.get_user_pets_from_pet_service(user_id(), s, api),
+        ),
+        Case(
+            "user", "create_user", "create_user", lambda s, _: UserService.create_user(user, s, api)
+        ),
+        Case("user", "get_user", "get_user", lambda s, _: UserService.get_user(user_id(), s, api)),
+        Case(
+            "user",
+            "list_users",
+            "list_users_first_page",
+            lambda s, _: UserService.list_users(s, 0, PAGE_SIZE, api),
+        ),
+        Case(
+            "user",
+            "list_users",
+            "list_users_last_page",
+            lambda s, _: UserService.list_users(s, last_page, PAGE_SIZE, api),
+        ),
+        Case(
+            "user",
+            "update_user",
+            "update_user",
+            lambda s, _: UserService.update_user(user_id(), update, s, api),
+        ),
+        Case(
+            "user",
+            "delete_user",
+            "delete_user",
+            lambda s, new_id: UserService.delete_user(new_id, s),
+            prepare=new_user,
+        ),
+        Case(
+            "user",
+            "adopt_pet",
+            "adopt_pet",
+            lambda s, new_id: UserService.adopt_pet(new_id, rng.randint(1, data.rows), s, api),
+            prepare=new_user,
+        ),
+    ]
+
+
+class QueryCounter:
+    """Count the SQL statements an engine executes."""
+
+    def __init__(self, engine: Engine):
+        self.count = 0
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    def _after_cursor_execute(self, *args):
+        self.count += 1
+
+
+async def _call(case: Case, engine: Engine) -> None:
+    with Session(engine) as session:
+        prepared = case.prepare(session) if case.prepare is not None else None
+        await case.call(session, prepared)
+
+
+async def _timed_call(case: Case, engine: Engine, queries: QueryCounter) -> tuple[float, int]:
+    """The duration of the call and the statements it executed, `prepare`'s are left out."""
+    with Session(engine) as session:
+        prepared = case.prepare(session) if case.prepare is not None else None
+        query_count = queries.count
+        start = time.perf_counter()
+        await case.call(session, prepared)
+        return time.perf_counter() - start, queries.count - query_count
+
+
+async def _traced_call(case: Case, engine: Engine) -> tuple[int, int]:
+    with Session(engine) as session:
+        prepared = case.prepare(session) if case.prepare is not None else None
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = await case.call(session, prepared)
+        after, peak = tracemalloc.get_traced_memory()
+        del result
+        return peak - before, after - before
+
+
+def _median(values: list[int]) -> int | None:
+    return sorted(values)[len(values) // 2] if values else None
+
+
+async def run_case(
+    case: Case,
+    engine: Engine,
+    queries: QueryCounter,
+    api: FakePetApi,
+    iterations: int,
+    warmup: int,
+    max_seconds: float,
+    allocation_iterations: int,
+) -> dict[str, Any]:
+    """Time `iterations` calls (fewer past `max_seconds`), then trace the allocations of a few."""
+    for _ in range(warmup):
+        await _call(case, engine)
+
+    durations: list[float] = []
+    query_count, rpc_calls = 0, api.calls
+    deadline = time.perf_counter() + max_seconds
+    while len(durations) < iterations and (not durations or time.perf_counter() < deadline):
+        duration, call_queries = await _timed_call(case, engine, queries)
+        durations.append(duration)
+        query_count += call_queries
+    calls = len(durations)
+    rpc_calls = api.calls - rpc_calls
+
+    allocations = []
+    if allocation_iterations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        try:
+            for _ in range(allocation_iterations):
+                allocations.append(await _traced_call(case, engine))
+        finally:
+            tracemalloc.stop()
+
+    durations.sort()
+    return {
+        "service": case.service,
+        "method": case.method,
+        "case": case.name,
+        "iterations": calls,
+        "time_ms": {
+            "mean": round(sum(durations) / calls * 1000, 4),
+            "min": round(durations[0] * 1000, 4),
+            **{f"p{p}": round(percentile(durations, p) * 1000, 4) for p in (50, 95, 99)},
+            "max": round(durations[-1] * 1000, 4),
+        },
+        "queries_per_call": round(query_count / calls, 2),
+        "rpc_calls_per_call": round(rpc_calls / calls, 2),
+        "allocations": {
+            "iterations": len(allocations),
+            "peak_bytes": _median([peak for peak, _ in allocations]),
+            "retained_bytes": _median([retained for _, retained in allocations]),
+        },
+    }
+
+
+async def run(
+    data: Dataset,
+    services: tuple[str, ...],
+    cases: tuple[str, ...],
+    iterations: int,
+    warmup: int,
+    max_seconds: float,
+    allocation_iterations: int,
+    rpc_latency: float,
+) -> list[dict[str, Any]]:
+    rng = random.Random(0)
+    api = FakePetApi(rpc_latency)
+    engines = {"pet": data.pet_engine, "user": data.user_engine}
+    counters = {name: QueryCounter(engine) for name, engine in engines.items()}
+    all_cases = [*pet_cases(data, rng), *user_cases(data, rng, api)]
+    results = []
+    for case in all_cases:
+        if case.service not in services or (cases and case.name not in cases):
+            continue
+        result = await run_case(
+            case,
+            engines[case.service],
+            counters[case.service],
+            api,
+            iterations,
+            warmup,
+            max_seconds,
+            allocation_iterations,
+        )
+        results.append({"rows": data.rows, **result})
+        click.echo(
+            f"{data.rows:>10} {case.name:<32} {result['time_ms']['p50']:>10.3f} ms p50", err=True
+        )
+    return results
+
+
+@click.command()
+@click.option(
+    "--rows",
+    "scales",
+    multiple=True,
+    default=("10k",),
+    show_default=True,
+    help=f"Pets in the dataset, one of {', '.join(SCALES)} or a number. Repeatable.",
+)
+@click.option("--pets-per-user", default=3, show_default=True)
+@click.option("--service", "services", multiple=True, type=click.Choice(["pet", "user"]))
+@click.option(
+    "--case", "cases", multiple=True, help="Only run these cases, e.g. list_pets_last_page."
+)
+@click.option("--iterations", default=200, show_default=True)
+@click.option("--warmup", default=10, show_default=True)
+@click.option("--max-seconds", default=5.0, show_default=True, help="Time limit of each case.")
+@click.option(
+    "--allocation-iterations",
+    default=20,
+    show_default=True,
+    help="Calls traced with tracemalloc per case, 0 to skip.",
+)
+@click.option("--rpc-latency-ms", default=0.0, show_default=True, help="Fake pet service latency.")
+@click.option(
+    "--data-dir",
+    type=click.Path(file_okay=False),
+    help="Keep the generated datasets here, a temporary directory by default.",
+)
+@click.option("--output", type=click.Path(dir_okay=False), help="Write the results JSON here.")
+def main(
+    scales,
+    pets_per_user,
+    services,
+    cases,
+    iterations,
+    warmup,
+    max_seconds,
+    allocation_iterations,
+    rpc_latency_ms,
+    data_dir,
+    output,
+):
+    with tempfile.TemporaryDirectory() as temporary_dir:
+        directory = Path(data_dir or temporary_dir)
+        directory.mkdir(parents=True, exist_ok=True)
+        results = []
+        for scale in scales:
+            data = open_dataset(directory, parse_rows(scale), pets_per_user)
+            try:
+                results += asyncio.run(
+                    run(
+                        data,
+                        services or ("pet", "user"),
+                        cases,
+                        iterations,
+                        warmup,
+                        max_seconds,
+                        allocation_iterations,
+                        rpc_latency_ms / 1000,
+                    )
+                )
+            finally:
+                data.pet_engine.dispose()
+                data.user_engine.dispose()
+    text = json.dumps({"environment": environment(), "results": results}, indent=2)
+    if output is not None:
+        Path(output).write_text(text + "\n")
+    click.echo(text)
+
+
+if __name__ == "__main__":
+    main()
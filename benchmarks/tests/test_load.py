@@ -0,0 +1,52 @@
+from pathlib import Path
+
+from ..harness import prepare_config
+from ..load import compare, percentile, summarize
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile(values, 100) == 100
+    assert percentile([1.0], 99) == 1.0
+    assert percentile([], 50) == 0.0
+
+
+def test_summarize_and_compare():
+    result = summarize("user_detail", 8, 2.0, [0.01] * 90 + [0.1] * 10, errors=1)
+    assert result["throughput_rps"] == 50
+    assert result["latency_ms"]["p50"] == 10
+    assert result["latency_ms"]["p95"] == 100
+
+    baseline = [{**result, "throughput_rps": 100.0}]
+    (comparison,) = compare([result], baseline, max_regression=0.1)
+    assert comparison["throughput_change"] == -0.5
+    assert comparison["regression"]
+    assert not compare([result], [result], max_regression=0.1)[0]["regression"]
+
+
+def test_prepare_config_rewrites_ports_and_databases():
+    config = {
+        "apps": {
+            "app": {
+                "port": 8000,
+                "sub_apps": {
+                    "pet_service": {"path": "/pet", "kwargs": {"database_url": "sqlite:///x"}},
+                    "user_service": {
+                        "path": "/user",
+                        "kwargs": {"pet_service_url": "http://localhost:8000/pet"},
+                    },
+                },
+            },
+            "app1": {"port": 8001},
+        }
+    }
+    prepared = prepare_config(config, "app", 9000, Path("/tmp/bench"))
+    assert list(prepared["apps"]) == ["app"]
+    sub_apps = prepared["apps"]["app"]["sub_apps"]
+    assert (
+        sub_apps["pet_service"]["kwargs"]["database_url"] == "sqlite:////tmp/bench/pet_service.db"
+    )
+    assert sub_apps["user_service"]["kwargs"]["pet_service_url"] == "http://127.0.0.1:9000/pet"
+    assert config["apps"]["app"]["port"] == 8000  # the loaded config is not modified
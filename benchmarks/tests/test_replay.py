@@ -0,0 +1,69 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from ..replay import load_capture, replay, report
+
+
+def captured(request_id: str, time: float, sub_app: str, path: str, **kwargs) -> dict:
+    return {
+        "time": time,
+        "request_id": request_id,
+        "sub_app": sub_app,
+        "method": "GET",
+        "path": path,
+        "query_string": "",
+        "route": path,
+        "headers": {},
+        "status": 200,
+        "duration_ms": 1.0,
+        "body": "",
+        **kwargs,
+    }
+
+
+def test_load_capture_keeps_the_first_hop_of_each_request(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    lines = [
+        captured("b", 2.0, "app.pet_service", "/pet/1"),
+        # the user service request and the pet service call it made
+        captured("a", 1.1, "app.pet_service", "/pet/1"),
+        captured("a", 1.0, "app.user_service", "/user/1"),
+        captured("c", 3.0, "app.pet_service", "/pet/", body_truncated=True),
+    ]
+    path.write_text("".join(json.dumps(line) + "\n" for line in lines))
+
+    requests, dropped = load_capture(str(path))
+    assert [(r["request_id"], r["sub_app"]) for r in requests] == [
+        ("a", "app.user_service"),
+        ("b", "app.pet_service"),
+    ]
+    assert dropped == {"internal": 1, "truncated": 1}
+    requests, _ = load_capture(str(path), ("app.pet_service",))
+    assert [r["request_id"] for r in requests] == ["b"]
+
+
+@pytest.mark.asyncio
+async def test_replay_reports_latency_deltas_per_route():
+    app = FastAPI()
+
+    @app.get("/pet/{pet_id}")
+    async def get_pet(pet_id: int):
+        return {"id": pet_id}
+
+    requests = [
+        captured("a", 100.0, "app.pet_service", "/pet/1", route="/pet/{pet_id}"),
+        captured("b", 100.05, "app.pet_service", "/pet/x", route="/pet/{pet_id}"),
+    ]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        results = await replay(client, requests, speed=1.0, max_in_flight=4)
+
+    summary = report(results, {"internal": 0, "truncated": 0}, speed=1.0)
+    route = summary["routes"]["GET /pet/{pet_id}"]
+    assert route["requests"] == 2
+    assert route["status_mismatches"] == 1  # /pet/x is a 422 now
+    assert route["original_ms"]["p50"] == 1.0
+    assert route["delta_ms"]["p99"] == pytest.approx(route["replay_ms"]["p99"] - 1.0)
+    assert summary["dispatch_lag_ms"]["max"] < 50
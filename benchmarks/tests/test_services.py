@@ -0,0 +1,37 @@
+import asyncio
+
+from ..services import open_dataset, parse_rows, run
+
+
+def test_parse_rows():
+    assert parse_rows("1M") == 1_000_000
+    assert parse_rows("2500") == 2500
+
+
+def test_run_reports_every_case(tmp_path):
+    data = open_dataset(tmp_path, 300, pets_per_user=3)
+    try:
+        results = asyncio.run(
+            run(
+                data,
+                ("pet", "user"),
+                (),
+                iterations=3,
+                warmup=1,
+                max_seconds=5.0,
+                allocation_iterations=1,
+                rpc_latency=0.0,
+            )
+        )
+    finally:
+        data.pet_engine.dispose()
+        data.user_engine.dispose()
+
+    by_case = {result["case"]: result for result in results}
+    assert {"list_pets_last_page", "delete_pet", "get_user", "adopt_pet"} <= set(by_case)
+    assert all(result["iterations"] == 3 for result in results)
+    assert by_case["get_pet"]["queries_per_call"] == 1
+    # statements of prepare, e.g. loading the user to format, are not counted
+    assert by_case["format_user_response"]["queries_per_call"] == 0
+    assert by_case["get_user_pets_from_pet_service"]["rpc_calls_per_call"] == 3
+    assert by_case["get_user"]["allocations"]["peak_bytes"] > 0
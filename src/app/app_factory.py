@@ -1,12 +1,26 @@
 import types
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI
+from fastapi import APIRouter, Depends, FastAPI
 
+import common.routers.debug as debug
+import common.routers.log_levels as log_levels
+import common.routers.metrics as metrics
 import common.routers.status_OK as status_OK
+import common.routers.traces as traces
+from common.admission import AdmissionController, AdmissionMiddleware
+from common.capture import TrafficCaptureMiddleware, TrafficRecorder
+from common.db_instrumentation import QueryStatsMiddleware
+from common.deadline import DeadlineMiddleware
 from common.importer import ImportFromStringError, import_from_string
 from common.logging.getLogger import getContextualLogger
+from common.logging.levels import LogLevelController
+from common.routers.admin import create_admin_token_dependency
 from common.logging.middleware import LoggerContextMiddleware
+from common.metrics import MetricsMiddleware
+from common.monitoring import EventLoopMonitor
+from common.timing import ServerTimingMiddleware
+from common.tracing import SpanExporter, TracingMiddleware
 
 from .MountedLifespanMiddleware import MountedLifespanMiddleware
 
@@ -16,13 +30,45 @@ def app_factory(app_name: str = "app", config: dict | None = None):
     # Set up logging
     logger = getContextualLogger()
 
+    tracing_config = config.get("tracing", {})
+    # one exporter per app, several apps can share a process (see threaded in app.main)
+    exporter = SpanExporter(
+        buffer_size=tracing_config.get("buffer_size", 1024),
+        path=tracing_config.get("path"),
+        service_name=app_name,
+    )
+
+    monitoring_config = config.get("monitoring")
+    loop_monitor = None
+    if monitoring_config is not None:
+        loop_monitor = EventLoopMonitor(app_name, **monitoring_config)
+
+    deadline_config = config.get("deadline", {})
+
+    capture_config = config.get("capture")
+    recorder = None
+    if capture_config is not None:
+        recorder = TrafficRecorder(**capture_config)
+
     @asynccontextmanager
     async def lifespan(app: FastAPI):
+        if loop_monitor is not None:
+            loop_monitor.start()
         yield
+        if loop_monitor is not None:
+            await loop_monitor.stop()
+        if recorder is not None:
+            recorder.close()
+        exporter.close()
 
     app = FastAPI(lifespan=lifespan)
+    app.state.span_exporter = exporter
     app.add_middleware(MountedLifespanMiddleware)
+    app.add_middleware(MetricsMiddleware, sub_app=app_name)
+    app.add_middleware(TracingMiddleware, sub_app=app_name, exporter=exporter)
     app.add_middleware(LoggerContextMiddleware, logger_name=app_name)
+    log_level_controller = LogLevelController(["root", app_name])
+    admission_controllers: dict[str, AdmissionController] = {}
 
     # Create the main application
     for sub_app_name, sub_app_info in config.get("sub_apps", {}).items():
@@ -41,7 +87,26 @@ def app_factory(app_name: str = "app", config: dict | None = None):
             else:
                 subapp = subapp_factory()
             assert isinstance(subapp, FastAPI)
-            subapp.add_middleware(LoggerContextMiddleware, logger_name=f"{app_name}.{sub_app_name}")
+            subapp_logger_name = f"{app_name}.{sub_app_name}"
+            admission_config = sub_app_info.get("admission")
+            if admission_config is not None:
+                # inside the deadline, the time spent queued counts against it, and inside the
+                # metrics, requests shed with a 503 are counted
+                controller = AdmissionController(subapp_logger_name, **admission_config)
+                admission_controllers[sub_app_name] = controller
+                subapp.add_middleware(AdmissionMiddleware, controller=controller)
+            subapp.add_middleware(DeadlineMiddleware, sub_app=subapp_logger_name, **deadline_config)
+            subapp.add_middleware(ServerTimingMiddleware)
+            subapp.add_middleware(MetricsMiddleware, sub_app=subapp_logger_name)
+            subapp.add_middleware(TracingMiddleware, sub_app=subapp_logger_name)
+            subapp.add_middleware(QueryStatsMiddleware)
+            if recorder is not None:
+                subapp.add_middleware(
+                    TrafficCaptureMiddleware, sub_app=subapp_logger_name, recorder=recorder
+                )
+            subapp.add_middleware(LoggerContextMiddleware, logger_name=subapp_logger_name)
+            log_level_controller.logger_names.append(subapp_logger_name)
+            log_level_controller.aliases[sub_app_name] = subapp_logger_name
             # Mount the sub-application
             app.mount(route_path, subapp)
             logger.info(f"Mounted {sub_app_name} at {route_path}")
@@ -50,4 +115,24 @@ def app_factory(app_name: str = "app", config: dict | None = None):
             raise e
 
     app.include_router(status_OK.router, prefix="/health")
+    app.include_router(
+        metrics.create_router(), prefix=config.get("metrics", {}).get("path", "/metrics")
+    )
+
+    admin_config = config.get("admin")
+    if admin_config is not None and not admin_config.get("token"):
+        # log levels, profiles and heap snapshots are never served unauthenticated
+        logger.warning("Admin routes are disabled, set admin.token to enable them")
+    elif admin_config is not None:
+        admin_router = APIRouter(
+            dependencies=[Depends(create_admin_token_dependency(admin_config["token"]))]
+        )
+        admin_router.include_router(
+            log_levels.create_router(log_level_controller), prefix="/logging"
+        )
+        admin_router.include_router(traces.create_router(exporter), prefix="/traces")
+        admin_router.include_router(
+            debug.create_router(loop_monitor, admission_controllers), prefix="/debug"
+        )
+        app.include_router(admin_router, prefix=admin_config.get("path", "/admin"))
     return app
@@ -1,6 +1,9 @@
 import asyncio
 import inspect
 import logging
+import signal
+import sys
+import threading
 from pathlib import Path
 from itertools import zip_longest
 from typing import Any, Callable
@@ -9,11 +12,15 @@ import click
 from common.config_loader import load_config
 
 from app.app_factory import app_factory as app_factory
+from app.split import Supervisor, plan_split, process_launch_config
 
 import socket
+from uvicorn.server import HANDLED_SIGNALS
 from uvicorn.supervisors import ChangeReload, Multiprocess
 from uvicorn._types import ASGIApplication
 
+logger = logging.getLogger(__name__)
+
 
 def create_config_from_config(app: ASGIApplication | Callable[..., Any] | str, config: dict):
     uvicorn_parameters = inspect.signature(uvicorn.Config).parameters
@@ -35,6 +42,7 @@ def create_server_and_config_from_config(app_name: str, app_config: dict):
 class AppServerManager:
     def __init__(self, launch_config: dict):
         self.launch_config = launch_config
+        self.servers: list[uvicorn.Server] = []
 
     @property
     def apps_config(self):
@@ -49,10 +57,17 @@ class AppServerManager:
             servers.append(server)
         return configs, servers
 
+    def new_event_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.new_event_loop()
+        if self.launch_config.get("eager_task_factory", False):
+            loop.set_task_factory(asyncio.eager_task_factory)
+        return loop
+
     def run(
         self, sockets: list[list[socket.socket] | socket.socket] | list[socket.socket] | None = None
     ):
         configs, servers = self.prepare()
+        self.servers = servers
 
         async def serve(servers):
             for server in servers:
@@ -67,12 +82,102 @@ class AppServerManager:
         configs[0].setup_event_loop()
         # for config in configs:
         #     config.configure_logging()
+        if self.launch_config.get("threaded", False):
+            return self.run_threaded(servers, sockets)
         if self.launch_config.get("eager_task_factory", False):
-            loop = asyncio.new_event_loop()
-            loop.set_task_factory(asyncio.eager_task_factory)
+            loop = self.new_event_loop()
             return loop.run_until_complete(serve(servers))
         return asyncio.run(serve(servers))
 
+    def run_threaded(self, servers: list[uvicorn.Server], sockets=None):
+        """
+        Run every server on its own thread with its own event loop, so a busy app does not delay
+        the others (on free-threaded CPython builds the apps also run in parallel).
+
+        Signals are handled here, on the calling thread, and shut every server down. When a
+        server exits, e.g. because its startup failed, the others are shut down too.
+        """
+        self.servers = servers
+        for server in servers:
+            server.config.configure_logging()
+        exited = threading.Event()
+        threads = [
+            ServerThread(app_name, server, socket, self.new_event_loop, exited)
+            for app_name, socket, server in zip_longest(self.apps_config, sockets or [], servers)
+        ]
+        captured_signals: list[int] = []
+
+        def handle_exit(sig: int, frame) -> None:
+            captured_signals.append(sig)
+            for server in servers:
+                if server.should_exit and sig == signal.SIGINT:
+                    server.force_exit = True
+                else:
+                    server.should_exit = True
+
+        original_handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            original_handlers = {sig: signal.signal(sig, handle_exit) for sig in HANDLED_SIGNALS}
+        try:
+            logger.info(
+                "Running %d apps on their own threads, GIL enabled: %s",
+                len(threads),
+                getattr(sys, "_is_gil_enabled", lambda: True)(),
+            )
+            for thread in threads:
+                thread.start()
+            # wait with a timeout so signal handlers get to run on this thread
+            while not exited.wait(0.1):
+                pass
+            self.stop()
+            for thread in threads:
+                thread.join()
+        finally:
+            for sig, handler in original_handlers.items():
+                signal.signal(sig, handler)
+        for thread in threads:
+            if not thread.server.started:
+                logger.error("App %s failed to start", thread.app_name)
+        for thread in threads:
+            if thread.exception is not None:
+                raise thread.exception
+        for captured_signal in reversed(captured_signals):
+            signal.raise_signal(captured_signal)
+
+    def stop(self):
+        """Ask every running server to shut down."""
+        for server in self.servers:
+            server.should_exit = True
+
+
+class ServerThread(threading.Thread):
+    """Serve a single app on a new event loop, setting `exited` when the server stops."""
+
+    def __init__(
+        self,
+        app_name: str,
+        server: uvicorn.Server,
+        sockets: list[socket.socket] | socket.socket | None,
+        loop_factory: Callable[[], asyncio.AbstractEventLoop],
+        exited: threading.Event,
+    ):
+        super().__init__(name=f"{app_name}-server", daemon=True)
+        self.app_name = app_name
+        self.server = server
+        self.sockets = sockets
+        self.loop_factory = loop_factory
+        self.exited = exited
+        self.exception: BaseException | None = None
+
+    def run(self):
+        try:
+            with asyncio.Runner(loop_factory=self.loop_factory) as runner:
+                runner.run(self.server.serve(sockets=self.sockets))  # type: ignore
+        except BaseException as e:  # uvicorn raises SystemExit when it can't bind
+            self.exception = e
+        finally:
+            self.exited.set()
+
 
 class SocketList(list):
     def __init__(self, *args, **kwargs):
@@ -96,6 +201,29 @@ class SocketList(list):
     help="Set reload directories explicitly, instead of using the current working" " directory.",
     type=click.Path(exists=True),
 )
+@click.option(
+    "--split",
+    is_flag=True,
+    default=False,
+    help="Run every sub app in its own supervised process, on its own port.",
+)
+@click.option(
+    "--group",
+    "groups",
+    multiple=True,
+    help="Comma separated sub apps sharing a process with --split, e.g. pet_service,user_service.",
+)
+@click.option(
+    "--replicas",
+    multiple=True,
+    help="NAME=N processes sharing the port of the sub app NAME (and its group) with --split.",
+)
+@click.option(
+    "--uds-dir",
+    type=click.Path(file_okay=False),
+    help="With --split, also listen on unix sockets in this directory and call local services "
+    "through them.",
+)
 @click.option(
     "--reload-include",
     "reload_includes",
@@ -120,8 +248,23 @@ def main(
     reload_dirs: list[str] | str | None = None,
     reload_includes: list[str] | str | None = None,
     reload_excludes: list[str] | str | None = None,
+    split: bool = False,
+    groups: tuple[str, ...] = (),
+    replicas: tuple[str, ...] = (),
+    uds_dir: str | None = None,
 ):
     launch_config = load_config(config, schema)
+    if split:
+        if reload:
+            raise click.UsageError("--split can't be combined with --reload")
+        try:
+            plan = plan_split(launch_config, groups, replicas, uds_dir)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+        supervisor_config = process_launch_config(launch_config, "supervisor")
+        create_config_from_config("", supervisor_config).configure_logging()
+        Supervisor(plan).run()
+        return
     if reload:
         launch_config["reload"] = reload
     if reload_dirs:
@@ -0,0 +1,331 @@
+"""
+Run the sub apps of a launch config as separate processes, see `python -m app --split`.
+
+Every sub app (or group of sub apps) of every app gets its own process group listening on its
+own port, allocated from the app's port upwards. Cross service urls such as the user service's
+`pet_service_url` are rewritten to the process serving that service. With a `uds_dir` every
+group also listens on a unix socket there, passed to the services calling it as `<name>_uds`.
+A group can run several replica processes sharing one listening socket, the kernel spreads the
+connections over them.
+The supervisor binds the sockets and restarts processes that exit, with exponential backoff.
+Every process, the supervisor included, writes its own log, trace and capture files, named after
+the process, e.g. ./logs/my_app-app.pet_service-0.log.jsonl.
+"""
+
+import copy
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+from multiprocessing.process import BaseProcess
+from typing import Sequence
+
+import uvicorn
+import yaml
+from uvicorn.server import HANDLED_SIGNALS
+
+logger = logging.getLogger(__name__)
+
+MAX_RESTART_DELAY = 30.0
+STABLE_AFTER = 30.0
+STOP_TIMEOUT = 10.0
+_LOCAL_HOSTS = ("", "0.0.0.0", "::")
+
+
+@dataclass
+class ProcessGroup:
+    """Sub apps of one app served by the same processes."""
+
+    app_name: str
+    sub_apps: list[str]
+    host: str
+    port: int
+    replicas: int = 1
+    uds: str | None = None
+    launch_config: dict = field(default_factory=dict)
+
+    @property
+    def name(self) -> str:
+        return f"{self.app_name}.{'+'.join(self.sub_apps)}"
+
+    @property
+    def url(self) -> str:
+        host = "127.0.0.1" if self.host in _LOCAL_HOSTS else self.host
+        return f"http://{host}:{self.port}"
+
+
+def _parse_groups(groups: Sequence[str], sub_apps: dict) -> list[list[str]]:
+    """Every sub app in exactly one group, those not named in `groups` on their own."""
+    parsed: list[list[str]] = []
+    grouped: set[str] = set()
+    for group in groups:
+        names = [name.strip() for name in group.split(",") if name.strip()]
+        names = [name for name in names if name in sub_apps]
+        if not names:
+            continue
+        if grouped.intersection(names):
+            raise ValueError(f"Sub apps are in more than one group: {grouped.intersection(names)}")
+        grouped.update(names)
+        parsed.append(names)
+    return parsed + [[name] for name in sub_apps if name not in grouped]
+
+
+def _parse_replicas(replicas: Sequence[str]) -> dict[str, int]:
+    parsed = {}
+    for replica in replicas:
+        name, _, count = replica.partition("=")
+        if not count.isdigit() or int(count) < 1:
+            raise ValueError(f"Replicas must be NAME=N with N >= 1, got {replica!r}")
+        parsed[name.strip()] = int(count)
+    return parsed
+
+
+def plan_split(
+    launch_config: dict,
+    groups: Sequence[str] = (),
+    replicas: Sequence[str] = (),
+    uds_dir: str | None = None,
+) -> list[ProcessGroup]:
+    """
+    The process groups of a launch config and the launch config each of them runs.
+
+    :param groups: comma separated sub apps sharing a process, e.g. "pet_service,user_service".
+    :param replicas: "NAME=N" to run N processes for the group of sub app NAME.
+    :param uds_dir: directory of the unix sockets the groups also listen on, for local calls.
+    """
+    apps = launch_config.get("apps", {})
+    replica_counts = _parse_replicas(replicas)
+    known = {name for app_config in apps.values() for name in app_config.get("sub_apps", {})}
+    unknown = [
+        name.strip()
+        for group in groups
+        for name in group.split(",")
+        if name.strip() and name.strip() not in known
+    ] + [name for name in replica_counts if name not in known]
+    if unknown:
+        raise ValueError(f"Unknown sub apps: {', '.join(unknown)}")
+
+    used_ports = {app_config.get("port", 8000) for app_config in apps.values()}
+    plan: list[ProcessGroup] = []
+    for app_name, app_config in apps.items():
+        sub_apps = app_config.get("sub_apps", {})
+        port = app_config.get("port", 8000)
+        for index, names in enumerate(_parse_groups(groups, sub_apps)):
+            if index > 0:
+                port += 1
+                while port in used_ports:
+                    port += 1
+                used_ports.add(port)
+            plan.append(
+                ProcessGroup(
+                    app_name,
+                    names,
+                    app_config.get("host", "127.0.0.1"),
+                    port,
+                    max((replica_counts.get(name, 1) for name in names), default=1),
+                )
+            )
+            if uds_dir is not None:
+                plan[-1].uds = os.path.join(uds_dir, f"{plan[-1].name}.sock")
+
+    urls = {
+        (group.app_name, name): group.url + apps[group.app_name]["sub_apps"][name].get("path", "")
+        for group in plan
+        for name in group.sub_apps
+    }
+    sockets = {(group.app_name, name): group.uds for group in plan for name in group.sub_apps}
+    for group in plan:
+        app_config = copy.deepcopy(apps[group.app_name])
+        app_config["port"] = group.port
+        for key in ("reload", "workers", "uds"):
+            app_config.pop(key, None)
+        app_config["sub_apps"] = {name: app_config["sub_apps"][name] for name in group.sub_apps}
+        for sub_app in app_config["sub_apps"].values():
+            kwargs = sub_app.get("kwargs", {})
+            for key in list(kwargs):
+                service = key.removesuffix("_url")
+                target = (group.app_name, service)
+                if key.endswith("_url") and target in urls:
+                    kwargs[key] = urls[target]
+                    if sockets[target] is not None:
+                        kwargs[f"{service}_uds"] = sockets[target]
+        group.launch_config = {
+            **{key: value for key, value in launch_config.items() if key != "apps"},
+            "apps": {group.app_name: app_config},
+        }
+    return plan
+
+
+def suffix_path(path: str, suffix: str) -> str:
+    """'./logs/my_app.log.jsonl' -> './logs/my_app-<suffix>.log.jsonl'"""
+    head, name = os.path.split(path)
+    stem, dot, extensions = name.partition(".")
+    return os.path.join(head, f"{stem}-{suffix}{dot}{extensions}")
+
+
+def _load_log_config(log_config) -> dict | None:
+    """A dict config of uvicorn's log_config, None for an ini file (or no config)."""
+    if isinstance(log_config, dict):
+        return copy.deepcopy(log_config)
+    if not isinstance(log_config, str):
+        return None
+    if log_config.endswith(".json"):
+        with open(log_config) as file:
+            return json.load(file)
+    if log_config.endswith((".yaml", ".yml")):
+        with open(log_config) as file:
+            return yaml.safe_load(file)
+    return None
+
+
+def process_launch_config(launch_config: dict, suffix: str) -> dict:
+    """
+    The launch config of one process, writing its own log, trace and capture files.
+
+    Processes appending to and rotating the same files would rotate them from under each other.
+    """
+    launch_config = copy.deepcopy(launch_config)
+    apps = launch_config.get("apps", {})
+    for config in [launch_config, *apps.values()]:
+        log_config = _load_log_config(config.get("log_config"))
+        if log_config is None:
+            if config.get("log_config") is not None:
+                logger.warning("Processes share the files of log config %s", config["log_config"])
+            continue
+        for handler in log_config.get("handlers", {}).values():
+            if "filename" in handler:
+                handler["filename"] = suffix_path(handler["filename"], suffix)
+        config["log_config"] = log_config
+    for app_config in apps.values():
+        for key in ("tracing", "capture"):
+            section = app_config.get(key) or {}
+            if section.get("path"):
+                section["path"] = suffix_path(section["path"], suffix)
+    return launch_config
+
+
+def serve_process(launch_config: dict, sockets: list[socket.socket]):
+    """Entry point of a split process."""
+    # imported here, app.main imports this module for the command line
+    from app.main import AppServerManager
+
+    AppServerManager(launch_config).run(sockets=[sockets])
+
+
+class SupervisedProcess:
+    def __init__(self, group: ProcessGroup, index: int, sockets: list[socket.socket]):
+        self.group = group
+        self.name = f"{group.name}-{index}"
+        self.launch_config = process_launch_config(group.launch_config, self.name)
+        self.sockets = sockets
+        self.process: BaseProcess | None = None
+        self.started_at = 0.0
+        self.failures = 0
+        self.restart_at: float | None = None
+
+    def start(self):
+        context = multiprocessing.get_context("spawn")
+        self.process = context.Process(
+            target=serve_process,
+            args=(self.launch_config, self.sockets),
+            name=self.name,
+        )
+        self.process.start()
+        self.started_at = time.monotonic()
+        self.restart_at = None
+        logger.info("Started %s (pid %s) on %s", self.name, self.process.pid, self.group.url)
+
+    def check(self, now: float):
+        """Restart the process when it exited, waiting longer after every quick failure."""
+        if self.restart_at is not None:
+            if now >= self.restart_at:
+                self.start()
+            return
+        if self.process is None or self.process.is_alive():
+            return
+        self.failures = 0 if now - self.started_at >= STABLE_AFTER else self.failures + 1
+        delay = min(MAX_RESTART_DELAY, 0.5 * 2**self.failures) if self.failures else 0.0
+        logger.warning(
+            "%s exited with code %s, restarting in %.1fs",
+            self.name,
+            self.process.exitcode,
+            delay,
+        )
+        self.restart_at = now + delay
+
+    def stop(self):
+        if self.process is not None and self.process.is_alive():
+            self.process.terminate()
+
+    def join(self, timeout: float):
+        if self.process is None:
+            return
+        self.process.join(timeout)
+        if self.process.is_alive():
+            logger.warning("%s did not stop in %.0fs, killing it", self.name, timeout)
+            self.process.kill()
+            self.process.join()
+
+
+class Supervisor:
+    """Bind the sockets of the process groups, run their processes and restart them."""
+
+    def __init__(self, plan: list[ProcessGroup], check_interval: float = 0.5):
+        self.plan = plan
+        self.check_interval = check_interval
+        self.processes: list[SupervisedProcess] = []
+        self._stopped = threading.Event()
+
+    def bind(self, group: ProcessGroup) -> list[socket.socket]:
+        sockets = [uvicorn.Config("", host=group.host, port=group.port).bind_socket()]
+        if group.uds is not None:
+            if os.path.exists(group.uds):  # left over by a previous run
+                os.remove(group.uds)
+            sockets.append(uvicorn.Config("", uds=group.uds).bind_socket())
+        return sockets
+
+    def run(self):
+        original_handlers = {}
+        if threading.current_thread() is threading.main_thread():
+            original_handlers = {
+                sig: signal.signal(sig, lambda sig, frame: self.stop()) for sig in HANDLED_SIGNALS
+            }
+        sockets = []
+        try:
+            for group in self.plan:
+                group_sockets = self.bind(group)
+                sockets += group_sockets
+                logger.info(
+                    "Serving %s on %s with %d processes",
+                    ", ".join(group.sub_apps),
+                    " and ".join(filter(None, [group.url, group.uds])),
+                    group.replicas,
+                )
+                for index in range(group.replicas):
+                    self.processes.append(SupervisedProcess(group, index, group_sockets))
+            for process in self.processes:
+                process.start()
+            while not self._stopped.wait(self.check_interval):
+                now = time.monotonic()
+                for process in self.processes:
+                    process.check(now)
+        finally:
+            for process in self.processes:
+                process.stop()
+            for process in self.processes:
+                process.join(STOP_TIMEOUT)
+            for sock in sockets:
+                sock.close()
+            for group in self.plan:
+                if group.uds is not None and os.path.exists(group.uds):
+                    os.remove(group.uds)
+            for sig, handler in original_handlers.items():
+                signal.signal(sig, handler)
+
+    def stop(self):
+        self._stopped.set()
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.app_factory import app_factory
+from common.metrics import REGISTRY
+
+
+@pytest.mark.asyncio
+async def test_admission_runs_inside_the_deadline_and_the_metrics():
+    config = {
+        "sub_apps": {
+            "slow_service": {
+                "path": "/slow",
+                "app": "fastapi:FastAPI",
+                "admission": {"max_in_flight": 1, "max_queue": 1, "queue_timeout": 5},
+            }
+        }
+    }
+    app = app_factory("admission_app", config)
+    sub_app: FastAPI = next(route.app for route in app.routes if route.path == "/slow")  # type: ignore
+    release = asyncio.Event()
+
+    @sub_app.get("/{item_id}")
+    async def get_item(item_id: int):
+        await release.wait()
+        return {"id": item_id}
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        running = asyncio.ensure_future(client.get("/slow/1"))
+        await asyncio.sleep(0.05)
+        # waiting for a slot counts against the request deadline
+        response = await client.get("/slow/2", headers={"x-request-timeout-ms": "50"})
+        assert response.status_code == 504
+
+        queued = asyncio.ensure_future(client.get("/slow/3"))
+        await asyncio.sleep(0.05)
+        response = await client.get("/slow/4")
+        assert response.status_code == 503
+        release.set()
+        assert (await running).status_code == 200
+        assert (await queued).status_code == 200
+
+    requests = REGISTRY.get("http_requests").values()  # type: ignore
+    statuses = {labels[-1] for labels in requests if labels[0] == "admission_app.slow_service"}
+    assert {"200", "503", "504"} <= statuses
@@ -1,7 +1,15 @@
+import asyncio
+import logging
+import socket
+import threading
+import time
+
+import httpx
 import pytest
 from httpx import ASGITransport, AsyncClient
 
 from app.app_factory import app_factory
+from app.main import AppServerManager
 
 
 @pytest.fixture
@@ -16,3 +24,182 @@ async def test_root(app):
         response = await ac.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "OK"}
+
+
+@pytest.fixture
+def admin_app():
+    return app_factory(config={"admin": {"token": "secret"}})
+
+
+@pytest.mark.anyio
+async def test_admin_requires_token(admin_app):
+    async with AsyncClient(transport=ASGITransport(app=admin_app), base_url="http://test") as ac:
+        response = await ac.get("/admin/logging/levels")
+        assert response.status_code == 403
+        response = await ac.get("/admin/logging/levels", headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    assert [level["logger"] for level in response.json()] == ["root", "app"]
+
+
+@pytest.mark.anyio
+async def test_admin_routes_disabled_by_default(app):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/admin/logging/levels")
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_admin_routes_need_a_token():
+    app = app_factory(config={"admin": {"path": "/admin"}})
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/admin/logging/levels")
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_set_log_level_with_revert(admin_app):
+    logger = logging.getLogger("app")
+    logger.setLevel(logging.WARNING)
+    headers = {"X-Admin-Token": "secret"}
+    async with AsyncClient(transport=ASGITransport(app=admin_app), base_url="http://test") as ac:
+        response = await ac.put(
+            "/admin/logging/levels/app",
+            json={"level": "DEBUG", "revert_after": 0.1},
+            headers=headers,
+        )
+        assert response.status_code == 200
+        assert response.json()["level"] == "DEBUG"
+        assert response.json()["revert_to"] == "WARNING"
+        assert logger.level == logging.DEBUG
+        await asyncio.sleep(0.2)
+        assert logger.level == logging.WARNING
+
+        response = await ac.put(
+            "/admin/logging/levels/app", json={"level": "LOUD"}, headers=headers
+        )
+        assert response.status_code == 422
+    logger.setLevel(logging.NOTSET)
+
+
+@pytest.mark.anyio
+async def test_metrics_endpoint(app):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.get("/health")
+        response = await ac.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'http_requests_total{sub_app="app",method="GET",route="/health",status="200"}' in (
+        response.text
+    )
+
+
+@pytest.mark.anyio
+async def test_admin_traces(admin_app):
+    headers = {"X-Admin-Token": "secret"}
+    async with AsyncClient(transport=ASGITransport(app=admin_app), base_url="http://test") as ac:
+        response = await ac.get("/health")
+        response = await ac.get("/admin/traces", headers=headers)
+    assert response.status_code == 200
+    spans = response.json()["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert "GET /health" in [span["name"] for span in spans]
+
+
+@pytest.mark.anyio
+async def test_loop_monitor_disabled_by_default(admin_app):
+    headers = {"X-Admin-Token": "secret"}
+    async with AsyncClient(transport=ASGITransport(app=admin_app), base_url="http://test") as ac:
+        response = await ac.get("/admin/debug/loop", headers=headers)
+    assert response.status_code == 404
+
+
+@pytest.mark.anyio
+async def test_profile_endpoint(admin_app):
+    headers = {"X-Admin-Token": "secret"}
+    async with AsyncClient(transport=ASGITransport(app=admin_app), base_url="http://test") as ac:
+        response = await ac.get("/admin/debug/profile?seconds=0.05", headers=headers)
+    assert response.status_code == 200
+    assert int(response.headers["x-profile-samples"]) > 0
+    assert all(line.rpartition(" ")[2].isdigit() for line in response.text.splitlines())
+
+
+@pytest.mark.anyio
+async def test_memory_snapshot_diff_endpoints(admin_app):
+    headers = {"X-Admin-Token": "secret"}
+    async with AsyncClient(transport=ASGITransport(app=admin_app), base_url="http://test") as ac:
+        response = await ac.post("/admin/debug/memory/snapshots", headers=headers)
+        assert response.status_code == 409  # not tracing yet
+        await ac.post("/admin/debug/memory/start", headers=headers)
+        try:
+            first = (await ac.post("/admin/debug/memory/snapshots", headers=headers)).json()
+            second = (await ac.post("/admin/debug/memory/snapshots", headers=headers)).json()
+            response = await ac.get(
+                "/admin/debug/memory/diff",
+                params={"first": first["id"], "second": second["id"], "group_by": "sub_app"},
+                headers=headers,
+            )
+        finally:
+            await ac.post("/admin/debug/memory/stop", headers=headers)
+    assert response.status_code == 200
+    assert all({"key", "size_diff", "count_diff"} <= entry.keys() for entry in response.json())
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_started(manager: AppServerManager, count: int, thread: threading.Thread):
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline and thread.is_alive():
+        if len(manager.servers) == count and all(server.started for server in manager.servers):
+            return
+        time.sleep(0.05)
+    raise AssertionError("servers did not start")
+
+
+def test_threaded_servers_run_on_their_own_loops():
+    ports = [_free_port(), _free_port()]
+    manager = AppServerManager(
+        {
+            "threaded": True,
+            "apps": {
+                f"app{i}": {"host": "127.0.0.1", "port": port, "log_config": None}
+                for i, port in enumerate(ports)
+            },
+        }
+    )
+    runner = threading.Thread(target=manager.run)
+    runner.start()
+    try:
+        _wait_until_started(manager, 2, runner)
+        for port in ports:
+            assert httpx.get(f"http://127.0.0.1:{port}/health").json() == {"status": "OK"}
+        server_threads = {t.name for t in threading.enumerate() if t.name.endswith("-server")}
+        assert {"app0-server", "app1-server"} <= server_threads
+    finally:
+        manager.stop()
+        runner.join(10)
+    assert not runner.is_alive()
+
+
+def test_threaded_servers_stop_together_when_one_fails():
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        manager = AppServerManager(
+            {
+                "threaded": True,
+                "apps": {
+                    "app0": {"host": "127.0.0.1", "port": _free_port(), "log_config": None},
+                    "app1": {
+                        "host": "127.0.0.1",
+                        "port": taken.getsockname()[1],
+                        "log_config": None,
+                    },
+                },
+            }
+        )
+        with pytest.raises(SystemExit):
+            manager.run()
+    assert not any(t.name == "app0-server" for t in threading.enumerate())
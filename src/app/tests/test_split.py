@@ -0,0 +1,120 @@
+import json
+
+import pytest
+
+from app.split import SupervisedProcess, plan_split, process_launch_config
+
+LAUNCH_CONFIG = {
+    "log_config": "log_config.json",
+    "apps": {
+        "app": {
+            "host": "0.0.0.0",
+            "port": 8000,
+            "reload": True,
+            "sub_apps": {
+                "pet_service": {"path": "/pet", "kwargs": {"database_url": "sqlite:///pets.db"}},
+                "user_service": {
+                    "path": "/user",
+                    "kwargs": {"pet_service_url": "http://localhost:8000/pet"},
+                },
+                "template_service": {"path": "/template"},
+            },
+        },
+        "app1": {"port": 8001, "sub_apps": {"other_service": {"path": "/other"}}},
+    },
+}
+
+
+def test_every_sub_app_gets_its_own_port():
+    plan = plan_split(LAUNCH_CONFIG)
+    assert [(group.name, group.port) for group in plan] == [
+        ("app.pet_service", 8000),
+        ("app.user_service", 8002),  # 8001 belongs to app1
+        ("app.template_service", 8003),
+        ("app1.other_service", 8001),
+    ]
+    user_group = plan[1]
+    assert user_group.launch_config["log_config"] == "log_config.json"
+    app_config = user_group.launch_config["apps"]["app"]
+    assert app_config["port"] == 8002
+    assert "reload" not in app_config
+    assert list(app_config["sub_apps"]) == ["user_service"]
+    kwargs = app_config["sub_apps"]["user_service"]["kwargs"]
+    assert kwargs["pet_service_url"] == "http://127.0.0.1:8000/pet"
+    # the loaded config is not modified
+    assert LAUNCH_CONFIG["apps"]["app"]["sub_apps"]["user_service"]["kwargs"] == {
+        "pet_service_url": "http://localhost:8000/pet"
+    }
+
+
+def test_groups_and_replicas():
+    plan = plan_split(
+        LAUNCH_CONFIG, groups=["user_service,template_service"], replicas=["pet_service=3"]
+    )
+    assert [(group.name, group.port, group.replicas) for group in plan] == [
+        ("app.user_service+template_service", 8000, 1),
+        ("app.pet_service", 8002, 3),
+        ("app1.other_service", 8001, 1),
+    ]
+    kwargs = plan[0].launch_config["apps"]["app"]["sub_apps"]["user_service"]["kwargs"]
+    assert kwargs["pet_service_url"] == "http://127.0.0.1:8002/pet"
+
+
+@pytest.mark.parametrize(
+    "groups, replicas",
+    [
+        (["pet_service,missing"], []),
+        ([], ["missing=2"]),
+        ([], ["pet_service=0"]),
+        (["pet_service,user_service", "pet_service"], []),
+    ],
+)
+def test_invalid_split(groups, replicas):
+    with pytest.raises(ValueError):
+        plan_split(LAUNCH_CONFIG, groups, replicas)
+
+
+def test_unix_sockets_are_passed_to_callers():
+    plan = plan_split(LAUNCH_CONFIG, uds_dir="/run/app")
+    assert plan[0].uds == "/run/app/app.pet_service.sock"
+    kwargs = plan[1].launch_config["apps"]["app"]["sub_apps"]["user_service"]["kwargs"]
+    assert kwargs["pet_service_url"] == "http://127.0.0.1:8000/pet"
+    assert kwargs["pet_service_uds"] == "/run/app/app.pet_service.sock"
+
+
+def test_every_process_writes_its_own_files(tmp_path):
+    log_config = tmp_path / "log_config.json"
+    handlers = {
+        "stdout": {"class": "logging.StreamHandler"},
+        "file": {"class": "logging.FileHandler", "filename": "./logs/my_app.log.jsonl"},
+    }
+    log_config.write_text(json.dumps({"version": 1, "handlers": handlers}))
+    launch_config = {
+        "log_config": str(log_config),
+        "apps": {
+            "app": {
+                "log_config": str(log_config),
+                "tracing": {"path": "./logs/traces.jsonl"},
+                "sub_apps": {"pet_service": {"path": "/pet"}},
+            }
+        },
+    }
+    plan = plan_split(launch_config, replicas=["pet_service=2"])
+    processes = [SupervisedProcess(plan[0], index, []) for index in range(2)]
+    app_config = processes[1].launch_config["apps"]["app"]
+    assert app_config["log_config"]["handlers"] == {
+        "stdout": {"class": "logging.StreamHandler"},
+        "file": {
+            "class": "logging.FileHandler",
+            "filename": "./logs/my_app-app.pet_service-1.log.jsonl",
+        },
+    }
+    assert app_config["tracing"]["path"] == "./logs/traces-app.pet_service-1.jsonl"
+    assert processes[0].launch_config["apps"]["app"]["tracing"]["path"] == (
+        "./logs/traces-app.pet_service-0.jsonl"
+    )
+
+    supervisor_config = process_launch_config(launch_config, "supervisor")
+    handler = supervisor_config["log_config"]["handlers"]["file"]
+    assert handler["filename"] == "./logs/my_app-supervisor.log.jsonl"
+    assert launch_config["apps"]["app"]["tracing"]["path"] == "./logs/traces.jsonl"
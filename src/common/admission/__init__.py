@@ -0,0 +1,3 @@
+from .controller import AdmissionController as AdmissionController
+from .controller import AdmissionRejected as AdmissionRejected
+from .middleware import AdmissionMiddleware as AdmissionMiddleware
@@ -0,0 +1,167 @@
+import asyncio
+import math
+import re
+from collections import deque
+from typing import Iterable
+
+from starlette.types import Scope
+
+from common.metrics import REGISTRY
+
+HIGH, NORMAL, LOW = 0, 1, 2
+PRIORITY_NAMES = ("high", "normal", "low")
+
+DEFAULT_QUEUE_TIMEOUT = 1.0
+DEFAULT_HIGH_PRIORITY_PATHS = (r"^/health",)
+# weight of the latest request in the moving average latency used for Retry-After
+LATENCY_SMOOTHING = 0.1
+
+QUEUED = REGISTRY.gauge("admission_queued", "Requests waiting for a slot.", ("sub_app", "priority"))
+REJECTED = REGISTRY.counter(
+    "admission_rejected",
+    "Requests answered 503 by admission control, by reason (queue_full, evicted, timeout).",
+    ("sub_app", "priority", "reason"),
+)
+QUEUE_WAIT = REGISTRY.histogram(
+    "admission_queue_wait_seconds", "Time admitted requests waited for a slot.", ("sub_app",)
+)
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Limit the requests a sub app handles at once, queueing the excess by priority.
+
+    Up to `max_in_flight` requests run, up to `max_queue` more wait at most `queue_timeout`
+    seconds for a slot, higher priorities first. A request arriving at a full queue takes the place
+    of the newest waiter of a lower priority, or is rejected. Rejected requests get a Retry-After
+    estimated from the recent latency and the queue length.
+
+    Priorities: paths matching `high_priority_paths` (health checks) are high, paths matching
+    `low_priority_paths` are low. Other GET requests are normal when they address a single item
+    (the last path segment is a number, e.g. /user/1) and low otherwise, as listing endpoints are
+    the expensive ones. Other methods are normal. Paths are relative to the sub app mount.
+    """
+
+    def __init__(
+        self,
+        sub_app: str,
+        max_in_flight: int,
+        max_queue: int = 0,
+        queue_timeout: float = DEFAULT_QUEUE_TIMEOUT,
+        high_priority_paths: Iterable[str] = DEFAULT_HIGH_PRIORITY_PATHS,
+        low_priority_paths: Iterable[str] = (),
+    ):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.sub_app = sub_app
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.high_priority_paths = [re.compile(pattern) for pattern in high_priority_paths]
+        self.low_priority_paths = [re.compile(pattern) for pattern in low_priority_paths]
+        self.in_flight = 0
+        self.queues: tuple[deque[asyncio.Future], ...] = tuple(deque() for _ in PRIORITY_NAMES)
+        self.admitted = 0
+        self.rejected = {"queue_full": 0, "evicted": 0, "timeout": 0}
+        self.average_latency = 0.0
+
+    def priority(self, scope: Scope) -> int:
+        path = scope["path"].removeprefix(scope.get("root_path", "")) or "/"
+        if any(pattern.search(path) for pattern in self.high_priority_paths):
+            return HIGH
+        if any(pattern.search(path) for pattern in self.low_priority_paths):
+            return LOW
+        if scope["method"] in ("GET", "HEAD"):
+            return NORMAL if path.rstrip("/").rpartition("/")[2].isdigit() else LOW
+        return NORMAL
+
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self.queues)
+
+    def retry_after(self) -> int:
+        """Seconds until the queue has likely drained, at least 1."""
+        drain = self.average_latency * (self.queued() + 1) / self.max_in_flight
+        return max(1, math.ceil(drain))
+
+    def _reject(self, priority: int, reason: str) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        REJECTED.inc(self.sub_app, PRIORITY_NAMES[priority], reason)
+        return AdmissionRejected(reason, self.retry_after())
+
+    def _make_room(self, priority: int) -> bool:
+        """Evict the newest waiter of a lower priority than `priority`, if any."""
+        for lower in range(len(self.queues) - 1, priority, -1):
+            if self.queues[lower]:
+                evicted = self.queues[lower].pop()
+                QUEUED.dec(self.sub_app, PRIORITY_NAMES[lower])
+                evicted.set_exception(self._reject(lower, "evicted"))
+                return True
+        return False
+
+    async def acquire(self, priority: int = NORMAL):
+        """Wait for a slot, raise AdmissionRejected when there is none. Pair with release."""
+        if self.in_flight < self.max_in_flight and not self.queued():
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if self.queued() >= self.max_queue and not self._make_room(priority):
+            raise self._reject(priority, "queue_full")
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        queue = self.queues[priority]
+        queue.append(future)
+        QUEUED.inc(self.sub_app, PRIORITY_NAMES[priority])
+        start = loop.time()
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await asyncio.shield(future)
+        except (TimeoutError, asyncio.CancelledError) as e:
+            if not future.done():
+                queue.remove(future)
+                QUEUED.dec(self.sub_app, PRIORITY_NAMES[priority])
+                future.cancel()
+                if isinstance(e, TimeoutError):
+                    raise self._reject(priority, "timeout") from None
+                raise
+            # the wait ended as the future was resolved, always consume its outcome
+            if (evicted := future.exception()) is not None:
+                if isinstance(e, TimeoutError):
+                    raise evicted from None
+                raise
+            if isinstance(e, asyncio.CancelledError):
+                # the slot was handed over as the caller went away
+                self.release()
+                raise
+        self.admitted += 1
+        QUEUE_WAIT.observe(loop.time() - start, self.sub_app)
+
+    def release(self, latency: float | None = None):
+        """Free a slot, handing it over to the first waiter of the highest priority."""
+        if latency is not None:
+            self.average_latency += LATENCY_SMOOTHING * (latency - self.average_latency)
+        for priority, queue in enumerate(self.queues):
+            if queue:
+                QUEUED.dec(self.sub_app, PRIORITY_NAMES[priority])
+                queue.popleft().set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "max_queue": self.max_queue,
+            "queued": {name: len(queue) for name, queue in zip(PRIORITY_NAMES, self.queues)},
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "average_latency_ms": round(self.average_latency * 1000, 3),
+            "retry_after": self.retry_after(),
+        }
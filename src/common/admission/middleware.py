@@ -0,0 +1,38 @@
+import time
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .controller import AdmissionController, AdmissionRejected
+
+
+class AdmissionMiddleware:
+    """
+    Admit the requests of a sub app through its AdmissionController, answer 503 with a
+    Retry-After header right away when it is saturated instead of letting every request slow down.
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.controller.acquire(self.controller.priority(scope))
+        except AdmissionRejected as e:
+            response = JSONResponse(
+                {"detail": "server overloaded, retry later"},
+                status_code=503,
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(time.perf_counter() - start)
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from ...admission import AdmissionController, AdmissionMiddleware, AdmissionRejected
+from ..controller import HIGH, LOW, NORMAL
+
+
+def scope(method: str, path: str, root_path: str = "/user") -> dict:
+    return {"type": "http", "method": method, "path": root_path + path, "root_path": root_path}
+
+
+def test_priorities():
+    controller = AdmissionController("app.user_service", 1, low_priority_paths=[r"^/search"])
+    assert controller.priority(scope("GET", "/health")) == HIGH
+    assert controller.priority(scope("GET", "/1")) == NORMAL
+    assert controller.priority(scope("PATCH", "/1")) == NORMAL
+    assert controller.priority(scope("POST", "/")) == NORMAL
+    assert controller.priority(scope("GET", "/")) == LOW
+    assert controller.priority(scope("GET", "")) == LOW
+    assert controller.priority(scope("POST", "/search")) == LOW
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_admitted_by_priority():
+    controller = AdmissionController("app.user_service", 1, max_queue=3)
+    await controller.acquire()
+    admitted: list[str] = []
+
+    async def request(name: str, priority: int):
+        await controller.acquire(priority)
+        admitted.append(name)
+        controller.release()
+
+    tasks = [
+        asyncio.ensure_future(request(name, priority))
+        for name, priority in [("list", LOW), ("get", NORMAL), ("health", HIGH)]
+    ]
+    await asyncio.sleep(0)
+    assert controller.stats()["queued"] == {"high": 1, "normal": 1, "low": 1}
+    controller.release()
+    await asyncio.gather(*tasks)
+    assert admitted == ["health", "get", "list"]
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_or_evicts_lower_priorities():
+    controller = AdmissionController("app.user_service", 1, max_queue=1)
+    await controller.acquire()
+    waiting_list = asyncio.ensure_future(controller.acquire(LOW))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as info:
+        await controller.acquire(LOW)
+    assert info.value.reason == "queue_full"
+
+    waiting_get = asyncio.ensure_future(controller.acquire(NORMAL))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as info:
+        await waiting_list
+    assert info.value.reason == "evicted"
+
+    controller.release()
+    await waiting_get
+    assert controller.stats()["rejected"] == {"queue_full": 1, "evicted": 1, "timeout": 0}
+
+
+@pytest.mark.asyncio
+async def test_evicted_waiter_is_counted_once():
+    controller = AdmissionController("app.user_service", 1, max_queue=1)
+    await controller.acquire()
+    waiter = asyncio.ensure_future(controller.acquire(LOW))
+    await asyncio.sleep(0)
+    assert controller._make_room(HIGH)
+    # the caller goes away as it is evicted
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert controller.stats()["rejected"] == {"queue_full": 0, "evicted": 1, "timeout": 0}
+    assert controller.queued() == 0
+
+
+@pytest.mark.asyncio
+async def test_waiters_time_out():
+    controller = AdmissionController("app.user_service", 1, max_queue=1, queue_timeout=0.01)
+    await controller.acquire()
+    with pytest.raises(AdmissionRejected) as info:
+        await controller.acquire()
+    assert info.value.reason == "timeout"
+    assert info.value.retry_after >= 1
+    assert controller.queued() == 0
+    controller.release()
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_middleware_answers_503_when_saturated():
+    release = asyncio.Event()
+    app = FastAPI()
+
+    @app.get("/{user_id}")
+    async def get_user(user_id: int):
+        await release.wait()
+        return {"id": user_id}
+
+    controller = AdmissionController("app.user_service", 1)
+    app.add_middleware(AdmissionMiddleware, controller=controller)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        pending = asyncio.ensure_future(client.get("/1"))
+        await asyncio.sleep(0.05)
+        response = await client.get("/2")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+        release.set()
+        assert (await pending).status_code == 200
+    assert controller.in_flight == 0
@@ -0,0 +1,3 @@
+from .recorder import TrafficRecorder as TrafficRecorder
+from .recorder import sample_request as sample_request
+from .middleware import TrafficCaptureMiddleware as TrafficCaptureMiddleware
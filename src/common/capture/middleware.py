@@ -0,0 +1,81 @@
+import base64
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from common.logging.getLogger import current_request_id_ctx
+from common.metrics.middleware import route_template
+
+from .recorder import TrafficRecorder
+
+CAPTURED_HEADERS = (b"content-type", b"accept")
+
+
+class TrafficCaptureMiddleware:
+    """
+    Capture the sampled requests of a sub app with their body, status and timing, for replay.
+
+    Must be installed inside LoggerContextMiddleware, requests are sampled by their request id so
+    the internal calls of a captured request are captured too and can be told apart on replay.
+    """
+
+    def __init__(self, app: ASGIApp, sub_app: str, recorder: TrafficRecorder):
+        self.app = app
+        self.sub_app = sub_app
+        self.recorder = recorder
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request_id = current_request_id_ctx.get()
+        if scope["type"] != "http" or not self.recorder.sampled(request_id):
+            await self.app(scope, receive, send)
+            return
+
+        body = bytearray()
+        truncated = False
+        status = 500
+
+        async def receive_with_body() -> Message:
+            nonlocal truncated
+            message = await receive()
+            if message["type"] == "http.request":
+                chunk = message.get("body", b"")
+                room = self.recorder.max_body_bytes - len(body)
+                truncated = truncated or len(chunk) > room
+                body.extend(chunk[: max(room, 0)])
+            return message
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start_time = time.time()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive_with_body, send_with_status)
+        finally:
+            duration = time.perf_counter() - start
+            request = {
+                "time": start_time,
+                "request_id": request_id,
+                "sub_app": self.sub_app,
+                "method": scope["method"],
+                "path": scope["path"],
+                "query_string": scope.get("query_string", b"").decode("latin-1"),
+                "route": route_template(scope),
+                "headers": {
+                    key.decode("latin-1"): value.decode("latin-1")
+                    for key, value in scope.get("headers", [])
+                    if key in CAPTURED_HEADERS
+                },
+                "status": status,
+                "duration_ms": round(duration * 1000, 3),
+            }
+            try:
+                request["body"] = body.decode()
+            except UnicodeDecodeError:
+                request["body_base64"] = base64.b64encode(body).decode()
+            if truncated:
+                request["body_truncated"] = True
+            self.recorder.record(request)
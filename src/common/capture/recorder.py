@@ -0,0 +1,76 @@
+import json
+import queue
+import sys
+import threading
+import traceback
+import zlib
+from typing import Any
+
+
+def sample_request(request_id: str, sample_rate: float) -> bool:
+    """
+    Deterministic sampling by request id, so every hop of a sampled request is captured,
+    including the calls a service makes to another one (in this process or another).
+    """
+    if sample_rate >= 1.0:
+        return True
+    return zlib.crc32(request_id.encode()) < sample_rate * 2**32
+
+
+class TrafficRecorder:
+    """
+    Append captured requests to a JSONL file, one request per line.
+    The file is written by a background thread so capturing never blocks the event loop.
+
+    :param sample_rate: fraction of the request ids captured.
+    :param max_body_bytes: request bodies are cut at this size and marked `body_truncated`.
+    """
+
+    def __init__(self, path: str, sample_rate: float = 1.0, max_body_bytes: int = 65536):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_body_bytes = max_body_bytes
+        self._jobs: queue.SimpleQueue[dict[str, Any] | None] = queue.SimpleQueue()
+        self._worker: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def sampled(self, request_id: str | None) -> bool:
+        return request_id is not None and sample_request(request_id, self.sample_rate)
+
+    def record(self, request: dict[str, Any]):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(
+                        target=self._work, name=type(self).__name__, daemon=True
+                    )
+                    self._worker.start()
+        self._jobs.put(request)
+
+    def _work(self):
+        stop = False
+        while not stop:
+            batch = [self._jobs.get()]
+            while True:  # drain whatever else is queued into the same write
+                try:
+                    batch.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stop = True
+            lines = [json.dumps(request) + "\n" for request in batch if request is not None]
+            if not lines:
+                continue
+            try:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.writelines(lines)
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+
+    def close(self):
+        """Flush the requests still queued for the file and stop the writer thread."""
+        with self._lock:
+            if self._worker is not None:
+                self._jobs.put(None)
+                self._worker.join()
+                self._worker = None
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from common.logging.middleware import LoggerContextMiddleware
+
+from ...capture import TrafficCaptureMiddleware, TrafficRecorder, sample_request
+
+
+def test_sampling_is_deterministic_per_request_id():
+    request_ids = [f"request-{i}" for i in range(1000)]
+    sampled = [request_id for request_id in request_ids if sample_request(request_id, 0.25)]
+    assert 150 < len(sampled) < 350
+    assert sampled == [request_id for request_id in request_ids if sample_request(request_id, 0.25)]
+    assert all(sample_request(request_id, 1.0) for request_id in request_ids)
+    assert not any(sample_request(request_id, 0.0) for request_id in request_ids)
+
+
+@pytest.mark.asyncio
+async def test_middleware_captures_sampled_requests(tmp_path):
+    path = tmp_path / "capture.jsonl"
+    recorder = TrafficRecorder(str(path), max_body_bytes=16)
+    sub_app = FastAPI()
+
+    @sub_app.post("/{pet_id}")
+    async def update_pet(pet_id: int, body: dict):
+        return {"pet_id": pet_id}
+
+    sub_app.add_middleware(TrafficCaptureMiddleware, sub_app="app.pet_service", recorder=recorder)
+    sub_app.add_middleware(LoggerContextMiddleware, logger_name="app.pet_service")
+    app = FastAPI()
+    app.mount("/pet", sub_app)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.post(
+            "/pet/1?verbose=1", json={"name": "rex"}, headers={"x-request-id": "first"}
+        )
+        assert response.status_code == 200
+        await client.post("/pet/2", json={"name": "a much longer name"})
+    recorder.close()
+
+    first, second = [json.loads(line) for line in path.read_text().splitlines()]
+    assert first["request_id"] == "first"
+    assert first["sub_app"] == "app.pet_service"
+    assert (first["method"], first["path"], first["route"]) == ("POST", "/pet/1", "/pet/{pet_id}")
+    assert first["query_string"] == "verbose=1"
+    assert first["headers"] == {"content-type": "application/json", "accept": "*/*"}
+    assert json.loads(first["body"]) == {"name": "rex"}
+    assert first["status"] == 200
+    assert first["duration_ms"] > 0
+    assert second["body_truncated"]
+    assert len(second["body"]) == 16
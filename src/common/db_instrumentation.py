@@ -0,0 +1,246 @@
+"""
+SQLAlchemy engine hooks attributing database time to the current request.
+
+Services call instrument_engine on the engine they create, query time and count are added to the
+current span (see common.tracing), query time to the Server-Timing header (see common.timing)
+and query counts to the metrics, labelled by the sub app of the current logger context.
+With QueryStatsMiddleware installed, statements repeated more than `repeat_threshold` times in
+one request (an N+1 query pattern) are logged as warnings.
+Statements of a request that expired or whose client disconnected (see common.deadline) raise
+DeadlineExceeded instead of running.
+Statements slower than `slow_query_threshold_ms` are logged to the "db.slow_query" logger with
+their parameters, the calling service method and, on SQLite, the EXPLAIN QUERY PLAN output
+captured once per statement shape (for the MAX_QUERY_PLANS most recently slow ones).
+"""
+
+import functools
+import logging
+import re
+import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from contextvars import ContextVar
+
+from sqlalchemy import Engine, event
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from common.deadline import check_deadline
+from common.logging.getLogger import (
+    current_logger_ctx,
+    current_request_id_ctx,
+    getContextualLogger,
+)
+from common.metrics import REGISTRY
+from common.timing import record_time
+from common.tracing import current_span_ctx
+
+DEFAULT_REPEAT_THRESHOLD = 10
+SLOW_QUERY_LOGGER_NAME = "db.slow_query"
+MAX_LOGGED_PARAMETERS_LENGTH = 1000
+# every statement with inlined literals is a shape of its own, bound the cached plans
+MAX_QUERY_PLANS = 256
+_START_TIMES_KEY = "query_start_times"
+_NOT_CACHED = object()
+_SERVICE_MODULE_SUFFIX = ".core.service"
+
+slow_query_logger = logging.getLogger(SLOW_QUERY_LOGGER_NAME)
+
+QUERIES = REGISTRY.counter("db_queries", "SQL statements executed.", ("sub_app",))
+QUERY_DURATION = REGISTRY.histogram(
+    "db_query_duration_seconds", "SQL statement execution time.", ("sub_app",)
+)
+QUERIES_PER_REQUEST = REGISTRY.histogram(
+    "db_queries_per_request",
+    "SQL statements executed per request.",
+    ("sub_app",),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+REPEATED_STATEMENTS = REGISTRY.counter(
+    "db_repeated_statements",
+    "Requests in which a statement shape repeated more than the threshold (N+1 queries).",
+    ("sub_app",),
+)
+
+
+class QueryStats:
+    """Statements executed by a single request, grouped by shape."""
+
+    __slots__ = ("count", "duration", "shapes")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: dict[str, int] = {}
+
+
+current_query_stats_ctx: ContextVar[QueryStats | None] = ContextVar(
+    "current_query_stats", default=None
+)
+
+_IN_LIST_PATTERN = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+@functools.lru_cache(maxsize=1024)
+def statement_shape(statement: str) -> str:
+    """The statement with whitespace and expanded IN (?, ?, ...) lists collapsed."""
+    return _IN_LIST_PATTERN.sub("(?)", _WHITESPACE_PATTERN.sub(" ", statement).strip())
+
+
+def calling_service_method() -> str | None:
+    """The innermost services.<name>.core.service function on the stack, e.g. PetService.get_pet."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.endswith(_SERVICE_MODULE_SUFFIX):
+            return f"{module}.{frame.f_code.co_qualname}"
+        frame = frame.f_back
+    return None
+
+
+def explain_query_plan(conn, statement: str, parameters, executemany: bool) -> list[str] | None:
+    """EXPLAIN QUERY PLAN of a SQLite statement, run on a separate raw DBAPI cursor."""
+    if conn.dialect.name != "sqlite":
+        return None
+    if executemany:
+        parameters = parameters[0] if parameters else ()
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters or ())
+        # rows are (id, parent, notused, detail)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+class _EngineInstrumentation:
+    def __init__(self, repeat_threshold: int, slow_query_threshold_ms: float | None):
+        self.repeat_threshold = repeat_threshold
+        self.slow_query_threshold_ms = slow_query_threshold_ms
+        self.query_plans: OrderedDict[str, list[str] | None] = OrderedDict()
+        self._query_plans_lock = threading.Lock()
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        check_deadline()
+        conn.info.setdefault(_START_TIMES_KEY, []).append(time.perf_counter())
+
+    def after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info[_START_TIMES_KEY].pop()
+        record_time("db", elapsed)
+        span = current_span_ctx.get()
+        if span is not None:
+            span.add("db.duration_ms", elapsed * 1000)
+            span.add("db.statement_count", 1)
+        sub_app = current_logger_ctx.get() or ""
+        QUERIES.inc(sub_app)
+        QUERY_DURATION.observe(elapsed, sub_app)
+        if (
+            self.slow_query_threshold_ms is not None
+            and elapsed * 1000 >= self.slow_query_threshold_ms
+        ):
+            self.log_slow_query(conn, statement, parameters, executemany, elapsed, sub_app)
+
+        stats = current_query_stats_ctx.get()
+        if stats is None:
+            return
+        stats.count += 1
+        stats.duration += elapsed
+        shape = statement_shape(statement)
+        repeats = stats.shapes[shape] = stats.shapes.get(shape, 0) + 1
+        if repeats == self.repeat_threshold + 1:
+            REPEATED_STATEMENTS.inc(sub_app)
+            getContextualLogger().warning(
+                "Statement repeated more than %d times in one request, possible N+1 query",
+                self.repeat_threshold,
+                extra={"statement": shape},
+            )
+
+    def log_slow_query(self, conn, statement, parameters, executemany, elapsed, sub_app):
+        shape = statement_shape(statement)
+        query_plan = self.cached_query_plan(shape)
+        if query_plan is _NOT_CACHED:
+            try:
+                query_plan = explain_query_plan(conn, statement, parameters, executemany)
+            except Exception as e:
+                slow_query_logger.debug("Failed to explain query plan", extra={"error": str(e)})
+                query_plan = None
+            with self._query_plans_lock:
+                self.query_plans[shape] = query_plan
+                while len(self.query_plans) > MAX_QUERY_PLANS:
+                    self.query_plans.popitem(last=False)
+        slow_query_logger.warning(
+            "Slow query",
+            extra={
+                "statement": shape,
+                "parameters": repr(parameters)[:MAX_LOGGED_PARAMETERS_LENGTH],
+                "duration_ms": round(elapsed * 1000, 3),
+                "threshold_ms": self.slow_query_threshold_ms,
+                "caller": calling_service_method(),
+                "query_plan": query_plan,
+                "sub_app": sub_app,
+                "request_id": current_request_id_ctx.get(),
+            },
+        )
+
+    def cached_query_plan(self, shape: str):
+        """The query plan of `shape`, _NOT_CACHED unless it was explained before."""
+        with self._query_plans_lock:
+            if shape not in self.query_plans:
+                return _NOT_CACHED
+            self.query_plans.move_to_end(shape)
+            return self.query_plans[shape]
+
+    def handle_error(self, exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get(_START_TIMES_KEY):
+            connection.info[_START_TIMES_KEY].pop()
+
+
+_instrumentations: weakref.WeakKeyDictionary[Engine, _EngineInstrumentation] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def instrument_engine(
+    engine: Engine,
+    repeat_threshold: int = DEFAULT_REPEAT_THRESHOLD,
+    slow_query_threshold_ms: float | None = None,
+) -> Engine:
+    """
+    :param repeat_threshold: warn when a statement shape repeats more often in one request.
+    :param slow_query_threshold_ms: log statements taking at least this long, None disables it.
+    """
+    instrumentation = _instrumentations.get(engine)
+    if instrumentation is not None:
+        instrumentation.repeat_threshold = repeat_threshold
+        instrumentation.slow_query_threshold_ms = slow_query_threshold_ms
+        return engine
+    instrumentation = _instrumentations[engine] = _EngineInstrumentation(
+        repeat_threshold, slow_query_threshold_ms
+    )
+    event.listen(engine, "before_cursor_execute", instrumentation.before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", instrumentation.after_cursor_execute)
+    event.listen(engine, "handle_error", instrumentation.handle_error)
+    return engine
+
+
+class QueryStatsMiddleware:
+    """Collect the statements of each request, needed to detect N+1 queries."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = current_query_stats_ctx.set(stats)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_query_stats_ctx.reset(token)
+            QUERIES_PER_REQUEST.observe(stats.count, current_logger_ctx.get() or "")
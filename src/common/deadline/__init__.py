@@ -0,0 +1,8 @@
+from .deadline import DEADLINE_HEADER as DEADLINE_HEADER
+from .deadline import Deadline as Deadline
+from .deadline import DeadlineExceeded as DeadlineExceeded
+from .deadline import check_deadline as check_deadline
+from .deadline import current_deadline_ctx as current_deadline_ctx
+from .deadline import deadline_headers as deadline_headers
+from .deadline import remaining_time as remaining_time
+from .middleware import DeadlineMiddleware as DeadlineMiddleware
@@ -0,0 +1,60 @@
+import time
+from contextvars import ContextVar
+
+DEADLINE_HEADER = "x-request-timeout-ms"
+# left to the caller for the network and its own work after the call returns
+PROPAGATION_MARGIN_MS = 10
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request ran out of time or its client went away, its result would not be read."""
+
+
+class Deadline:
+    """When the current request must be answered by, and whether it was cancelled early."""
+
+    __slots__ = ("expires_at", "cancelled")
+
+    def __init__(self, timeout: float | None = None):
+        self.expires_at = None if timeout is None else time.monotonic() + timeout
+        self.cancelled = False
+
+    def remaining(self) -> float | None:
+        """Seconds left, None without a deadline."""
+        if self.expires_at is None:
+            return None
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        if self.cancelled:
+            return True
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded("client disconnected" if self.cancelled else "deadline exceeded")
+
+
+current_deadline_ctx: ContextVar[Deadline | None] = ContextVar("current_deadline", default=None)
+
+
+def remaining_time() -> float | None:
+    """Seconds left to answer the current request, None without a deadline or request."""
+    deadline = current_deadline_ctx.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def check_deadline():
+    """Raise DeadlineExceeded when the current request expired, for work that can't be cancelled."""
+    deadline = current_deadline_ctx.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def deadline_headers() -> dict[str, str]:
+    """The deadline header of an outgoing call, the time left minus a margin for the caller."""
+    remaining = remaining_time()
+    if remaining is None:
+        return {}
+    return {DEADLINE_HEADER: str(max(1, int(remaining * 1000) - PROPAGATION_MARGIN_MS))}
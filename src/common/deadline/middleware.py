@@ -0,0 +1,126 @@
+import asyncio
+
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from common.logging.getLogger import getContextualLogger
+from common.metrics import REGISTRY
+
+from .deadline import DEADLINE_HEADER, Deadline, DeadlineExceeded, current_deadline_ctx
+
+CANCELLED_REQUESTS = REGISTRY.counter(
+    "http_requests_cancelled",
+    "Requests whose handler was cancelled, by reason (deadline or disconnect).",
+    ("sub_app", "reason"),
+)
+
+
+def parse_timeout_ms(value: str | None) -> float | None:
+    try:
+        timeout_ms = float(value) if value is not None else None
+    except ValueError:
+        return None
+    return timeout_ms if timeout_ms is not None and timeout_ms > 0 else None
+
+
+class DeadlineMiddleware:
+    """
+    Give each request a deadline and stop working on requests nobody waits for anymore.
+
+    The deadline comes from the x-request-timeout-ms header or `default_timeout_ms`, capped by
+    `max_timeout_ms`, and is available through current_deadline_ctx (see deadline_headers to pass
+    it on). When it expires, or the client disconnects, the handler task is cancelled along with
+    the tasks it awaits, e.g. an asyncio.gather fan out, and an expired request is answered 504.
+    Synchronous work such as SQL statements can't be cancelled, it calls check_deadline instead.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        sub_app: str,
+        default_timeout_ms: float | None = None,
+        max_timeout_ms: float | None = None,
+    ):
+        self.app = app
+        self.sub_app = sub_app
+        self.default_timeout_ms = default_timeout_ms
+        self.max_timeout_ms = max_timeout_ms
+
+    def timeout_ms(self, scope: Scope) -> float | None:
+        timeout_ms = parse_timeout_ms(Headers(scope=scope).get(DEADLINE_HEADER))
+        if timeout_ms is None:
+            timeout_ms = self.default_timeout_ms
+        if self.max_timeout_ms is not None:
+            timeout_ms = min(timeout_ms or self.max_timeout_ms, self.max_timeout_ms)
+        return timeout_ms
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timeout_ms = self.timeout_ms(scope)
+        deadline = Deadline(None if timeout_ms is None else timeout_ms / 1000)
+        token = current_deadline_ctx.set(deadline)
+        try:
+            await self.handle(scope, receive, send, deadline)
+        finally:
+            current_deadline_ctx.reset(token)
+
+    async def handle(self, scope: Scope, receive: Receive, send: Send, deadline: Deadline):
+        # receive is read ahead to notice a disconnect while the handler is busy
+        messages: asyncio.Queue[Message] = asyncio.Queue()
+        response_started = False
+
+        async def listen_for_disconnect():
+            while True:
+                message = await receive()
+                messages.put_nowait(message)
+                if message["type"] == "http.disconnect":
+                    return
+
+        async def send_with_state(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        handler = asyncio.ensure_future(self.app(scope, messages.get, send_with_state))
+        listener = asyncio.ensure_future(listen_for_disconnect())
+        reason = None
+        try:
+            done, _ = await asyncio.wait(
+                {handler, listener},
+                timeout=deadline.remaining(),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if handler not in done:
+                reason = "disconnect" if listener in done else "deadline"
+        finally:
+            if not handler.done():
+                deadline.cancelled = reason != "deadline"
+                handler.cancel()
+            listener.cancel()
+            await asyncio.gather(listener, return_exceptions=True)
+
+        try:
+            await handler
+        except asyncio.CancelledError:
+            if reason is None:  # cancelled by the server, not by us
+                raise
+        except DeadlineExceeded:
+            # raised by check_deadline in code that couldn't be cancelled
+            reason = reason or ("disconnect" if deadline.cancelled else "deadline")
+
+        if reason is None:
+            return
+        CANCELLED_REQUESTS.inc(self.sub_app, reason)
+        getContextualLogger().info(
+            "Request cancelled",
+            extra={"reason": reason, "path": scope["path"], "response_started": response_started},
+        )
+        if reason == "deadline" and not response_started:
+            await JSONResponse({"detail": "deadline exceeded"}, status_code=504)(
+                scope, messages.get, send
+            )
@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from ...deadline import (
+    DEADLINE_HEADER,
+    Deadline,
+    DeadlineExceeded,
+    DeadlineMiddleware,
+    check_deadline,
+    current_deadline_ctx,
+    deadline_headers,
+)
+
+
+def create_app(cancelled: list[str], **kwargs) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/headers")
+    async def headers():
+        return deadline_headers()
+
+    @app.get("/fan-out")
+    async def fan_out():
+        async def call_pet_service(pet_id: int):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(f"pet {pet_id}")
+                raise
+
+        await asyncio.gather(*(call_pet_service(pet_id) for pet_id in range(3)))
+
+    app.add_middleware(DeadlineMiddleware, sub_app="app.user_service", **kwargs)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_deadline_is_propagated_reduced():
+    app = create_app([], default_timeout_ms=5000)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/headers", headers={DEADLINE_HEADER: "1000"})
+        assert 900 < int(response.json()[DEADLINE_HEADER]) < 1000
+        response = await client.get("/headers")
+        assert 4900 < int(response.json()[DEADLINE_HEADER]) < 5000
+
+    app = create_app([], max_timeout_ms=2000)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/headers", headers={DEADLINE_HEADER: "60000"})
+        assert 1900 < int(response.json()[DEADLINE_HEADER]) < 2000
+
+
+@pytest.mark.asyncio
+async def test_no_deadline_without_header_or_default():
+    app = create_app([])
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        assert (await client.get("/headers", headers={DEADLINE_HEADER: "soon"})).json() == {}
+
+
+@pytest.mark.asyncio
+async def test_expired_request_is_cancelled_with_its_fan_out():
+    cancelled: list[str] = []
+    app = create_app(cancelled)
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        response = await client.get("/fan-out", headers={DEADLINE_HEADER: "50"})
+    assert response.status_code == 504
+    assert sorted(cancelled) == ["pet 0", "pet 1", "pet 2"]
+
+
+@pytest.mark.asyncio
+async def test_disconnect_cancels_the_handler():
+    cancelled: list[str] = []
+    app = create_app(cancelled)
+    sent = []
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(0.05)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/fan-out",
+        "raw_path": b"/fan-out",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [],
+        "server": ("test", 80),
+        "client": ("test", 1234),
+    }
+    await asyncio.wait_for(app(scope, receive, send), timeout=5)
+    assert sorted(cancelled) == ["pet 0", "pet 1", "pet 2"]
+    assert sent == []
+
+
+def test_check_deadline():
+    check_deadline()  # outside of a request
+    deadline = Deadline(10)
+    token = current_deadline_ctx.set(deadline)
+    try:
+        check_deadline()
+        deadline.cancelled = True
+        with pytest.raises(DeadlineExceeded, match="disconnected"):
+            check_deadline()
+    finally:
+        current_deadline_ctx.reset(token)
+    assert Deadline(0).expired()
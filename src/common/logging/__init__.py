@@ -1,3 +1,12 @@
 from .AsyncEmitLogHandler import AsyncEmitLogHandler as AsyncEmitLogHandler
 from .getLogger import getContextualLogger as getContextualLogger
 from .json_formatter import JSONFormatter as JSONFormatter
+from .filters import FirstNEveryKthFilter as FirstNEveryKthFilter
+from .filters import RateLimitFilter as RateLimitFilter
+from .filters import SamplingFilter as SamplingFilter
+from .levels import LogLevelController as LogLevelController
+from .routing_handler import LoggerRoutingHandler as LoggerRoutingHandler
+from .compressing_rotating_handler import (
+    CompressingRotatingFileHandler as CompressingRotatingFileHandler,
+)
+from .binary_format import BinaryLogHandler as BinaryLogHandler
@@ -0,0 +1,201 @@
+import gzip
+import os
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime
+from logging import FileHandler, LogRecord
+from typing import Literal, override
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+SEGMENT_STAMP_FORMAT = "%Y%m%dT%H%M%S%f"
+
+
+def zstd_open(path: str, mode: str, level: int | None = None):
+    """Open a zstd file, with the zstandard package or python 3.14's compression.zstd."""
+    try:
+        import zstandard  # optional dependency
+
+        return zstandard.open(path, mode, cctx=zstandard.ZstdCompressor(level=level or 3))
+    except ImportError:
+        from compression import zstd  # type: ignore # python 3.14+
+
+        return zstd.open(path, mode, level=level)
+
+
+class CompressingRotatingFileHandler(FileHandler):
+    """
+    File handler rotating on size and/or time that compresses rotated segments on a background
+    thread and enforces a retention limit on their count and total size.
+
+    Rollover only renames the active file and reopens it, compression and deletion of old
+    segments never run on the emitting thread.
+    Segments are named after the rotation time so they sort chronologically and keep the file
+    extension, e.g. my_app.log.jsonl -> my_app.log.20241218T210351790256.jsonl.gz
+
+    :param max_bytes: rotate when the file would grow past this size, 0 disables size rotation.
+    :param interval: rotate every `interval` seconds, None disables time rotation.
+    :param compression: "gzip", "zstd" (requires the zstandard package or python 3.14) or None.
+    :param backup_count: keep at most this many rotated segments, 0 keeps all of them.
+    :param max_total_bytes: delete the oldest segments while their total size exceeds this,
+        0 disables.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        mode: str = "a",
+        encoding: str | None = "utf-8",
+        delay: bool = False,
+        errors: str | None = None,
+        *,
+        max_bytes: int = 0,
+        interval: float | None = None,
+        compression: Literal["gzip", "zstd"] | None = "gzip",
+        compress_level: int | None = None,
+        backup_count: int = 0,
+        max_total_bytes: int = 0,
+    ):
+        if compression is not None and compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unsupported compression: {compression!r}")
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.compression = compression
+        self.compress_level = compress_level
+        self.backup_count = backup_count
+        self.max_total_bytes = max_total_bytes
+        self._size = 0
+        self._rollover_at: float | None = None
+        self._jobs: queue.SimpleQueue[bool | None] = queue.SimpleQueue()
+        self._worker: threading.Thread | None = None
+        super().__init__(filename, mode, encoding, delay, errors)
+        directory, name = os.path.split(self.baseFilename)
+        root, ext = os.path.splitext(name)
+        self._directory = directory
+        self._segment_prefix = root
+        self._segment_ext = ext
+        self._segment_pattern = re.compile(
+            rf"{re.escape(root)}\.(?P<stamp>\d{{8}}T\d{{12}})(?:-(?P<counter>\d+))?"
+            rf"{re.escape(ext)}(?P<compressed>\.gz|\.zst)?"
+        )
+
+    @override
+    def _open(self):
+        stream = super()._open()
+        self._size = stream.tell()
+        if self.interval is not None:
+            self._rollover_at = time.time() + self.interval
+        return stream
+
+    def should_rollover(self, size: int) -> bool:
+        if self._rollover_at is not None and time.time() >= self._rollover_at:
+            return True
+        return self.max_bytes > 0 and self._size > 0 and self._size + size > self.max_bytes
+
+    @override
+    def emit(self, record: LogRecord):
+        try:
+            msg = self.format(record) + self.terminator
+            # max_bytes is in bytes, a non-ASCII character takes several of them
+            size = len(msg.encode(self.encoding or "utf-8", self.errors or "strict"))
+            if self.should_rollover(size):
+                self.rollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(msg)
+            self.flush()
+            self._size += size
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def _segment_name(self) -> str:
+        stamp = datetime.now().strftime(SEGMENT_STAMP_FORMAT)
+        segment = os.path.join(
+            self._directory, f"{self._segment_prefix}.{stamp}{self._segment_ext}"
+        )
+        counter = 0
+        while os.path.exists(segment):
+            counter += 1
+            segment = os.path.join(
+                self._directory, f"{self._segment_prefix}.{stamp}-{counter}{self._segment_ext}"
+            )
+        return segment
+
+    def rollover(self):
+        if self.stream is not None:
+            self.stream.close()
+            self.stream = None  # type: ignore
+        if os.path.exists(self.baseFilename):
+            os.rename(self.baseFilename, self._segment_name())
+        self.stream = self._open()
+        self._schedule_maintenance()
+
+    def _schedule_maintenance(self):
+        if self._worker is None:
+            self._worker = threading.Thread(
+                target=self._work, name=f"{type(self).__name__}-{self._segment_prefix}", daemon=True
+            )
+            self._worker.start()
+        self._jobs.put(True)
+
+    def _work(self):
+        while self._jobs.get() is not None:
+            try:
+                self.compress_segments()
+                self.prune_segments()
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+
+    def segments(self) -> list[str]:
+        """Rotated segments, oldest first."""
+        segments = []
+        for name in os.listdir(self._directory):
+            if match := self._segment_pattern.fullmatch(name):
+                order = (match["stamp"], int(match["counter"] or 0))
+                segments.append((order, os.path.join(self._directory, name)))
+        return [segment for _, segment in sorted(segments)]
+
+    def compress_segments(self):
+        if self.compression is None:
+            return
+        for segment in self.segments():
+            if self._segment_pattern.fullmatch(os.path.basename(segment))["compressed"]:  # type: ignore
+                continue
+            target = segment + COMPRESSION_SUFFIXES[self.compression]
+            partial = target + ".partial"
+            with open(segment, "rb") as source:
+                if self.compression == "gzip":
+                    level = 6 if self.compress_level is None else self.compress_level
+                    destination = gzip.open(partial, "wb", compresslevel=level)
+                else:
+                    destination = zstd_open(partial, "wb", self.compress_level)
+                with destination:
+                    shutil.copyfileobj(source, destination)
+            os.replace(partial, target)
+            os.remove(segment)
+
+    def prune_segments(self):
+        segments = self.segments()
+        if self.backup_count > 0:
+            while len(segments) > self.backup_count:
+                os.remove(segments.pop(0))
+        if self.max_total_bytes > 0:
+            sizes = [os.path.getsize(segment) for segment in segments]
+            total = sum(sizes)
+            while segments and total > self.max_total_bytes:
+                os.remove(segments.pop(0))
+                total -= sizes.pop(0)
+
+    @override
+    def close(self):
+        super().close()
+        if self._worker is not None:
+            self._jobs.put(None)
+            self._worker.join()
+            self._worker = None
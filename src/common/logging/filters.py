@@ -0,0 +1,186 @@
+import abc
+import logging
+import random
+import threading
+import time
+from typing import Iterable, override
+
+# Records carrying this attribute are summaries emitted by a SuppressionFilter and always pass
+SUMMARY_ATTR = "suppressed_summary"
+_OVERFLOW_KEY = ("", "<other>")
+
+_Key = tuple[str, str]
+
+
+def _check_level(level: int | str) -> int:
+    return level if isinstance(level, int) else logging.getLevelNamesMapping()[level.upper()]
+
+
+class SuppressionFilter(logging.Filter, abc.ABC):
+    """
+    Base class for filters that drop records and periodically log a summary of what was dropped.
+
+    Only records at or below `max_level`, from loggers under `name` and whose message template is
+    listed in `messages` (any template when empty) are candidates for suppression, everything else
+    passes untouched. Records are keyed by (logger name, message template) so the template, not the
+    formatted message, is what gets rate limited.
+    The summary is logged to `summary_logger` when the `summary_interval` ends, by the first record
+    seen after it or, when records stopped coming, by a timer started on the first suppression.
+    """
+
+    def __init__(
+        self,
+        name: str = "",
+        *,
+        messages: Iterable[str] | None = None,
+        max_level: int | str = logging.INFO,
+        summary_interval: float = 60.0,
+        summary_logger: str = __name__,
+        max_keys: int = 1024,
+    ):
+        super().__init__(name)
+        self.messages = frozenset(messages) if messages else None
+        self.max_level = _check_level(max_level)
+        self.summary_interval = summary_interval
+        self.summary_logger = logging.getLogger(summary_logger)
+        # f-string log messages produce a new template per call, bound the per-key state
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._suppressed: dict[_Key, int] = {}
+        self._interval_start = time.monotonic()
+        self._timer: threading.Timer | None = None
+
+    @abc.abstractmethod
+    def _allow(self, key: _Key, now: float) -> bool:
+        """Whether to keep the record of `key`, called with the lock held."""
+
+    def _on_interval(self) -> None:
+        """Called with the lock held every time a summary interval ends."""
+
+    def _is_candidate(self, record: logging.LogRecord) -> bool:
+        return (
+            record.levelno <= self.max_level
+            and isinstance(record.msg, str)
+            and (self.messages is None or record.msg in self.messages)
+            and bool(super().filter(record))
+        )
+
+    @override
+    def filter(self, record: logging.LogRecord) -> bool:
+        if hasattr(record, SUMMARY_ATTR) or not self._is_candidate(record):
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        summary = None
+        with self._lock:
+            keep = self._allow(key, now)
+            if not keep:
+                if key not in self._suppressed and len(self._suppressed) >= self.max_keys:
+                    key = _OVERFLOW_KEY
+                self._suppressed[key] = self._suppressed.get(key, 0) + 1
+            summary, elapsed = self._roll_over(now)
+            self._schedule_flush(now)
+        if summary:
+            self._log_summary(summary, elapsed)
+        return keep
+
+    def flush(self) -> None:
+        """Log the summary of an interval that ended, a burst that stopped is still reported."""
+        now = time.monotonic()
+        with self._lock:
+            self._timer = None
+            summary, elapsed = self._roll_over(now)
+            self._schedule_flush(now)
+        if summary:
+            self._log_summary(summary, elapsed)
+
+    def _roll_over(self, now: float) -> tuple[dict[_Key, int], float]:
+        """The suppressed counts when the interval ended, called with the lock held."""
+        elapsed = now - self._interval_start
+        if elapsed < self.summary_interval:
+            return {}, elapsed
+        summary, self._suppressed = self._suppressed, {}
+        self._interval_start = now
+        self._on_interval()
+        return summary, elapsed
+
+    def _schedule_flush(self, now: float) -> None:
+        if self._timer is not None or not self._suppressed:
+            return
+        delay = max(0.0, self._interval_start + self.summary_interval - now)
+        self._timer = threading.Timer(delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _log_summary(self, summary: dict[_Key, int], elapsed: float) -> None:
+        self.summary_logger.info(
+            "%s suppressed %d log records in the last %.0f seconds",
+            type(self).__name__,
+            sum(summary.values()),
+            elapsed,
+            extra={
+                SUMMARY_ATTR: [
+                    {"logger": logger, "message": message, "count": count}
+                    for (logger, message), count in summary.items()
+                ]
+            },
+        )
+
+
+class SamplingFilter(SuppressionFilter):
+    """Keep each candidate record with probability `rate`."""
+
+    def __init__(self, name: str = "", *, rate: float = 0.1, **kwargs):
+        super().__init__(name, **kwargs)
+        self.rate = rate
+
+    @override
+    def _allow(self, key: _Key, now: float) -> bool:
+        return random.random() < self.rate
+
+
+class RateLimitFilter(SuppressionFilter):
+    """Token bucket per message template, `rate` records per second with bursts of up to `burst`."""
+
+    def __init__(self, name: str = "", *, rate: float = 1.0, burst: int = 10, **kwargs):
+        super().__init__(name, **kwargs)
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[_Key, list[float]] = {}  # key -> [tokens, last refill time]
+
+    @override
+    def _allow(self, key: _Key, now: float) -> bool:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._buckets.clear()
+            bucket = self._buckets[key] = [self.burst, now]
+        tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return True
+        bucket[0] = tokens
+        return False
+
+
+class FirstNEveryKthFilter(SuppressionFilter):
+    """Keep the first `first` records of each message template per summary interval,
+    then only every `every`th one."""
+
+    def __init__(self, name: str = "", *, first: int = 10, every: int = 100, **kwargs):
+        super().__init__(name, **kwargs)
+        self.first = first
+        self.every = every
+        self._counts: dict[_Key, int] = {}
+
+    @override
+    def _allow(self, key: _Key, now: float) -> bool:
+        if key not in self._counts and len(self._counts) >= self.max_keys:
+            self._counts.clear()
+        count = self._counts[key] = self._counts.get(key, 0) + 1
+        return count <= self.first or (count - self.first) % self.every == 0
+
+    @override
+    def _on_interval(self) -> None:
+        self._counts.clear()
@@ -1,13 +1,29 @@
 from contextvars import ContextVar
 from typing import Optional
 import logging
+import uuid
 
 # Create a context variable to store the current service name
 current_logger_ctx: ContextVar[Optional[str]] = ContextVar("current_logger", default=None)
+# The logger adapter resolved once per request by LoggerContextMiddleware
+current_logger_adapter_ctx: ContextVar[Optional[logging.LoggerAdapter[logging.Logger]]] = (
+    ContextVar("current_logger_adapter", default=None)
+)
+# Correlation id shared by every hop of a request, including self-RPC calls
+current_request_id_ctx: ContextVar[Optional[str]] = ContextVar("current_request_id", default=None)
 
+REQUEST_ID_HEADER = "x-request-id"
 
-def getContextualLogger() -> logging.Logger:
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+def getContextualLogger() -> logging.Logger | logging.LoggerAdapter[logging.Logger]:
     """Get the logger for the current context."""
+    adapter = current_logger_adapter_ctx.get()
+    if adapter is not None:
+        return adapter
     try:
         return logging.getLogger(current_logger_ctx.get())
     except Exception as e:
@@ -0,0 +1,65 @@
+import asyncio
+import logging
+import time
+from typing import Iterable, Mapping
+
+
+class LogLevelController:
+    """
+    Read and change logger levels at runtime, optionally reverting a change after a timeout.
+
+    :param logger_names: Loggers listed by default, e.g. the contextual logger of every sub app.
+    :param aliases: Short names resolving to logger names, e.g. "pet_service" -> "app.pet_service".
+    """
+
+    def __init__(self, logger_names: Iterable[str] = (), aliases: Mapping[str, str] | None = None):
+        self.logger_names = list(logger_names)
+        self.aliases = dict(aliases or {})
+        # logger name -> (level to revert to, wall clock revert time, scheduled revert)
+        self._pending: dict[str, tuple[int, float, asyncio.TimerHandle]] = {}
+
+    def resolve(self, name: str) -> str:
+        return self.aliases.get(name, name)
+
+    def get_level(self, name: str) -> dict:
+        name = self.resolve(name)
+        logger = logging.getLogger(name)
+        pending = self._pending.get(name)
+        return {
+            "logger": logger.name,
+            "level": logging.getLevelName(logger.level),
+            "effective_level": logging.getLevelName(logger.getEffectiveLevel()),
+            "revert_to": logging.getLevelName(pending[0]) if pending else None,
+            "revert_at": pending[1] if pending else None,
+        }
+
+    def get_levels(self) -> list[dict]:
+        return [self.get_level(name) for name in self.logger_names]
+
+    def set_level(self, name: str, level: int | str, revert_after: float | None = None) -> dict:
+        name = self.resolve(name)
+        logger = logging.getLogger(name)
+        pending = self._pending.pop(name, None)
+        if pending is not None:
+            # keep reverting to the level from before the first temporary change
+            original_level = pending[0]
+            pending[2].cancel()
+        else:
+            original_level = logger.level
+        logger.setLevel(level)
+        if revert_after is not None:
+            handle = asyncio.get_running_loop().call_later(revert_after, self.revert, name)
+            self._pending[name] = (original_level, time.time() + revert_after, handle)
+        logging.getLogger(__name__).warning(
+            "Log level changed",
+            extra={"target_logger": name, "level": logging.getLevelName(logger.level)},
+        )
+        return self.get_level(name)
+
+    def revert(self, name: str) -> dict:
+        name = self.resolve(name)
+        pending = self._pending.pop(name, None)
+        if pending is not None:
+            pending[2].cancel()
+            logging.getLogger(name).setLevel(pending[0])
+        return self.get_level(name)
@@ -0,0 +1,367 @@
+"""
+Sidecar index over the JSONL log files written by JSONFormatter.
+
+The index is a SQLite database next to the logs holding, for every record, the segment it is in,
+its byte offset and length, and the fields we search by (time, level, logger and a configurable
+set of extra keys such as pet_id). Updates are incremental: only bytes appended since the last
+update are parsed, rotated segments are tracked by inode and compressed segments (gzip or zstd) are
+indexed once.
+Queries only touch the matching lines, read through mmap for plain segments.
+
+    python -m common.logging.log_index query --logs-dir ./logs --where pet_id=1 --since 2024-12-18
+"""
+
+import datetime as dt
+import gzip
+import io
+import json
+import logging
+import mmap
+import os
+import sqlite3
+from contextlib import closing
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+import click
+
+from .compressing_rotating_handler import zstd_open
+
+INDEX_FILENAME = ".log_index.sqlite"
+DEFAULT_PATTERNS = ("*.jsonl", "*.jsonl.gz", "*.jsonl.zst")
+COMPRESSED_SUFFIXES = (".gz", ".zst")
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+DEFAULT_KEYS = ("request_id", "pet_id", "user_id")
+BATCH_SIZE = 10_000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS segments (
+    id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    device INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    compressed INTEGER NOT NULL,
+    indexed_bytes INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    segment_id INTEGER NOT NULL REFERENCES segments(id) ON DELETE CASCADE,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    ts REAL,
+    levelno INTEGER,
+    logger TEXT
+);
+CREATE INDEX IF NOT EXISTS entries_ts ON entries(ts);
+CREATE INDEX IF NOT EXISTS entries_logger_ts ON entries(logger, ts);
+CREATE INDEX IF NOT EXISTS entries_segment ON entries(segment_id);
+CREATE TABLE IF NOT EXISTS entry_keys (
+    entry_id INTEGER NOT NULL REFERENCES entries(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entry_keys_key_value ON entry_keys(key, value);
+CREATE INDEX IF NOT EXISTS entry_keys_entry ON entry_keys(entry_id);
+"""
+
+
+def parse_timestamp(value: str) -> float:
+    timestamp = dt.datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:  # log timestamps are written in UTC
+        timestamp = timestamp.replace(tzinfo=dt.timezone.utc)
+    return timestamp.timestamp()
+
+
+def _is_compressed(name: str) -> bool:
+    return name.endswith(COMPRESSED_SUFFIXES)
+
+
+def _open_compressed(path: Path) -> BinaryIO:
+    if path.name.endswith(".zst"):
+        return zstd_open(str(path), "rb")
+    return gzip.open(path, "rb")  # type: ignore
+
+
+class LogIndex:
+    """
+    :param logs_dir: directory holding the log segments, the index is stored inside it.
+    :param keys: extra record keys to index, changing them requires a rebuild.
+    :param patterns: glob patterns of the segments to index.
+    """
+
+    def __init__(
+        self,
+        logs_dir: str | Path,
+        keys: Iterable[str] = DEFAULT_KEYS,
+        patterns: Iterable[str] = DEFAULT_PATTERNS,
+    ):
+        self.logs_dir = Path(logs_dir)
+        self.keys = tuple(keys)
+        self.patterns = tuple(patterns)
+        self.db = sqlite3.connect(self.logs_dir / INDEX_FILENAME)
+        self.db.execute("PRAGMA foreign_keys = ON")
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.executescript(SCHEMA)
+        indexed_keys = self.db.execute("SELECT value FROM meta WHERE key = 'keys'").fetchone()
+        if indexed_keys is not None and tuple(json.loads(indexed_keys[0])) != self.keys:
+            self.rebuild()
+        self.db.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('keys', ?)", (json.dumps(list(self.keys)),)
+        )
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def rebuild(self):
+        self.db.execute("DELETE FROM segments")
+        self.db.commit()
+
+    def _segment_files(self) -> dict[str, os.stat_result]:
+        return {
+            entry.name: entry.stat()
+            for entry in os.scandir(self.logs_dir)
+            # an empty file has nothing to index yet, and can't be mapped
+            if entry.is_file()
+            and entry.stat().st_size > 0
+            and any(fnmatch(entry.name, pattern) for pattern in self.patterns)
+        }
+
+    def update(self) -> int:
+        """Index everything written since the last update, returns the number of new entries."""
+        files = self._segment_files()
+        by_inode = {(stat.st_dev, stat.st_ino): name for name, stat in files.items()}
+        segments = self.db.execute("SELECT id, name, device, inode FROM segments").fetchall()
+        # Follow renamed segments (rotation) first so their new name isn't indexed from scratch
+        for segment_id, name, device, inode in segments:
+            current_name = by_inode.get((device, inode))
+            # a compressed copy may reuse the inode of the plain segment it replaced
+            if current_name is None or _is_compressed(current_name) != _is_compressed(name):
+                self.db.execute("DELETE FROM segments WHERE id = ?", (segment_id,))
+            elif current_name != name:
+                self.db.execute("DELETE FROM segments WHERE name = ?", (current_name,))
+                self.db.execute(
+                    "UPDATE segments SET name = ? WHERE id = ?", (current_name, segment_id)
+                )
+        self.db.commit()
+
+        indexed = 0
+        for name, stat in sorted(files.items()):
+            row = self.db.execute(
+                "SELECT id, indexed_bytes, compressed FROM segments WHERE name = ?", (name,)
+            ).fetchone()
+            if row is None:
+                cursor = self.db.execute(
+                    "INSERT INTO segments (name, device, inode, compressed) VALUES (?, ?, ?, ?)",
+                    (name, stat.st_dev, stat.st_ino, _is_compressed(name)),
+                )
+                if cursor.lastrowid is None:
+                    raise sqlite3.DatabaseError(f"Segment {name} was not added to the index")
+                row = (cursor.lastrowid, 0, _is_compressed(name))
+            segment_id, indexed_bytes, compressed = row
+            if compressed:
+                if indexed_bytes == 0:  # compressed segments never change
+                    indexed += self._index_segment(segment_id, name, 0, compressed=True)
+            elif stat.st_size < indexed_bytes:  # truncated, start over
+                self.db.execute("DELETE FROM entries WHERE segment_id = ?", (segment_id,))
+                indexed += self._index_segment(segment_id, name, 0)
+            elif stat.st_size > indexed_bytes:
+                indexed += self._index_segment(segment_id, name, indexed_bytes)
+        return indexed
+
+    def _index_segment(
+        self, segment_id: int, name: str, start: int, compressed: bool = False
+    ) -> int:
+        path = self.logs_dir / name
+        offset = start
+        count = 0
+        batch: list[tuple[int, int, int, float | None, int | None, str | None, dict]] = []
+        with _open_compressed(path) if compressed else open(path, "rb") as f:
+            if start:  # never for compressed segments, not all of their readers can seek
+                f.seek(start)
+            # buffered for readline, zstandard's reader only implements read
+            for line in io.BufferedReader(f) if compressed else f:  # type: ignore
+                if not line.endswith(b"\n"):  # partially written record, next update gets it
+                    break
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if isinstance(record, dict):
+                    batch.append((segment_id, offset, len(line), *self._fields(record)))
+                offset += len(line)
+                if len(batch) >= BATCH_SIZE:
+                    count += self._insert(batch)
+                    batch = []
+        count += self._insert(batch)
+        self.db.execute(
+            "UPDATE segments SET indexed_bytes = ? WHERE id = ?",
+            (offset if offset > 0 else -1 if compressed else 0, segment_id),
+        )
+        self.db.commit()
+        return count
+
+    def _fields(self, record: dict) -> tuple[float | None, int | None, str | None, dict]:
+        try:
+            ts = parse_timestamp(record["timestamp"])
+        except (KeyError, TypeError, ValueError):
+            ts = None
+        level = record.get("level")
+        levelno = logging.getLevelNamesMapping().get(level) if isinstance(level, str) else None
+        keys = {key: str(record[key]) for key in self.keys if record.get(key) is not None}
+        return ts, levelno, record.get("logger"), keys
+
+    def _insert(self, batch) -> int:
+        for segment_id, offset, length, ts, levelno, logger, keys in batch:
+            cursor = self.db.execute(
+                "INSERT INTO entries (segment_id, offset, length, ts, levelno, logger)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (segment_id, offset, length, ts, levelno, logger),
+            )
+            if keys:
+                self.db.executemany(
+                    "INSERT INTO entry_keys VALUES (?, ?, ?)",
+                    [(cursor.lastrowid, key, value) for key, value in keys.items()],
+                )
+        return len(batch)
+
+    def query(
+        self,
+        since: float | None = None,
+        until: float | None = None,
+        level: str | None = None,
+        logger: str | None = None,
+        where: dict[str, str] | None = None,
+        limit: int | None = None,
+    ) -> Iterator[str]:
+        """Yield the matching JSON lines in time order, `logger` also matches its child loggers."""
+        conditions: list[str] = []
+        params: list = []
+        if since is not None:
+            conditions.append("e.ts >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("e.ts < ?")
+            params.append(until)
+        if level is not None:
+            conditions.append("e.levelno >= ?")
+            params.append(logging.getLevelNamesMapping()[level.upper()])
+        if logger is not None:
+            # range instead of LIKE so the (logger, ts) index is used, "/" sorts right after "."
+            conditions.append("(e.logger = ? OR (e.logger > ? AND e.logger < ?))")
+            params.extend([logger, f"{logger}.", f"{logger}/"])
+        for key, value in (where or {}).items():
+            conditions.append(
+                "e.id IN (SELECT entry_id FROM entry_keys WHERE key = ? AND value = ?)"
+            )
+            params.extend([key, value])
+        sql = (
+            "SELECT s.name, s.compressed, e.offset, e.length FROM entries e"
+            " JOIN segments s ON s.id = e.segment_id"
+        )
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY e.ts, s.name, e.offset"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        readers: dict[str, mmap.mmap | BinaryIO] = {}
+        try:
+            for name, compressed, offset, length in self.db.execute(sql, params):
+                reader = readers.get(name)
+                if reader is None:
+                    reader = readers[name] = self._open_reader(name, compressed)
+                if isinstance(reader, mmap.mmap):
+                    line = reader[offset : offset + length]
+                else:
+                    if offset < reader.tell():  # zstd readers can't seek backwards
+                        reader.close()
+                        reader = readers[name] = self._open_reader(name, compressed)
+                    reader.seek(offset)
+                    line = reader.read(length)
+                yield line.decode("utf-8").rstrip("\n")
+        finally:
+            for reader in readers.values():
+                reader.close()
+
+    def _open_reader(self, name: str, compressed: bool) -> mmap.mmap | BinaryIO:
+        path = self.logs_dir / name
+        if compressed:
+            # compressed files can only seek forward cheaply
+            return _open_compressed(path)
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _parse_time_option(value: str | None) -> float | None:
+    return None if value is None else parse_timestamp(value)
+
+
+@click.group()
+@click.option("--logs-dir", type=click.Path(exists=True, file_okay=False), default="./logs")
+@click.option("--key", "keys", multiple=True, help="Extra record key to index (repeatable).")
+@click.pass_context
+def main(ctx: click.Context, logs_dir: str, keys: tuple[str, ...]):
+    ctx.obj = ctx.with_resource(closing(LogIndex(logs_dir, keys or DEFAULT_KEYS)))
+
+
+@main.command()
+@click.pass_obj
+def update(index: LogIndex):
+    """Incrementally index new log records."""
+    click.echo(f"Indexed {index.update()} new records", err=True)
+
+
+@main.command()
+@click.pass_obj
+def rebuild(index: LogIndex):
+    """Drop the index and index every segment again."""
+    index.rebuild()
+    click.echo(f"Indexed {index.update()} records", err=True)
+
+
+@main.command()
+@click.option("--since", help="ISO timestamp, UTC when no offset is given.")
+@click.option("--until", help="ISO timestamp, UTC when no offset is given.")
+@click.option("--level", type=click.Choice(LEVELS, case_sensitive=False), help="Minimum level.")
+@click.option("--logger", help="Logger name, child loggers match too.")
+@click.option("--where", "where", multiple=True, help="key=value on an indexed key (repeatable).")
+@click.option("--limit", type=int)
+@click.option("--no-update", is_flag=True, default=False, help="Query the index as is.")
+@click.pass_obj
+def query(
+    index: LogIndex,
+    since: str | None,
+    until: str | None,
+    level: str | None,
+    logger: str | None,
+    where: tuple[str, ...],
+    limit: int | None,
+    no_update: bool,
+):
+    """Print the matching JSON lines."""
+    conditions = dict(condition.split("=", 1) for condition in where)
+    unknown_keys = set(conditions) - set(index.keys)
+    if unknown_keys:
+        raise click.BadParameter(
+            f"not indexed: {', '.join(sorted(unknown_keys))}", param_hint="--where"
+        )
+    if not no_update:
+        index.update()
+    for line in index.query(
+        _parse_time_option(since), _parse_time_option(until), level, logger, conditions, limit
+    ):
+        click.echo(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,67 @@
-from starlette.types import ASGIApp, Scope, Receive, Send
+import logging
 
-from ..getLogger import current_logger_ctx
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Scope, Receive, Send
+
+from ..getLogger import (
+    REQUEST_ID_HEADER,
+    current_logger_adapter_ctx,
+    current_logger_ctx,
+    current_request_id_ctx,
+    new_request_id,
+)
+
+MAX_REQUEST_ID_LENGTH = 128
+
+
+def request_id_from_scope(scope: Scope) -> str | None:
+    """Return the incoming request id header, if it is safe to log as is."""
+    for key, value in scope.get("headers", []):
+        if key == REQUEST_ID_HEADER.encode():
+            request_id = value.decode("latin-1")
+            if len(request_id) <= MAX_REQUEST_ID_LENGTH and request_id.isprintable():
+                return request_id
+            return None
+    return None
 
 
 class LoggerContextMiddleware:
     def __init__(self, app: ASGIApp, logger_name: str):
         self.app = app
         self.logger_name = logger_name
+        # logging.getLogger takes the module lock, resolve it once instead of once per log call
+        self.logger = logging.getLogger(logger_name)
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        extra: dict[str, str] = {"sub_app": self.logger_name}
+        request_id = current_request_id_ctx.get()
+        # The outermost middleware owns the request id, mounted apps reuse it
+        owns_request_id = request_id is None and scope["type"] in ("http", "websocket")
+        if owns_request_id:
+            request_id = request_id_from_scope(scope) or new_request_id()
+        if request_id is not None:
+            extra["request_id"] = request_id
+
         # Set the service context for this request
         token = current_logger_ctx.set(self.logger_name)
+        request_id_token = current_request_id_ctx.set(request_id)
+        adapter_token = current_logger_adapter_ctx.set(
+            logging.LoggerAdapter(self.logger, extra, merge_extra=True)
+        )
         try:
-            await self.app(scope, receive, send)
+            if owns_request_id and request_id is not None and scope["type"] == "http":
+
+                async def send_with_request_id(message: Message) -> None:
+                    if message["type"] == "http.response.start":
+                        headers = MutableHeaders(scope=message)
+                        headers.setdefault(REQUEST_ID_HEADER, request_id)
+                    await send(message)
+
+                await self.app(scope, receive, send_with_request_id)
+            else:
+                await self.app(scope, receive, send)
         finally:
             # Reset the context
+            current_logger_adapter_ctx.reset(adapter_token)
+            current_request_id_ctx.reset(request_id_token)
             current_logger_ctx.reset(token)
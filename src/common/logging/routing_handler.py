@@ -0,0 +1,63 @@
+from logging import Handler, LogRecord, getHandlerByName
+from typing import Iterable, Mapping, Union, override
+
+
+class LoggerRoutingHandler(Handler):
+    """
+    Route records to a handler chain chosen by logger name, e.g. one chain per mounted service.
+
+    `routes` maps a logger name (the contextual logger of a sub app, "app.pet_service") to its
+    handlers, records of child loggers use the chain of their closest routed ancestor and
+    everything else goes to `default`. The chain is cached per logger name so dispatching a
+    record is a single dict lookup instead of a filter on every handler.
+    Handlers may be given by name and are resolved lazily, like in AsyncEmitLogHandler.
+    """
+
+    def __init__(
+        self,
+        routes: Mapping[str, Iterable[Union[str, Handler]]] | None = None,
+        default: Iterable[Union[str, Handler]] = (),
+    ):
+        super().__init__()
+        self.routes = {name: list(handlers) for name, handlers in (routes or {}).items()}
+        self.default = list(default)
+        self._chains: dict[str, tuple[Handler, ...]] = {}
+
+    def _route_for(self, name: str) -> list[Union[str, Handler]]:
+        while name not in self.routes:
+            if not name:
+                return self.default
+            name = name.rpartition(".")[0]
+        return self.routes[name]
+
+    def chain_for(self, name: str) -> tuple[Handler, ...]:
+        chain = self._chains.get(name)
+        if chain is None:
+            handlers: list[Handler] = []
+            resolved = True
+            for h in self._route_for(name):
+                handler = getHandlerByName(h) if isinstance(h, str) else h
+                if handler is None:  # not configured yet, try again on the next record
+                    resolved = False
+                else:
+                    handlers.append(handler)
+            chain = tuple(handlers)
+            if resolved:
+                self._chains[name] = chain
+        return chain
+
+    @override
+    def handle(self, record: LogRecord) -> bool:
+        # No lock around emit, every handler in the chain serializes its own output
+        rv = self.filter(record)
+        if isinstance(rv, LogRecord):
+            record = rv
+        if rv:
+            self.emit(record)
+        return bool(rv)
+
+    @override
+    def emit(self, record: LogRecord):
+        for h in self.chain_for(record.name):
+            if record.levelno >= h.level:
+                h.handle(record)
@@ -0,0 +1,104 @@
+import gzip
+import io
+import json
+import logging
+import random
+
+import pytest
+
+from click.testing import CliRunner
+
+from ...logging import BinaryLogHandler, JSONFormatter
+from ..compressing_rotating_handler import zstd_open
+from ..binary_format import DEFAULT_FMT_KEYS, BinaryRecordEncoder, MAGIC, decode, main
+
+
+def create_test_record(msg: str = "Test message", args=(), created: float | None = None, **extra):
+    record = logging.LogRecord(
+        name="app.pet_service",
+        level=logging.INFO,
+        pathname="service.py",
+        lineno=12,
+        msg=msg,
+        args=args,
+        exc_info=None,
+        func="get_pet",
+    )
+    if created is not None:
+        record.created = created
+    record.__dict__.update(extra)
+    return record
+
+
+def test_roundtrip_matches_json_formatter():
+    records = [
+        create_test_record("Retrieved pet %s", (1,), created=1734555600.5, pet_id=1),
+        create_test_record("Retrieved pet %s", (2,), created=1734555600.25, pet_id=2),
+        create_test_record("Status OK", created=1734555601.0),
+    ]
+    encoder = BinaryRecordEncoder()
+    data = MAGIC + b"".join(encoder.encode(record) for record in records)
+
+    formatter = JSONFormatter(fmt_keys=DEFAULT_FMT_KEYS)
+    expected = [json.loads(formatter.format(record)) for record in records]
+    assert list(decode(io.BytesIO(data))) == expected
+    # the template is interned once, the second record only references it
+    assert data.count(b"Retrieved pet %s") == 1
+
+
+def test_handler_appends_and_rotates(tmp_path):
+    log_file = tmp_path / "app.log.bin"
+    handler = BinaryLogHandler(str(log_file), compression=None)
+    handler.emit(create_test_record("first"))
+    handler.close()
+
+    handler = BinaryLogHandler(str(log_file), compression=None, max_bytes=200)
+    for i in range(5):
+        handler.emit(create_test_record("message %d", (i,)))
+    handler.close()
+
+    messages = []
+    for segment in [*handler.segments(), str(log_file)]:
+        with open(segment, "rb") as f:
+            messages.extend(message["message"] for message in decode(f))
+    assert messages == ["first", *(f"message {i}" for i in range(5))]
+
+
+def test_cli_decodes_compressed_segments(tmp_path):
+    segment = tmp_path / "app.log.20241218T210000000000.bin.gz"
+    encoder = BinaryRecordEncoder()
+    with gzip.GzipFile(segment, "wb") as f:
+        f.write(MAGIC + encoder.encode(create_test_record("compressed")))
+    result = CliRunner().invoke(main, [str(segment)])
+    assert result.exit_code == 0, result.output
+    assert [json.loads(line)["message"] for line in result.output.splitlines()] == ["compressed"]
+
+
+def test_cli_decodes_zstd_segments(tmp_path):
+    segment = tmp_path / "app.log.20241218T210000000000.bin.zst"
+    try:
+        f = zstd_open(str(segment), "wb")
+    except ImportError:
+        pytest.skip("needs the zstandard package or python 3.14")
+    with f:
+        f.write(MAGIC + BinaryRecordEncoder().encode(create_test_record("compressed")))
+    result = CliRunner().invoke(main, [str(segment)])
+    assert result.exit_code == 0, result.output
+    assert [json.loads(line)["message"] for line in result.output.splitlines()] == ["compressed"]
+
+
+def test_timestamps_match_json_formatter():
+    rng = random.Random(0)
+    records = [create_test_record(created=rng.uniform(1.7e9, 1.8e9)) for _ in range(2000)]
+    encoder = BinaryRecordEncoder()
+    data = MAGIC + b"".join(encoder.encode(record) for record in records)
+    formatter = JSONFormatter(fmt_keys=DEFAULT_FMT_KEYS)
+    expected = [json.loads(formatter.format(record))["timestamp"] for record in records]
+    assert [message["timestamp"] for message in decode(io.BytesIO(data))] == expected
+
+
+def test_record_without_function_name():
+    record = logging.LogRecord("app", logging.INFO, "app.py", 1, "no function", (), None)
+    assert record.funcName is None
+    data = MAGIC + BinaryRecordEncoder().encode(record)
+    assert next(decode(io.BytesIO(data)))["function"] == ""
@@ -0,0 +1,80 @@
+import gzip
+import logging
+
+import pytest
+
+from ...logging import CompressingRotatingFileHandler
+
+
+def create_test_record(msg: str = "Test message") -> logging.LogRecord:
+    return logging.LogRecord(
+        name="test",
+        level=logging.INFO,
+        pathname="test.py",
+        lineno=1,
+        msg=msg,
+        args=(),
+        exc_info=None,
+    )
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    return tmp_path / "app.log.jsonl"
+
+
+def test_size_rollover_compresses_segments(log_file):
+    handler = CompressingRotatingFileHandler(str(log_file), max_bytes=100)
+    messages = [f"message {i:03d} " + "x" * 30 for i in range(10)]
+    for msg in messages:
+        handler.emit(create_test_record(msg))
+    handler.close()  # waits for the background compression
+
+    segments = sorted(log_file.parent.glob("app.log.*.jsonl.gz"))
+    assert segments
+    assert not list(log_file.parent.glob("app.log.*.jsonl"))
+    lines = []
+    for segment in segments:
+        with gzip.open(segment, "rt") as f:
+            lines.extend(f.read().splitlines())
+    lines.extend(log_file.read_text().splitlines())
+    assert lines == messages
+
+
+def test_size_is_counted_in_bytes(log_file):
+    handler = CompressingRotatingFileHandler(str(log_file), max_bytes=100, compression=None)
+    for _ in range(5):
+        handler.emit(create_test_record("\u00e9" * 20))  # 41 bytes with the newline
+    handler.close()
+    files = [log_file, *log_file.parent.glob("app.log.*.jsonl")]
+    assert len(files) == 3
+    assert all(path.stat().st_size <= 100 for path in files)
+
+
+def test_time_rollover(log_file, mocker):
+    now = mocker.patch("common.logging.compressing_rotating_handler.time.time", return_value=0)
+    handler = CompressingRotatingFileHandler(str(log_file), interval=60, compression=None)
+    handler.emit(create_test_record("first"))
+    now.return_value = 61
+    handler.emit(create_test_record("second"))
+    handler.close()
+    assert log_file.read_text() == "second\n"
+    assert [segment.read_text() for segment in log_file.parent.glob("app.log.*.jsonl")] == [
+        "first\n"
+    ]
+
+
+def test_retention(log_file):
+    handler = CompressingRotatingFileHandler(
+        str(log_file), max_bytes=10, compression=None, backup_count=2
+    )
+    for i in range(6):
+        handler.emit(create_test_record(f"message {i}"))
+    handler.close()
+    segments = handler.segments()
+    assert [open(segment).read() for segment in segments] == ["message 3\n", "message 4\n"]
+
+
+def test_unsupported_compression(log_file):
+    with pytest.raises(ValueError):
+        CompressingRotatingFileHandler(str(log_file), compression="lz4")  # type: ignore
@@ -0,0 +1,87 @@
+import logging
+import time
+
+import pytest
+
+from ...logging import FirstNEveryKthFilter, RateLimitFilter, SamplingFilter
+from ..filters import SUMMARY_ATTR, SuppressionFilter
+
+
+def create_test_record(msg: str = "Test message", level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord(
+        name="test",
+        level=level,
+        pathname="test.py",
+        lineno=1,
+        msg=msg,
+        args=(),
+        exc_info=None,
+    )
+
+
+@pytest.fixture
+def summaries(caplog):
+    caplog.set_level(logging.INFO, logger="common.logging.filters")
+    return caplog
+
+
+def test_sampling_filter_rates():
+    assert all(SamplingFilter(rate=1).filter(create_test_record()) for _ in range(100))
+    assert not any(SamplingFilter(rate=0).filter(create_test_record()) for _ in range(100))
+
+
+def test_filters_ignore_other_messages_and_levels():
+    sampling_filter = SamplingFilter(rate=0, messages=["Status OK"])
+    assert sampling_filter.filter(create_test_record("Something else"))
+    assert sampling_filter.filter(create_test_record("Status OK", logging.WARNING))
+    assert not sampling_filter.filter(create_test_record("Status OK"))
+
+
+def test_rate_limit_filter_burst_and_refill(mocker):
+    now = mocker.patch("common.logging.filters.time.monotonic", return_value=0.0)
+    rate_limit_filter = RateLimitFilter(rate=2, burst=3, summary_interval=1000)
+    kept = [rate_limit_filter.filter(create_test_record()) for _ in range(5)]
+    assert kept == [True, True, True, False, False]
+    # other templates have their own bucket
+    assert rate_limit_filter.filter(create_test_record("Other template"))
+    now.return_value = 1.0
+    kept = [rate_limit_filter.filter(create_test_record()) for _ in range(3)]
+    assert kept == [True, True, False]
+
+
+def test_first_n_every_kth_filter():
+    every_kth_filter = FirstNEveryKthFilter(first=2, every=3, summary_interval=1000)
+    kept = [every_kth_filter.filter(create_test_record()) for _ in range(8)]
+    assert kept == [True, True, False, False, True, False, False, True]
+
+
+def test_summary_is_logged_after_interval(mocker, summaries):
+    now = mocker.patch("common.logging.filters.time.monotonic", return_value=0.0)
+    sampling_filter = SamplingFilter(rate=0, summary_interval=10)
+    for _ in range(4):
+        sampling_filter.filter(create_test_record())
+    assert not summaries.records
+    now.return_value = 11.0
+    sampling_filter.filter(create_test_record())
+    assert len(summaries.records) == 1
+    summary = getattr(summaries.records[0], SUMMARY_ATTR)
+    assert summary == [{"logger": "test", "message": "Test message", "count": 5}]
+    # summary records are never suppressed
+    assert sampling_filter.filter(summaries.records[0])
+
+
+def test_summary_is_logged_when_records_stop(summaries):
+    sampling_filter = SamplingFilter(rate=0, summary_interval=0.05)
+    for _ in range(3):
+        sampling_filter.filter(create_test_record())
+    deadline = time.monotonic() + 5
+    while not summaries.records and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(summaries.records) == 1
+    summary = getattr(summaries.records[0], SUMMARY_ATTR)
+    assert summary == [{"logger": "test", "message": "Test message", "count": 3}]
+
+
+def test_suppression_filter_is_abstract():
+    with pytest.raises(TypeError):
+        SuppressionFilter()  # type: ignore
@@ -0,0 +1,137 @@
+import gzip
+import json
+import os
+
+import pytest
+from click.testing import CliRunner
+
+from ..compressing_rotating_handler import zstd_open
+from ..log_index import LogIndex, main
+
+
+def write_records(path, records, opener=open):
+    with opener(path, "at") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def create_record(i: int, level: str = "INFO", logger: str = "app.pet_service", **extra):
+    return {
+        "level": level,
+        "message": f"message {i}",
+        "timestamp": f"2024-12-18T21:00:{i:02d}+00:00",
+        "logger": logger,
+        **extra,
+    }
+
+
+@pytest.fixture
+def logs_dir(tmp_path):
+    write_records(
+        tmp_path / "my_app.log.jsonl",
+        [
+            create_record(0, pet_id=1),
+            create_record(1, pet_id=2),
+            create_record(2, "WARNING", "app.user_service", user_id=7, pet_id=1),
+            create_record(3, logger="app.pet_service.core", pet_id=1),
+        ],
+    )
+    return tmp_path
+
+
+def messages(lines):
+    return [json.loads(line)["message"] for line in lines]
+
+
+def test_query_by_key_level_logger_and_time(logs_dir):
+    with LogIndex(logs_dir) as index:
+        assert index.update() == 4
+        assert messages(index.query(where={"pet_id": "1"})) == [
+            "message 0",
+            "message 2",
+            "message 3",
+        ]
+        assert messages(index.query(level="WARNING")) == ["message 2"]
+        assert messages(index.query(logger="app.pet_service")) == [
+            "message 0",
+            "message 1",
+            "message 3",
+        ]
+        since = index.query(since=1734555602.0, where={"pet_id": "1"})
+        assert messages(since) == ["message 2", "message 3"]
+        assert messages(index.query(limit=1)) == ["message 0"]
+
+
+def test_incremental_update_and_rotation(logs_dir):
+    active = logs_dir / "my_app.log.jsonl"
+    with LogIndex(logs_dir) as index:
+        index.update()
+        write_records(active, [create_record(4, pet_id=1)])
+        with open(active, "a") as f:
+            f.write('{"partial": ')  # record still being written
+        assert index.update() == 1
+
+        # rotation renames the active file, the renamed segment is not indexed again
+        rotated = logs_dir / "my_app.log.20241218T210005000000.jsonl"
+        os.rename(active, rotated)
+        with open(rotated, "a") as f:
+            f.write('"record"}\n')
+        write_records(active, [create_record(5, pet_id=1)])
+        assert index.update() == 2
+
+        # compressing the rotated segment replaces its entries
+        with open(rotated, "rb") as source, gzip.open(f"{rotated}.gz", "wb") as destination:
+            destination.write(source.read())
+        os.remove(rotated)
+        assert index.update() == 6
+        assert messages(index.query(where={"pet_id": "1"})) == [
+            "message 0",
+            "message 2",
+            "message 3",
+            "message 4",
+            "message 5",
+        ]
+
+
+def test_cli_query(logs_dir):
+    result = CliRunner().invoke(
+        main, ["--logs-dir", str(logs_dir), "query", "--where", "user_id=7"]
+    )
+    assert result.exit_code == 0, result.output
+    assert messages(result.output.splitlines()) == ["message 2"]
+
+    result = CliRunner().invoke(main, ["--logs-dir", str(logs_dir), "query", "--where", "x=1"])
+    assert result.exit_code != 0
+
+
+def test_empty_files_are_skipped(logs_dir):
+    (logs_dir / "user_service.log.jsonl").touch()
+    with LogIndex(logs_dir) as index:
+        assert index.update() == 4
+        assert len(messages(index.query())) == 4
+
+
+def test_zstd_segments(logs_dir):
+    try:
+        zstd_open(str(logs_dir / "probe.zst"), "wb").close()
+    except ImportError:
+        pytest.skip("needs the zstandard package or python 3.14")
+    segment = logs_dir / "my_app.log.20241218T210005000000.jsonl.zst"
+    with zstd_open(str(segment), "wb") as f:
+        for i in range(4, 7):
+            f.write((json.dumps(create_record(i, pet_id=1)) + "\n").encode())
+    with LogIndex(logs_dir) as index:
+        assert index.update() == 7
+        assert messages(index.query(where={"pet_id": "1"}, since=1734555604)) == [
+            "message 4",
+            "message 5",
+            "message 6",
+        ]
+
+
+def test_cli_rejects_unknown_levels(logs_dir):
+    result = CliRunner().invoke(main, ["--logs-dir", str(logs_dir), "query", "--level", "LOUD"])
+    assert result.exit_code != 0
+    result = CliRunner().invoke(main, ["--logs-dir", str(logs_dir), "query", "--level", "warning"])
+    assert result.exit_code == 0, result.output
+    assert messages(result.output.splitlines()) == ["message 2"]
@@ -0,0 +1,56 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from ...logging import getContextualLogger
+from ..getLogger import REQUEST_ID_HEADER
+from ..middleware import LoggerContextMiddleware
+
+
+@pytest.fixture
+def app():
+    sub_app = FastAPI()
+
+    @sub_app.get("/context")
+    async def context():
+        logger = getContextualLogger()
+        assert isinstance(logger, logging.LoggerAdapter)
+        return {"name": logger.logger.name, "extra": logger.extra}
+
+    sub_app.add_middleware(LoggerContextMiddleware, logger_name="app.sub")
+    app = FastAPI()
+    app.add_middleware(LoggerContextMiddleware, logger_name="app")
+    app.mount("/sub", sub_app)
+    return app
+
+
+@pytest.mark.anyio
+async def test_request_id_generated_and_shared_with_mounted_app(app):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/sub/context")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["name"] == "app.sub"
+    assert data["extra"]["sub_app"] == "app.sub"
+    assert data["extra"]["request_id"] == response.headers[REQUEST_ID_HEADER]
+
+
+@pytest.mark.anyio
+async def test_incoming_request_id_is_propagated(app):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/sub/context", headers={REQUEST_ID_HEADER: "upstream-id"})
+    assert response.json()["extra"]["request_id"] == "upstream-id"
+    assert response.headers[REQUEST_ID_HEADER] == "upstream-id"
+
+
+@pytest.mark.anyio
+async def test_unsafe_request_id_is_replaced(app):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/sub/context", headers={REQUEST_ID_HEADER: "x" * 1000})
+    assert response.json()["extra"]["request_id"] != "x" * 1000
+
+
+def test_contextual_logger_outside_request():
+    assert getContextualLogger() is logging.getLogger()
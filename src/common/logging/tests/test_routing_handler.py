@@ -0,0 +1,83 @@
+import logging
+from unittest.mock import Mock
+
+import pytest
+
+from ...logging import LoggerRoutingHandler
+
+
+def create_test_record(name: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord(
+        name=name,
+        level=level,
+        pathname="test.py",
+        lineno=1,
+        msg="Test message",
+        args=(),
+        exc_info=None,
+    )
+
+
+def create_mock_handler(level: int = logging.NOTSET):
+    handler = Mock(spec=logging.Handler)
+    handler.level = level
+    return handler
+
+
+@pytest.fixture
+def handlers():
+    return {
+        "pet": create_mock_handler(),
+        "user": create_mock_handler(logging.WARNING),
+        "default": create_mock_handler(),
+    }
+
+
+@pytest.fixture
+def routing_handler(handlers):
+    return LoggerRoutingHandler(
+        routes={"app.pet_service": [handlers["pet"]], "app.user_service": [handlers["user"]]},
+        default=[handlers["default"]],
+    )
+
+
+def test_routes_by_logger_name(routing_handler, handlers):
+    record = create_test_record("app.pet_service")
+    routing_handler.handle(record)
+    handlers["pet"].handle.assert_called_once_with(record)
+    handlers["user"].handle.assert_not_called()
+    handlers["default"].handle.assert_not_called()
+
+
+def test_child_loggers_use_closest_route(routing_handler, handlers):
+    record = create_test_record("app.pet_service.core")
+    routing_handler.handle(record)
+    handlers["pet"].handle.assert_called_once_with(record)
+
+
+def test_unrouted_loggers_use_default(routing_handler, handlers):
+    for name in ["app", "root", "uvicorn.error"]:
+        routing_handler.handle(create_test_record(name))
+    assert handlers["default"].handle.call_count == 3
+    handlers["pet"].handle.assert_not_called()
+
+
+def test_handler_levels_are_respected(routing_handler, handlers):
+    routing_handler.handle(create_test_record("app.user_service", logging.INFO))
+    handlers["user"].handle.assert_not_called()
+    routing_handler.handle(create_test_record("app.user_service", logging.ERROR))
+    handlers["user"].handle.assert_called_once()
+
+
+def test_handlers_by_name_are_resolved_lazily(mocker):
+    handler = create_mock_handler()
+    get_handler = mocker.patch(
+        "common.logging.routing_handler.getHandlerByName", side_effect=[None, handler]
+    )
+    routing_handler = LoggerRoutingHandler(routes={"app.pet_service": ["pet_file"]})
+    routing_handler.handle(create_test_record("app.pet_service"))
+    handler.handle.assert_not_called()
+    routing_handler.handle(create_test_record("app.pet_service"))
+    routing_handler.handle(create_test_record("app.pet_service"))
+    assert handler.handle.call_count == 2
+    assert get_handler.call_count == 2  # cached once resolved
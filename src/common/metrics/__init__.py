@@ -0,0 +1,6 @@
+from .registry import REGISTRY as REGISTRY
+from .registry import Counter as Counter
+from .registry import Gauge as Gauge
+from .registry import Histogram as Histogram
+from .registry import MetricsRegistry as MetricsRegistry
+from .middleware import MetricsMiddleware as MetricsMiddleware
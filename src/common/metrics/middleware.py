@@ -0,0 +1,68 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .registry import REGISTRY, MetricsRegistry
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_template(scope: Scope) -> str:
+    """
+    The path template of the matched route including the mount prefixes, e.g. /pet/{pet_id}.
+    Unmatched paths share a single label so scanners can't blow up the label cardinality.
+    """
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        return UNMATCHED_ROUTE
+    return scope.get("root_path", "") + path
+
+
+class MetricsMiddleware:
+    """
+    Record request counts, status codes and latency per sub app and route template.
+
+    Installed on the aggregate app and on every mounted sub app, each layer records under its own
+    `sub_app` label so the time spent inside a mounted service can be told apart from the total.
+    """
+
+    def __init__(self, app: ASGIApp, sub_app: str, registry: MetricsRegistry = REGISTRY):
+        self.app = app
+        self.sub_app = sub_app
+        self.requests = registry.counter(
+            "http_requests", "HTTP requests handled.", ("sub_app", "method", "route", "status")
+        )
+        self.duration = registry.histogram(
+            "http_request_duration_seconds",
+            "HTTP request latency until the response is sent.",
+            ("sub_app", "method", "route"),
+        )
+        self.in_flight = registry.gauge(
+            "http_requests_in_flight", "HTTP requests being handled.", ("sub_app",)
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        self.in_flight.inc(self.sub_app)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.in_flight.dec(self.sub_app)
+            route = route_template(scope)
+            method = scope["method"]
+            self.requests.inc(self.sub_app, method, route, str(status))
+            self.duration.observe(elapsed, self.sub_app, method, route)
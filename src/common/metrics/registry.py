@@ -0,0 +1,216 @@
+import bisect
+import math
+import threading
+from typing import Callable, Iterable, Iterator
+
+_Labels = tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _ShardedMetric:
+    """
+    Base class for metrics updated without locks.
+
+    Every thread writes to its own shard (a plain dict only that thread mutates) and the shards are
+    only summed when the metric is collected, the lock is taken once per thread to register its
+    shard. Shards of finished threads are kept so their counts are not lost.
+    """
+
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards: list[dict] = []
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _snapshots(self) -> Iterator[dict]:
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            while True:
+                try:
+                    yield {labels: self._copy(value) for labels, value in shard.items()}
+                    break
+                except RuntimeError:  # the owning thread added a label set while copying
+                    continue
+
+    def _copy(self, value):
+        return value
+
+    def samples(self) -> Iterator[tuple[str, _Labels, _Labels, float]]:
+        """Yield (sample name, label names, label values, value)."""
+        raise NotImplementedError
+
+
+class Counter(_ShardedMetric):
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> dict[_Labels, float]:
+        totals: dict[_Labels, float] = {}
+        for snapshot in self._snapshots():
+            for labels, value in snapshot.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def samples(self):
+        for labels, value in sorted(self.values().items()):
+            yield f"{self.name}_total", self.labelnames, labels, value
+
+
+class Gauge(Counter):
+    """
+    Gauge updated with inc/dec, or with set for values owned by a single writer.
+    A callback can provide the values instead, it is called every time the gauge is collected.
+    """
+
+    type = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        callback: Callable[[], dict[_Labels, float]] | None = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+        self._set: dict[_Labels, float] = {}
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value: float, *labels: str):
+        self._set[labels] = value
+
+    def values(self) -> dict[_Labels, float]:
+        totals = super().values()
+        for labels, value in dict(self._set).items():
+            totals[labels] = totals.get(labels, 0) + value
+        if self.callback is not None:
+            totals.update(self.callback())
+        return totals
+
+    def samples(self):
+        for labels, value in sorted(self.values().items()):
+            yield self.name, self.labelnames, labels, value
+
+
+class Histogram(_ShardedMetric):
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(bound) for bound in buckets))
+
+    def observe(self, value: float, *labels: str):
+        shard = self._shard()
+        state = shard.get(labels)
+        if state is None:
+            # per bucket counts (not cumulative), the last one is +Inf, then the sum
+            state = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    def _copy(self, value):
+        return list(value)
+
+    def values(self) -> dict[_Labels, list]:
+        totals: dict[_Labels, list] = {}
+        for snapshot in self._snapshots():
+            for labels, state in snapshot.items():
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = state
+                else:
+                    totals[labels] = [a + b for a, b in zip(total, state)]
+        return totals
+
+    def samples(self):
+        names = (*self.labelnames, "le")
+        for labels, state in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), state):
+                cumulative += count
+                yield f"{self.name}_bucket", names, (*labels, _format_value(bound)), cumulative
+            yield f"{self.name}_sum", self.labelnames, labels, state[-1]
+            yield f"{self.name}_count", self.labelnames, labels, cumulative
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, _ShardedMetric] = {}
+        self._lock = threading.Lock()
+
+    def register[T: _ShardedMetric](self, metric: T) -> T:
+        """Register a metric, registering the same name again returns the existing metric."""
+        with self._lock:
+            existing = self._metrics.setdefault(metric.name, metric)
+        if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+            raise ValueError(f"Metric {metric.name} is already registered differently")
+        return existing  # type: ignore
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = (), **kwargs):
+        return self.register(Gauge(name, documentation, labelnames, **kwargs))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Iterable[str] = (), **kwargs
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, **kwargs))
+
+    def get(self, name: str) -> _ShardedMetric | None:
+        return self._metrics.get(name)
+
+    def expose(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            for name, labelnames, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# The process wide registry, like the logging module's root logger
+REGISTRY = MetricsRegistry()
@@ -0,0 +1,40 @@
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from ..middleware import MetricsMiddleware
+from ..registry import Gauge, MetricsRegistry
+
+
+@pytest.mark.asyncio
+async def test_records_per_sub_app_and_route_template():
+    registry = MetricsRegistry()
+    sub_app = FastAPI()
+
+    @sub_app.get("/{pet_id}")
+    async def get_pet(pet_id: int):
+        return {"pet_id": pet_id}
+
+    sub_app.add_middleware(MetricsMiddleware, sub_app="app.pet_service", registry=registry)
+    app = FastAPI()
+    app.mount("/pet", sub_app)
+    app.add_middleware(MetricsMiddleware, sub_app="app", registry=registry)
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.get("/pet/1")
+        await ac.get("/pet/2")
+        await ac.get("/pet/not-a-number")
+        await ac.get("/missing")
+
+    assert registry.get("http_requests").values() == {  # type: ignore
+        ("app", "GET", "/pet/{pet_id}", "200"): 2,
+        ("app", "GET", "/pet/{pet_id}", "422"): 1,
+        ("app", "GET", "<unmatched>", "404"): 1,
+        ("app.pet_service", "GET", "/pet/{pet_id}", "200"): 2,
+        ("app.pet_service", "GET", "/pet/{pet_id}", "422"): 1,
+    }
+    durations = registry.get("http_request_duration_seconds").values()  # type: ignore
+    assert durations[("app.pet_service", "GET", "/pet/{pet_id}")][-2] >= 0  # +Inf bucket
+    in_flight = registry.get("http_requests_in_flight")
+    assert isinstance(in_flight, Gauge)
+    assert in_flight.values() == {("app",): 0, ("app.pet_service",): 0}
@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+from ..registry import MetricsRegistry
+
+
+def test_counter_shards_are_summed_across_threads():
+    registry = MetricsRegistry()
+    counter = registry.counter("jobs", "Jobs done.", ("kind",))
+
+    def work():
+        for _ in range(1000):
+            counter.inc("a")
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counter.inc("b", amount=2)
+    assert counter.values() == {("a",): 4000, ("b",): 2}
+    assert 'jobs_total{kind="a"} 4000' in registry.expose()
+
+
+def test_histogram_exposition():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1))
+    histogram.observe(0.05, "/pet")
+    histogram.observe(0.5, "/pet")
+    histogram.observe(5, "/pet")
+    assert registry.expose().splitlines() == [
+        "# HELP latency_seconds Latency.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{route="/pet",le="0.1"} 1',
+        'latency_seconds_bucket{route="/pet",le="1.0"} 2',
+        'latency_seconds_bucket{route="/pet",le="+Inf"} 3',
+        'latency_seconds_sum{route="/pet"} 5.55',
+        'latency_seconds_count{route="/pet"} 3',
+    ]
+
+
+def test_gauge_and_registration():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("in_flight", "In flight.")
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+    assert gauge.values() == {(): 1}
+    assert registry.gauge("in_flight", "In flight.") is gauge
+    with pytest.raises(ValueError):
+        registry.counter("in_flight", "In flight.")
@@ -0,0 +1,3 @@
+from .loop_monitor import EventLoopMonitor as EventLoopMonitor
+from .profiler import SamplingProfiler as SamplingProfiler
+from .memory import MemoryProfiler as MemoryProfiler
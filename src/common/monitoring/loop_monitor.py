@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from collections.abc import Coroutine
+from typing import Any, Callable
+
+from common.logging.getLogger import current_logger_ctx
+from common.metrics import REGISTRY, Counter, MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class _TimedCoroutine(Coroutine):
+    """Wraps the coroutine of a task to measure the thread CPU time of each of its steps."""
+
+    __slots__ = ("_coro", "_attribution")
+
+    def __init__(self, coro: Coroutine, attribution: "_LoopCpuAttribution"):
+        self._coro = coro
+        self._attribution = attribution
+
+    def send(self, value):
+        return self._attribution.step(self._coro.send, value)
+
+    def throw(self, *args):
+        return self._attribution.step(self._coro.throw, *args)
+
+    def close(self):
+        return self._coro.close()
+
+    def __await__(self):
+        return self._coro.__await__()
+
+    def __getattr__(self, name: str):
+        # cr_frame, cr_await... for task stacks and the sampling profiler
+        return getattr(self._coro, name)
+
+
+class _LoopCpuAttribution:
+    """
+    Attribute the CPU time of the task steps run by an event loop to the sub app in their context.
+
+    A task factory wraps the coroutine of every new task, which works on any loop implementing
+    set_task_factory (asyncio's and uvloop's). Callbacks that are not task steps are not measured,
+    nor are the steps of eager tasks started inside another task step, the latter are counted for
+    the task starting them. The factory is installed once per loop and shared by the monitors of
+    every registry.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.counters: dict[Counter, int] = {}
+        self.previous_factory = loop.get_task_factory()
+        self._measuring = False
+
+    def task_factory(self, loop: asyncio.AbstractEventLoop, coro: Coroutine, **kwargs):
+        coro = _TimedCoroutine(coro, self)
+        if self.previous_factory is None:
+            return asyncio.Task(coro, loop=loop, **kwargs)
+        return self.previous_factory(loop, coro, **kwargs)
+
+    def step(self, method: Callable, *args):
+        if self._measuring or not self.counters:
+            return method(*args)
+        self._measuring = True
+        start = time.thread_time()
+        try:
+            return method(*args)
+        finally:
+            elapsed = time.thread_time() - start
+            self._measuring = False
+            sub_app = current_logger_ctx.get() or ""
+            for counter in list(self.counters):
+                counter.inc(sub_app, amount=elapsed)
+
+
+_loop_attributions: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopCpuAttribution]" = (
+    weakref.WeakKeyDictionary()
+)
+_loop_attributions_lock = threading.Lock()
+
+
+class _CpuAttribution:
+    """The CPU time counter of a registry, fed by the loops its monitors run on."""
+
+    def __init__(self, registry: MetricsRegistry):
+        self.cpu_seconds = registry.counter(
+            "event_loop_cpu_seconds", "CPU time spent running asyncio task steps.", ("sub_app",)
+        )
+
+    def install(self, loop: asyncio.AbstractEventLoop):
+        with _loop_attributions_lock:
+            attribution = _loop_attributions.get(loop)
+            if attribution is None:
+                attribution = _loop_attributions[loop] = _LoopCpuAttribution(loop)
+                loop.set_task_factory(attribution.task_factory)  # type: ignore
+            counters = attribution.counters
+            counters[self.cpu_seconds] = counters.get(self.cpu_seconds, 0) + 1
+
+    def uninstall(self, loop: asyncio.AbstractEventLoop):
+        with _loop_attributions_lock:
+            attribution = _loop_attributions.get(loop)
+            if attribution is None:
+                return
+            counters = attribution.counters
+            counters[self.cpu_seconds] -= 1
+            if counters[self.cpu_seconds] == 0:
+                del counters[self.cpu_seconds]
+            if counters:
+                return
+            if loop.get_task_factory() == attribution.task_factory:
+                loop.set_task_factory(attribution.previous_factory)
+                del _loop_attributions[loop]
+            # else a factory was set on top of ours, which keeps running without counters
+
+
+# weak, the id of a registry that was garbage collected can be reused by a new one
+_cpu_attributions: "weakref.WeakKeyDictionary[MetricsRegistry, _CpuAttribution]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _cpu_attribution(registry: MetricsRegistry) -> _CpuAttribution:
+    attribution = _cpu_attributions.get(registry)
+    if attribution is None:
+        attribution = _cpu_attributions[registry] = _CpuAttribution(registry)
+    return attribution
+
+
+class EventLoopMonitor:
+    """
+    Measure the event loop lag and catch the code blocking the loop.
+
+    A probe task sleeps for `interval` and records how late it wakes up. A watchdog thread checks
+    the probe heartbeat, when the loop has not run it for longer than `lag_threshold` it captures
+    the stack of the loop thread and the sub app of the running task, and logs it as a stall.
+
+    :param interval: seconds between probes.
+    :param lag_threshold: seconds the loop may be blocked before the stall is captured.
+    :param cpu_attribution: account the CPU time of asyncio task steps per sub app.
+    :param max_stalls: number of recent stalls kept for the debug endpoint.
+    """
+
+    def __init__(
+        self,
+        name: str = "app",
+        interval: float = 0.1,
+        lag_threshold: float = 0.25,
+        cpu_attribution: bool = True,
+        max_stalls: int = 50,
+        registry: MetricsRegistry = REGISTRY,
+    ):
+        self.name = name
+        self.interval = interval
+        self.lag_threshold = lag_threshold
+        self.stalls: deque[dict[str, Any]] = deque(maxlen=max_stalls)
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.lag = registry.histogram(
+            "event_loop_lag_seconds",
+            "How late the event loop runs a scheduled callback.",
+            ("app",),
+            buckets=LAG_BUCKETS,
+        )
+        self.stall_count = registry.counter(
+            "event_loop_stalls",
+            "Times the event loop was blocked past the threshold.",
+            ("sub_app",),
+        )
+        self._cpu_attribution = _cpu_attribution(registry) if cpu_attribution else None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._heartbeat = time.monotonic()
+        self._probe: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        """Start monitoring the running loop."""
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._probe = self._loop.create_task(self._run_probe(), name=f"{self.name}-loop-monitor")
+        self._watchdog = threading.Thread(
+            target=self._run_watchdog, name=f"{self.name}-loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+        if self._cpu_attribution is not None:
+            self._cpu_attribution.install(self._loop)
+
+    async def stop(self):
+        self._stopped.set()
+        if self._cpu_attribution is not None and self._loop is not None:
+            self._cpu_attribution.uninstall(self._loop)
+        if self._probe is not None:
+            self._probe.cancel()
+            try:
+                await self._probe
+            except asyncio.CancelledError:
+                pass
+            self._probe = None
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    async def _run_probe(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - start - self.interval)
+            self._heartbeat = time.monotonic()
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            self.lag.observe(lag, self.name)
+
+    def _run_watchdog(self):
+        stall: dict[str, Any] | None = None
+        while not self._stopped.wait(self.interval):
+            blocked_for = time.monotonic() - self._heartbeat - self.interval
+            if blocked_for < self.lag_threshold:
+                if stall is not None:
+                    logger.warning("Event loop was blocked", extra={"stall": stall})
+                    stall = None
+                continue
+            if stall is None:
+                stall = self.capture_stall()
+                self.stalls.append(stall)
+                self.stall_count.inc(stall["sub_app"] or "")
+            stall["blocked_seconds"] = round(blocked_for, 6)
+
+    def capture_stall(self) -> dict[str, Any]:
+        """The stack of the loop thread and the task holding the loop, called by the watchdog."""
+        frame = sys._current_frames().get(self._loop_thread_id)  # type: ignore
+        task = asyncio.current_task(self._loop) if self._loop is not None else None
+        sub_app = None
+        if task is not None:
+            sub_app = task.get_context().get(current_logger_ctx)
+        return {
+            "time": time.time(),
+            "task": task.get_name() if task is not None else None,
+            "sub_app": sub_app,
+            "stack": traceback.format_stack(frame) if frame is not None else [],
+            "blocked_seconds": 0.0,
+        }
+
+    def stats(self) -> dict[str, Any]:
+        cpu_seconds = {}
+        if self._cpu_attribution is not None:
+            values = self._cpu_attribution.cpu_seconds.values()
+            cpu_seconds = {labels[0]: value for labels, value in values.items()}
+        return {
+            "app": self.name,
+            "interval": self.interval,
+            "lag_threshold": self.lag_threshold,
+            "last_lag_seconds": self.last_lag,
+            "max_lag_seconds": self.max_lag,
+            "cpu_seconds": cpu_seconds,
+            "stalls": list(self.stalls),
+        }
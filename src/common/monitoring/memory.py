@@ -0,0 +1,119 @@
+import itertools
+import re
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Any, Literal
+
+GroupBy = Literal["lineno", "filename", "sub_app"]
+
+_SUB_APP_PATTERN = re.compile(r"[\\/]services[\\/](\w+)[\\/]")
+_IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<unknown>")
+
+
+def sub_app_of(traceback: tracemalloc.Traceback) -> str:
+    """The service (services/<name>/...) closest to the allocation, "other" if none is found."""
+    for frame in reversed(traceback):  # most recent call first
+        if match := _SUB_APP_PATTERN.search(frame.filename):
+            return match[1]
+    return "other"
+
+
+class MemoryProfiler:
+    """
+    Take tracemalloc snapshots and compare them, to find what keeps growing in a running process.
+
+    Snapshots are kept in memory, the oldest is dropped past `max_snapshots`. Grouping by sub app
+    needs the tracebacks to reach into services/<name>/, start tracing with more than one frame.
+    """
+
+    def __init__(self, max_snapshots: int = 10):
+        self.max_snapshots = max_snapshots
+        self.snapshots: OrderedDict[int, tuple[float, tracemalloc.Snapshot]] = OrderedDict()
+        self._ids = itertools.count(1)
+
+    def start(self, frames: int = 1):
+        if tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is already tracing")
+        tracemalloc.start(frames)
+
+    def stop(self):
+        tracemalloc.stop()
+
+    def status(self) -> dict[str, Any]:
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "frames": tracemalloc.get_traceback_limit(),
+            "traced_bytes": current,
+            "peak_traced_bytes": peak,
+            "snapshots": [
+                self._summary(snapshot_id, taken_at, snapshot)
+                for snapshot_id, (taken_at, snapshot) in self.snapshots.items()
+            ],
+        }
+
+    @staticmethod
+    def _summary(snapshot_id: int, taken_at: float, snapshot: tracemalloc.Snapshot):
+        return {
+            "id": snapshot_id,
+            "time": taken_at,
+            "traceback_limit": snapshot.traceback_limit,
+        }
+
+    def take_snapshot(self) -> dict[str, Any]:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing")
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, filename) for filename in _IGNORED_FILES]
+        )
+        snapshot_id = next(self._ids)
+        self.snapshots[snapshot_id] = (time.time(), snapshot)
+        while len(self.snapshots) > self.max_snapshots:
+            self.snapshots.popitem(last=False)
+        return self._summary(snapshot_id, *self.snapshots[snapshot_id])
+
+    def delete_snapshot(self, snapshot_id: int):
+        del self.snapshots[snapshot_id]
+
+    def _snapshot(self, snapshot_id: int) -> tracemalloc.Snapshot:
+        return self.snapshots[snapshot_id][1]
+
+    @staticmethod
+    def _key(statistic: tracemalloc.Statistic | tracemalloc.StatisticDiff, group_by: GroupBy):
+        if group_by == "sub_app":
+            return sub_app_of(statistic.traceback)
+        frame = statistic.traceback[-1]
+        return frame.filename if group_by == "filename" else f"{frame.filename}:{frame.lineno}"
+
+    def top(self, snapshot_id: int, group_by: GroupBy = "lineno", limit: int = 20):
+        """The biggest allocations of a snapshot."""
+        snapshot = self._snapshot(snapshot_id)
+        groups: dict[str, dict[str, int]] = {}
+        key_type = "traceback" if group_by == "sub_app" else group_by
+        for statistic in snapshot.statistics(key_type):
+            group = groups.setdefault(self._key(statistic, group_by), {"size": 0, "count": 0})
+            group["size"] += statistic.size
+            group["count"] += statistic.count
+        return self._top(groups, "size", limit)
+
+    def diff(self, first_id: int, second_id: int, group_by: GroupBy = "lineno", limit: int = 20):
+        """What was allocated (or freed) between two snapshots, biggest growth first."""
+        first, second = self._snapshot(first_id), self._snapshot(second_id)
+        groups: dict[str, dict[str, int]] = {}
+        key_type = "traceback" if group_by == "sub_app" else group_by
+        for statistic in second.compare_to(first, key_type):
+            group = groups.setdefault(
+                self._key(statistic, group_by),
+                {"size": 0, "size_diff": 0, "count": 0, "count_diff": 0},
+            )
+            group["size"] += statistic.size
+            group["size_diff"] += statistic.size_diff
+            group["count"] += statistic.count
+            group["count_diff"] += statistic.count_diff
+        return self._top(groups, "size_diff", limit)
+
+    @staticmethod
+    def _top(groups: dict[str, dict[str, int]], order_by: str, limit: int):
+        top = sorted(groups.items(), key=lambda item: abs(item[1][order_by]), reverse=True)
+        return [{"key": key, **values} for key, values in top[:limit]]
@@ -0,0 +1,108 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from types import FrameType
+from typing import Any
+
+from common.logging.getLogger import current_logger_ctx
+
+
+def _frame_name(frame: FrameType) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_qualname}"
+
+
+def _thread_stack(frame: FrameType | None) -> list[str]:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_name(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def _coroutine_stack(coro: Any) -> list[str]:
+    """Frames of a suspended coroutine, following what it awaits down to the innermost one."""
+    stack = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        stack.append(_frame_name(frame))
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return stack
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler sampling the stacks of every thread, and of the asyncio tasks awaiting
+    on the event loop, from a background thread without instrumenting the profiled code.
+
+    Samples of the loop thread are attributed to the sub app of the task running at that moment
+    and awaiting tasks to the sub app of their context, so the profile can be filtered to a single
+    mounted service. Stacks are counted in the collapsed format of flamegraph tools:
+    "root;frame;frame count", the root being the thread name or "asyncio-task" for awaiting tasks.
+
+    :param loop: the loop whose tasks are sampled, its thread is the thread calling `__init__`.
+    :param sub_app: only keep samples of this sub app (its logger name, e.g. app.pet_service).
+    :param include_tasks: also sample the stacks of the tasks awaiting on the loop.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        interval: float = 0.01,
+        sub_app: str | None = None,
+        include_tasks: bool = True,
+    ):
+        self.loop = loop
+        self.loop_thread_id = threading.get_ident()
+        self.interval = interval
+        self.sub_app = sub_app
+        self.include_tasks = include_tasks
+        self.samples: Counter[str] = Counter()
+        self.sample_count = 0
+
+    def _keep(self, sub_app: str | None) -> bool:
+        return self.sub_app is None or sub_app == self.sub_app
+
+    def sample(self):
+        sampler_thread_id = threading.get_ident()
+        thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+        running_task = asyncio.current_task(self.loop)
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == sampler_thread_id:
+                continue
+            sub_app = None
+            if thread_id == self.loop_thread_id and running_task is not None:
+                sub_app = running_task.get_context().get(current_logger_ctx)
+            if self._keep(sub_app):
+                stack = [thread_names.get(thread_id, str(thread_id)), *_thread_stack(frame)]
+                self.samples[";".join(stack)] += 1
+        if self.include_tasks:
+            try:
+                tasks = asyncio.all_tasks(self.loop)
+            except RuntimeError:  # the task set changed while copying it
+                tasks = set()
+            for task in tasks:
+                if task is running_task or task.done():
+                    continue
+                if self._keep(task.get_context().get(current_logger_ctx)):
+                    stack = _coroutine_stack(task.get_coro())
+                    if stack:
+                        self.samples[";".join(["asyncio-task", *stack])] += 1
+        self.sample_count += 1
+
+    def run(self, seconds: float):
+        """Sample until `seconds` elapsed, meant to run on a thread other than the loop's."""
+        deadline = time.monotonic() + seconds
+        next_sample = time.monotonic()
+        while (now := time.monotonic()) < deadline:
+            if now >= next_sample:
+                self.sample()
+                next_sample += self.interval
+            time.sleep(max(0.0, min(next_sample, deadline) - time.monotonic()))
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
@@ -0,0 +1,93 @@
+import asyncio
+import time
+
+import pytest
+
+from common.logging.getLogger import current_logger_ctx
+from common.metrics import MetricsRegistry
+
+from ..loop_monitor import EventLoopMonitor
+
+
+def block_the_loop(seconds: float):
+    time.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_stall_captures_blocking_stack_and_sub_app():
+    registry = MetricsRegistry()
+    monitor = EventLoopMonitor(interval=0.01, lag_threshold=0.05, registry=registry)
+    monitor.start()
+    try:
+        await asyncio.sleep(0.05)
+
+        async def handler():
+            current_logger_ctx.set("app.pet_service")
+            block_the_loop(0.3)
+
+        await asyncio.create_task(handler())
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+    stats = monitor.stats()
+    assert stats["max_lag_seconds"] >= 0.2
+    stall = stats["stalls"][0]
+    assert stall["sub_app"] == "app.pet_service"
+    assert any("block_the_loop" in line for line in stall["stack"])
+    assert stall["blocked_seconds"] > 0.05
+    assert registry.get("event_loop_stalls").values() == {("app.pet_service",): 1}  # type: ignore
+
+
+async def busy():
+    current_logger_ctx.set("app.user_service")
+    end = time.thread_time() + 0.05
+    while time.thread_time() < end:
+        pass
+
+
+async def run_busy_task():
+    await asyncio.create_task(busy())
+
+
+@pytest.mark.asyncio
+async def test_cpu_time_is_attributed_to_sub_app():
+    registry = MetricsRegistry()
+    monitor = EventLoopMonitor(interval=0.01, registry=registry)
+    monitor.start()
+    try:
+        await run_busy_task()
+    finally:
+        await monitor.stop()
+    assert monitor.stats()["cpu_seconds"]["app.user_service"] >= 0.05
+    assert asyncio.get_running_loop().get_task_factory() is None
+
+
+def test_cpu_time_is_attributed_on_uvloop():
+    uvloop = pytest.importorskip("uvloop")
+
+    async def main():
+        monitor = EventLoopMonitor(interval=0.01, registry=MetricsRegistry())
+        monitor.start()
+        try:
+            await run_busy_task()
+        finally:
+            await monitor.stop()
+        return monitor.stats()["cpu_seconds"]
+
+    assert uvloop.run(main())["app.user_service"] >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_monitors_of_several_registries_share_the_task_factory():
+    registries = [MetricsRegistry(), MetricsRegistry()]
+    monitors = [EventLoopMonitor(interval=0.01, registry=registry) for registry in registries]
+    for monitor in monitors:
+        monitor.start()
+    # stopped in the order they started, not the reverse
+    await monitors[0].stop()
+    await run_busy_task()
+    await monitors[1].stop()
+    assert asyncio.get_running_loop().get_task_factory() is None
+    assert "app.user_service" not in monitors[0].stats()["cpu_seconds"]
+    assert monitors[1].stats()["cpu_seconds"]["app.user_service"] >= 0.05
@@ -0,0 +1,50 @@
+import tracemalloc
+
+import pytest
+
+from ..memory import MemoryProfiler, sub_app_of
+
+leak = []
+
+
+@pytest.fixture
+def profiler():
+    profiler = MemoryProfiler(max_snapshots=2)
+    profiler.start(frames=5)
+    yield profiler
+    profiler.stop()
+    leak.clear()
+
+
+def test_diff_finds_growth(profiler):
+    first = profiler.take_snapshot()["id"]
+    leak.extend(bytearray(1024) for _ in range(1000))
+    second = profiler.take_snapshot()["id"]
+
+    top = profiler.diff(first, second, limit=1)[0]
+    assert "test_memory.py:" in top["key"]
+    assert top["size_diff"] >= 1024 * 1000
+    assert top["count_diff"] >= 1000
+    assert profiler.top(second, "filename", limit=1)[0]["key"].endswith("test_memory.py")
+
+    profiler.take_snapshot()
+    assert [snapshot["id"] for snapshot in profiler.status()["snapshots"]] == [second, second + 1]
+    with pytest.raises(KeyError):
+        profiler.top(first)
+
+
+def test_start_twice_and_snapshot_without_tracing(profiler):
+    with pytest.raises(RuntimeError):
+        profiler.start()
+    profiler.stop()
+    with pytest.raises(RuntimeError):
+        profiler.take_snapshot()
+    profiler.start()
+
+
+def test_sub_app_of():
+    traceback = tracemalloc.Traceback(
+        (("/repo/src/services/pet_service/core/service.py", 10), ("/repo/src/common/x.py", 1))
+    )
+    assert sub_app_of(traceback) == "pet_service"
+    assert sub_app_of(tracemalloc.Traceback((("/repo/src/common/x.py", 1),))) == "other"
@@ -0,0 +1,58 @@
+import asyncio
+import time
+
+import pytest
+
+from common.logging.getLogger import current_logger_ctx
+
+from ..profiler import SamplingProfiler
+
+
+def spin(seconds: float):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+async def waiting_for_pet_service():
+    await asyncio.sleep(10)
+
+
+@pytest.mark.asyncio
+async def test_profile_filtered_by_sub_app():
+    profiler = SamplingProfiler(
+        asyncio.get_running_loop(), interval=0.005, sub_app="app.pet_service"
+    )
+
+    async def pet_service():
+        current_logger_ctx.set("app.pet_service")
+        await waiting_for_pet_service()
+
+    async def user_service():
+        current_logger_ctx.set("app.user_service")
+        await waiting_for_pet_service()
+
+    tasks = [asyncio.create_task(pet_service()), asyncio.create_task(user_service())]
+    await asyncio.sleep(0)
+    await asyncio.to_thread(profiler.run, 0.1)
+    for task in tasks:
+        task.cancel()
+
+    assert profiler.sample_count > 1
+    stacks = profiler.collapsed().splitlines()
+    task_stacks = [line for line in stacks if line.startswith("asyncio-task;")]
+    assert len(task_stacks) == 1
+    assert "pet_service;" in task_stacks[0]
+    assert "waiting_for_pet_service" in task_stacks[0]
+    # the loop thread only counts while a pet_service task runs, never here
+    assert not [line for line in stacks if line.startswith("MainThread;")]
+
+
+@pytest.mark.asyncio
+async def test_profile_samples_threads():
+    profiler = SamplingProfiler(asyncio.get_running_loop(), interval=0.005)
+    await asyncio.gather(asyncio.to_thread(spin, 0.1), asyncio.to_thread(profiler.run, 0.1))
+    assert any(
+        "test_profiler:spin" in line and not line.startswith("asyncio-task")
+        for line in profiler.collapsed().splitlines()
+    )
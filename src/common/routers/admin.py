@@ -0,0 +1,20 @@
+import secrets
+from typing import Annotated
+
+from fastapi import Header, HTTPException
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+
+def create_admin_token_dependency(token: str):
+    """Dependency guarding admin routes, only requests with the matching token are allowed."""
+    if not token:
+        raise ValueError("An admin token is required")
+
+    async def verify_admin_token(
+        x_admin_token: Annotated[str | None, Header(alias=ADMIN_TOKEN_HEADER)] = None,
+    ):
+        if not secrets.compare_digest(x_admin_token or "", token):
+            raise HTTPException(status_code=403, detail="invalid admin token")
+
+    return verify_admin_token
@@ -0,0 +1,114 @@
+import asyncio
+from typing import Annotated
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from common.admission import AdmissionController
+from common.monitoring import EventLoopMonitor, MemoryProfiler, SamplingProfiler
+from common.monitoring.memory import GroupBy
+
+
+def create_router(
+    loop_monitor: EventLoopMonitor | None = None,
+    admission_controllers: dict[str, AdmissionController] | None = None,
+):
+    router = APIRouter()
+    profiling = asyncio.Lock()
+    memory_profiler = MemoryProfiler()
+
+    @router.get("/loop")
+    async def get_loop_stats():
+        """Event loop lag, recent stalls with the blocking stack and CPU time per sub app."""
+        if loop_monitor is None:
+            raise HTTPException(status_code=404, detail="event loop monitoring is disabled")
+        return loop_monitor.stats()
+
+    @router.get("/admission")
+    async def get_admission_stats():
+        """In flight and queued requests per sub app with admission control."""
+        return {
+            sub_app: controller.stats()
+            for sub_app, controller in (admission_controllers or {}).items()
+        }
+
+    @router.get("/profile", response_class=PlainTextResponse)
+    async def profile(
+        seconds: Annotated[float, Query(gt=0, le=300)] = 30,
+        interval: Annotated[float, Query(ge=0.001, le=1)] = 0.01,
+        sub_app: str | None = None,
+        include_tasks: bool = True,
+    ):
+        """
+        Sample the stacks of the running process for `seconds` and return them collapsed, e.g.
+        curl .../profile?seconds=30 > profile.txt && flamegraph.pl profile.txt > profile.svg
+        """
+        if profiling.locked():
+            raise HTTPException(status_code=409, detail="a profile is already running")
+        async with profiling:
+            profiler = SamplingProfiler(
+                asyncio.get_running_loop(), interval, sub_app, include_tasks
+            )
+            await asyncio.to_thread(profiler.run, seconds)
+        return PlainTextResponse(
+            profiler.collapsed(), headers={"x-profile-samples": str(profiler.sample_count)}
+        )
+
+    @router.get("/memory")
+    async def get_memory_status():
+        return memory_profiler.status()
+
+    @router.post("/memory/start")
+    async def start_memory_tracing(frames: Annotated[int, Query(ge=1, le=100)] = 1):
+        """Start tracemalloc, more frames allow grouping by sub app but cost more memory."""
+        try:
+            memory_profiler.start(frames)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return memory_profiler.status()
+
+    @router.post("/memory/stop")
+    async def stop_memory_tracing():
+        memory_profiler.stop()
+        return memory_profiler.status()
+
+    @router.post("/memory/snapshots")
+    async def take_memory_snapshot():
+        try:
+            return await asyncio.to_thread(memory_profiler.take_snapshot)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+
+    @router.get("/memory/snapshots/{snapshot_id}")
+    async def get_memory_snapshot(
+        snapshot_id: int,
+        group_by: GroupBy = "lineno",
+        limit: Annotated[int, Query(ge=1, le=1000)] = 20,
+    ):
+        try:
+            return await asyncio.to_thread(memory_profiler.top, snapshot_id, group_by, limit)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="snapshot not found")
+
+    @router.delete("/memory/snapshots/{snapshot_id}")
+    async def delete_memory_snapshot(snapshot_id: int):
+        try:
+            memory_profiler.delete_snapshot(snapshot_id)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="snapshot not found")
+        return {"ok": True}
+
+    @router.get("/memory/diff")
+    async def diff_memory_snapshots(
+        first: int,
+        second: int,
+        group_by: GroupBy = "lineno",
+        limit: Annotated[int, Query(ge=1, le=1000)] = 20,
+    ):
+        """Allocations that grew (or shrank) from the first snapshot to the second."""
+        try:
+            return await asyncio.to_thread(memory_profiler.diff, first, second, group_by, limit)
+        except KeyError:
+            raise HTTPException(status_code=404, detail="snapshot not found")
+
+    return router
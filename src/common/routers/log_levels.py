@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Literal
+
+from fastapi import APIRouter
+from pydantic import BaseModel, Field
+
+from common.logging.levels import LogLevelController
+
+
+class LogLevelResponseObject(BaseModel):
+    logger: str
+    level: str
+    effective_level: str
+    revert_to: str | None = None
+    revert_at: datetime | None = None
+
+
+class LogLevelUpdateObject(BaseModel):
+    level: Literal["CRITICAL", "ERROR", "WARNING", "INFO", "DEBUG", "NOTSET"]
+    revert_after: float | None = Field(default=None, gt=0, description="seconds")
+
+
+def create_router(controller: LogLevelController):
+    router = APIRouter()
+
+    @router.get("/levels", response_model=list[LogLevelResponseObject])
+    async def get_levels():
+        return controller.get_levels()
+
+    @router.get("/levels/{logger_name}", response_model=LogLevelResponseObject)
+    async def get_level(logger_name: str):
+        return controller.get_level(logger_name)
+
+    @router.put("/levels/{logger_name}", response_model=LogLevelResponseObject)
+    async def set_level(logger_name: str, update: LogLevelUpdateObject):
+        return controller.set_level(logger_name, update.level, update.revert_after)
+
+    @router.delete("/levels/{logger_name}", response_model=LogLevelResponseObject)
+    async def revert_level(logger_name: str):
+        return controller.revert(logger_name)
+
+    return router
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from common.metrics import REGISTRY, MetricsRegistry
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def create_router(registry: MetricsRegistry = REGISTRY):
+    router = APIRouter()
+
+    @router.get("", response_class=PlainTextResponse)
+    async def metrics():
+        return PlainTextResponse(registry.expose(), media_type=CONTENT_TYPE)
+
+    return router
@@ -0,0 +1,16 @@
+from fastapi import APIRouter
+
+from common.tracing import EXPORTER, SpanExporter
+from common.tracing.exporter import to_otlp
+
+
+def create_router(exporter: SpanExporter = EXPORTER):
+    router = APIRouter()
+
+    @router.get("")
+    async def get_traces(trace_id: str | None = None, limit: int = 100):
+        """The most recent spans in the OTLP JSON shape, optionally of a single trace."""
+        spans = exporter.spans(trace_id)[-limit:] if limit > 0 else []
+        return to_otlp(spans, exporter.service_name)
+
+    return router
@@ -0,0 +1,111 @@
+import logging
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine, text
+
+from common.deadline import Deadline, DeadlineExceeded, current_deadline_ctx
+from common.logging.getLogger import current_logger_ctx
+
+from .. import db_instrumentation
+from ..db_instrumentation import (
+    QUERIES,
+    REPEATED_STATEMENTS,
+    QueryStatsMiddleware,
+    current_query_stats_ctx,
+    instrument_engine,
+    statement_shape,
+)
+
+
+def test_statement_shape():
+    assert (
+        statement_shape("SELECT *\n  FROM pet WHERE pet.id IN (?, ?,?) AND pet.age > ?")
+        == "SELECT * FROM pet WHERE pet.id IN (?) AND pet.age > ?"
+    )
+
+
+@pytest.mark.asyncio
+async def test_repeated_statement_is_reported_once_per_request(caplog):
+    engine = instrument_engine(create_engine("sqlite://"), repeat_threshold=3)
+    app = FastAPI()
+
+    @app.get("/")
+    async def n_plus_one():
+        with engine.connect() as connection:
+            for i in range(6):
+                connection.execute(text("select :i"), {"i": i})
+        stats = current_query_stats_ctx.get()
+        return {"count": stats.count, "shapes": stats.shapes}  # type: ignore
+
+    app.add_middleware(QueryStatsMiddleware)
+    repeated_before = REPEATED_STATEMENTS.values().get(("app.test",), 0)
+    queries_before = QUERIES.values().get(("app.test",), 0)
+
+    token = current_logger_ctx.set("app.test")
+    try:
+        with caplog.at_level(logging.WARNING):
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+                response = await ac.get("/")
+    finally:
+        current_logger_ctx.reset(token)
+
+    assert response.json() == {"count": 6, "shapes": {"select ?": 6}}
+    warnings = [r for r in caplog.records if "possible N+1 query" in r.getMessage()]
+    assert len(warnings) == 1
+    assert warnings[0].statement == "select ?"  # type: ignore
+    assert REPEATED_STATEMENTS.values()[("app.test",)] == repeated_before + 1
+    assert QUERIES.values()[("app.test",)] == queries_before + 6
+
+
+def test_slow_query_log_with_query_plan(caplog):
+    engine = instrument_engine(create_engine("sqlite://"), slow_query_threshold_ms=0)
+    with engine.connect() as connection:
+        connection.execute(text("create table pet (id integer primary key, name text)"))
+        connection.execute(text("create index ix_pet_name on pet (name)"))
+
+        # looks like a service method to the caller lookup
+        service_globals = {"__name__": "services.pet_service.core.service", "text": text}
+        exec(
+            "def get_pet_by_name(c, n):\n    return c.execute(text(SQL), {'n': n})", service_globals
+        )
+        service_globals["SQL"] = "select * from pet where name = :n"
+        with caplog.at_level(logging.DEBUG, logger="db.slow_query"):
+            service_globals["get_pet_by_name"](connection, "Rex")
+            service_globals["get_pet_by_name"](connection, "Fido")
+
+    records = [
+        r for r in caplog.records if r.name == "db.slow_query" and "pet where" in r.statement
+    ]  # type: ignore
+    assert len(records) == 2
+    record = records[0]
+    assert record.statement == "select * from pet where name = ?"  # type: ignore
+    assert record.parameters == "('Rex',)"  # type: ignore
+    assert record.caller == "services.pet_service.core.service.get_pet_by_name"  # type: ignore
+    assert any("ix_pet_name" in detail for detail in record.query_plan)  # type: ignore
+    assert records[1].query_plan is record.query_plan  # type: ignore
+
+
+def test_query_plans_are_bounded(monkeypatch):
+    monkeypatch.setattr(db_instrumentation, "MAX_QUERY_PLANS", 2)
+    engine = instrument_engine(create_engine("sqlite://"), slow_query_threshold_ms=0)
+    with engine.connect() as connection:
+        for column in ["1", "2", "1", "3"]:
+            connection.execute(text(f"select {column} as c{column}"))
+    query_plans = db_instrumentation._instrumentations[engine].query_plans
+    # the least recently used shape is dropped
+    assert list(query_plans) == ["select 1 as c1", "select 3 as c3"]
+
+
+def test_statements_of_expired_requests_do_not_run():
+    engine = instrument_engine(create_engine("sqlite://"))
+    with engine.connect() as connection:
+        token = current_deadline_ctx.set(Deadline(0))
+        try:
+            with pytest.raises(DeadlineExceeded):
+                connection.execute(text("select 1"))
+        finally:
+            current_deadline_ctx.reset(token)
+        assert connection.execute(text("select 1")).scalar() == 1
+        assert not connection.info["query_start_times"]
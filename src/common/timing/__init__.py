@@ -0,0 +1,6 @@
+from .timings import RequestTimings as RequestTimings
+from .timings import current_timings_ctx as current_timings_ctx
+from .timings import record_time as record_time
+from .timings import timed as timed
+from .middleware import ServerTimingMiddleware as ServerTimingMiddleware
+from .route import TimedAPIRoute as TimedAPIRoute
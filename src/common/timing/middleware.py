@@ -0,0 +1,32 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .timings import RequestTimings, current_timings_ctx
+
+SERVER_TIMING_HEADER = "server-timing"
+
+
+class ServerTimingMiddleware:
+    """Add a Server-Timing header breaking down where the time of the request was spent."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+
+        async def send_with_server_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(SERVER_TIMING_HEADER, timings.server_timing())
+            await send(message)
+
+        token = current_timings_ctx.set(timings)
+        try:
+            await self.app(scope, receive, send_with_server_timing)
+        finally:
+            current_timings_ctx.reset(token)
@@ -0,0 +1,53 @@
+import functools
+import inspect
+import time
+from typing import Any, Callable
+
+from fastapi.routing import APIRoute
+
+from .timings import current_timings_ctx
+
+
+def _timed_endpoint(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+    if getattr(endpoint, "_timed_endpoint", False):
+        return endpoint  # include_router recreates the route with the already wrapped endpoint
+
+    def finish(start: float):
+        timings = current_timings_ctx.get()
+        if timings is not None:
+            timings.handler_end = time.perf_counter()
+            timings.add("handler", timings.handler_end - start)
+
+    if inspect.iscoroutinefunction(endpoint):
+
+        @functools.wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                finish(start)
+
+        async_wrapper._timed_endpoint = True  # type: ignore
+        return async_wrapper
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            finish(start)
+
+    wrapper._timed_endpoint = True  # type: ignore
+    return wrapper
+
+
+class TimedAPIRoute(APIRoute):
+    """
+    APIRoute recording the endpoint time as "handler" in the request timings, the time from the
+    endpoint returning to the response being sent is reported as "serialize".
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
@@ -0,0 +1,57 @@
+import asyncio
+import re
+
+import pytest
+from fastapi import APIRouter, FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from ...timing import ServerTimingMiddleware, TimedAPIRoute, timed
+
+
+def parse_server_timing(value: str) -> dict[str, float]:
+    return {name: float(dur) for name, dur in re.findall(r"(\w+);dur=([\d.]+)", value)}
+
+
+@pytest.fixture
+def app():
+    router = APIRouter(route_class=TimedAPIRoute)
+
+    @router.get("/{pet_id}")
+    async def get_pet(pet_id: int):
+        with timed("rpc"):
+            await asyncio.sleep(0.01)
+        return {"pet_id": pet_id}
+
+    @router.get("/sync/{pet_id}")
+    def get_pet_sync(pet_id: int):
+        return {"pet_id": pet_id}
+
+    app = FastAPI()
+    app.include_router(router)
+    app.add_middleware(ServerTimingMiddleware)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_server_timing_header(app):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/1")
+        sync_response = await ac.get("/sync/1")
+    assert response.json() == {"pet_id": 1}
+    timings = parse_server_timing(response.headers["server-timing"])
+    assert list(timings) == ["rpc", "handler", "serialize", "total"]
+    assert 10 <= timings["rpc"] <= timings["handler"] <= timings["total"]
+
+    assert sync_response.json() == {"pet_id": 1}
+    assert list(parse_server_timing(sync_response.headers["server-timing"])) == [
+        "handler",
+        "serialize",
+        "total",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_unmatched_route_only_reports_total(app):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        response = await ac.get("/missing/route/here")
+    assert list(parse_server_timing(response.headers["server-timing"])) == ["total"]
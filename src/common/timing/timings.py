@@ -0,0 +1,54 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+# Order of the entries in the Server-Timing header
+SERVER_TIMING_NAMES = ("db", "rpc", "handler", "serialize", "total")
+
+
+class RequestTimings:
+    """
+    Accumulate where the time of a request was spent, e.g. in the database or in RPCs.
+    Durations of concurrent operations (asyncio.gather) are summed and may exceed the total.
+    """
+
+    __slots__ = ("start", "durations", "handler_end")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.durations: dict[str, float] = {}
+        self.handler_end: float | None = None
+
+    def add(self, name: str, seconds: float):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def server_timing(self, now: float | None = None) -> str:
+        """The Server-Timing header value, durations in milliseconds."""
+        now = time.perf_counter() if now is None else now
+        durations = dict(self.durations)
+        if self.handler_end is not None:
+            durations["serialize"] = now - self.handler_end
+        durations["total"] = now - self.start
+        names = [name for name in SERVER_TIMING_NAMES if name in durations]
+        names += sorted(durations.keys() - set(SERVER_TIMING_NAMES))
+        return ", ".join(f"{name};dur={durations[name] * 1000:.3f}" for name in names)
+
+
+current_timings_ctx: ContextVar[RequestTimings | None] = ContextVar("current_timings", default=None)
+
+
+def record_time(name: str, seconds: float):
+    """Add to the timings of the current request, a no-op outside of a request."""
+    timings = current_timings_ctx.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_time(name, time.perf_counter() - start)
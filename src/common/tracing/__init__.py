@@ -0,0 +1,10 @@
+from .span import Span as Span
+from .span import SpanKind as SpanKind
+from .span import current_span_ctx as current_span_ctx
+from .span import current_traceparent as current_traceparent
+from .span import start_span as start_span
+from .exporter import EXPORTER as EXPORTER
+from .exporter import SpanExporter as SpanExporter
+from .exporter import current_exporter as current_exporter
+from .exporter import current_exporter_ctx as current_exporter_ctx
+from .middleware import TracingMiddleware as TracingMiddleware
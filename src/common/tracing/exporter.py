@@ -0,0 +1,139 @@
+import json
+import queue
+import sys
+import threading
+import traceback
+from collections import deque
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Iterable
+
+if TYPE_CHECKING:
+    from .span import Span
+
+SCOPE_NAME = "common.tracing"
+
+
+def _otlp_value(value: Any) -> dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}  # int64 is a string in OTLP JSON
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def span_to_otlp(span: "Span") -> dict[str, Any]:
+    otlp = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": int(span.kind),
+        "startTimeUnixNano": str(span.start_time_ns),
+        "endTimeUnixNano": str(span.end_time_ns),
+        "attributes": [
+            {"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()
+        ],
+        "status": {"code": int(span.status)},
+    }
+    if span.parent_span_id is not None:
+        otlp["parentSpanId"] = span.parent_span_id
+    return otlp
+
+
+def to_otlp(spans: Iterable["Span"], service_name: str = "app") -> dict[str, Any]:
+    """An ExportTraceServiceRequest in the OTLP JSON encoding."""
+    return {
+        "resourceSpans": [
+            {
+                "resource": {
+                    "attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]
+                },
+                "scopeSpans": [
+                    {"scope": {"name": SCOPE_NAME}, "spans": [span_to_otlp(s) for s in spans]}
+                ],
+            }
+        ]
+    }
+
+
+class SpanExporter:
+    """
+    Keep the most recent finished spans in a ring buffer and optionally append them to a JSONL
+    file, one OTLP JSON export request per line.
+    The file is written by a background thread so exporting never blocks the event loop.
+    """
+
+    def __init__(self, buffer_size: int = 1024, path: str | None = None, service_name="app"):
+        self.service_name = service_name
+        self._spans: deque[Span] = deque(maxlen=buffer_size)
+        self._path: str | None = None
+        self._jobs: queue.SimpleQueue[Span | None] = queue.SimpleQueue()
+        self._worker: threading.Thread | None = None
+        # spans end on the event loops of every app of the process, e.g. in threaded mode
+        self._worker_lock = threading.Lock()
+        self.configure(buffer_size, path, service_name)
+
+    def configure(self, buffer_size: int = 1024, path: str | None = None, service_name="app"):
+        self.close()
+        self.service_name = service_name
+        self._spans = deque(self._spans, maxlen=buffer_size)
+        self._path = path
+
+    def export(self, span: "Span"):
+        self._spans.append(span)
+        if self._path is not None:
+            if self._worker is None:
+                with self._worker_lock:
+                    if self._worker is None:
+                        worker = threading.Thread(
+                            target=self._work, name=type(self).__name__, daemon=True
+                        )
+                        worker.start()
+                        self._worker = worker
+            self._jobs.put(span)
+
+    def spans(self, trace_id: str | None = None) -> list["Span"]:
+        spans = list(self._spans)
+        if trace_id is not None:
+            spans = [span for span in spans if span.trace_id == trace_id]
+        return spans
+
+    def _work(self):
+        stop = False
+        while not stop:
+            batch = [self._jobs.get()]
+            while True:  # drain whatever else is queued into the same export request
+                try:
+                    batch.append(self._jobs.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stop = True
+            spans = [span for span in batch if span is not None]
+            if not spans:
+                continue
+            try:
+                with open(self._path, "a", encoding="utf-8") as f:  # type: ignore
+                    f.write(json.dumps(to_otlp(spans, self.service_name)) + "\n")
+            except Exception:
+                traceback.print_exc(file=sys.stderr)
+
+    def close(self):
+        """Flush the spans still queued for the file and stop the writer thread."""
+        with self._worker_lock:
+            if self._worker is not None:
+                self._jobs.put(None)
+                self._worker.join()
+                self._worker = None
+
+
+# Spans recorded outside of an app's TracingMiddleware, e.g. in tests and scripts
+EXPORTER = SpanExporter()
+
+# The exporter of the app handling the current request, set by its TracingMiddleware
+current_exporter_ctx: ContextVar[SpanExporter | None] = ContextVar("current_exporter", default=None)
+
+
+def current_exporter() -> SpanExporter:
+    return current_exporter_ctx.get() or EXPORTER
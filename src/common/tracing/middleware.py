@@ -0,0 +1,66 @@
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from common.metrics.middleware import route_template
+
+from .exporter import SpanExporter, current_exporter_ctx
+from .span import TRACEPARENT_HEADER, SpanKind, StatusCode, current_span_ctx, start_span
+
+
+def traceparent_from_scope(scope: Scope) -> str | None:
+    for key, value in scope.get("headers", []):
+        if key == TRACEPARENT_HEADER.encode():
+            return value.decode("latin-1")
+    return None
+
+
+class TracingMiddleware:
+    """
+    Record a span per request and sub app.
+
+    The outermost middleware starts the server span, continuing the trace of an incoming
+    traceparent header (e.g. a user_service -> pet_service call), mounted apps record a child
+    span so DB and RPC time are attributed to the sub app that spent it.
+    With an `exporter`, the spans of the request are exported there instead of to EXPORTER.
+    """
+
+    def __init__(self, app: ASGIApp, sub_app: str, exporter: SpanExporter | None = None):
+        self.app = app
+        self.sub_app = sub_app
+        self.exporter = exporter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if self.exporter is None:
+            await self.trace(scope, receive, send)
+            return
+        token = current_exporter_ctx.set(self.exporter)
+        try:
+            await self.trace(scope, receive, send)
+        finally:
+            current_exporter_ctx.reset(token)
+
+    async def trace(self, scope: Scope, receive: Receive, send: Send) -> None:
+        outermost = current_span_ctx.get() is None
+        method = scope["method"]
+        with start_span(
+            method,
+            SpanKind.SERVER if outermost else SpanKind.INTERNAL,
+            {"sub_app": self.sub_app, "http.method": method},
+            traceparent=traceparent_from_scope(scope) if outermost else None,
+        ) as span:
+
+            async def send_with_status(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    span.set_attribute("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        span.status = StatusCode.ERROR
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_status)
+            finally:
+                route = route_template(scope)
+                span.name = f"{method} {route}"
+                span.set_attribute("http.route", route)
@@ -0,0 +1,132 @@
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Iterator
+
+from .exporter import current_exporter
+
+TRACEPARENT_HEADER = "traceparent"
+_TRACEPARENT_PATTERN = re.compile(r"00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})")
+
+
+class SpanKind(IntEnum):
+    """Values of the OTLP SpanKind enum."""
+
+    INTERNAL = 1
+    SERVER = 2
+    CLIENT = 3
+
+
+class StatusCode(IntEnum):
+    UNSET = 0
+    OK = 1
+    ERROR = 2
+
+
+class Span:
+    __slots__ = (
+        "name",
+        "kind",
+        "trace_id",
+        "span_id",
+        "parent_span_id",
+        "parent",
+        "attributes",
+        "status",
+        "start_time_ns",
+        "end_time_ns",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        kind: SpanKind = SpanKind.INTERNAL,
+        trace_id: str | None = None,
+        parent_span_id: str | None = None,
+        parent: "Span | None" = None,
+        attributes: dict[str, Any] | None = None,
+    ):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id or f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent_span_id
+        self.parent = parent  # the local parent, None for a root or a remote parent
+        self.attributes = {} if attributes is None else attributes
+        self.status = StatusCode.UNSET
+        self.start_time_ns = time.time_ns()
+        self.end_time_ns: int | None = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = time.time_ns() if self.end_time_ns is None else self.end_time_ns
+        return (end - self.start_time_ns) / 1_000_000
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def add(self, key: str, amount: float):
+        """Accumulate into a numeric attribute, e.g. the time spent in the database."""
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def end(self):
+        self.end_time_ns = time.time_ns()
+        if self.kind == SpanKind.CLIENT and self.parent is not None:
+            self.parent.add("rpc.duration_ms", self.duration_ms)
+            self.parent.add("rpc.count", 1)
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+
+current_span_ctx: ContextVar[Span | None] = ContextVar("current_span", default=None)
+
+
+def parse_traceparent(value: str | None) -> tuple[str, str] | None:
+    """Return (trace id, parent span id) of a W3C traceparent header, None if it is invalid."""
+    if value is None:
+        return None
+    match = _TRACEPARENT_PATTERN.fullmatch(value.strip().lower())
+    if match is None or match[1] == "0" * 32 or match[2] == "0" * 16:
+        return None
+    return match[1], match[2]
+
+
+def current_traceparent() -> str | None:
+    span = current_span_ctx.get()
+    return None if span is None else span.traceparent
+
+
+@contextmanager
+def start_span(
+    name: str,
+    kind: SpanKind = SpanKind.INTERNAL,
+    attributes: dict[str, Any] | None = None,
+    traceparent: str | None = None,
+) -> Iterator[Span]:
+    """
+    Start a span as a child of the current span and make it current until the block exits.
+    `traceparent` continues a remote trace when there is no current span.
+    """
+    parent = current_span_ctx.get()
+    if parent is not None:
+        span = Span(name, kind, parent.trace_id, parent.span_id, parent, attributes)
+    elif (remote := parse_traceparent(traceparent)) is not None:
+        span = Span(name, kind, remote[0], remote[1], attributes=attributes)
+    else:
+        span = Span(name, kind, attributes=attributes)
+    token = current_span_ctx.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.status = StatusCode.ERROR
+        span.set_attribute("exception.type", type(e).__name__)
+        raise
+    finally:
+        current_span_ctx.reset(token)
+        span.end()
+        current_exporter().export(span)
@@ -0,0 +1,130 @@
+import json
+import threading
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import create_engine, text
+
+from common.db_instrumentation import instrument_engine
+
+from ...tracing import EXPORTER, SpanExporter, SpanKind, TracingMiddleware, start_span
+from ..span import parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@pytest.fixture
+def exporter():
+    EXPORTER.configure(buffer_size=100)
+    yield EXPORTER
+    EXPORTER.configure()
+
+
+def test_parse_traceparent():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID)
+    assert parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert parse_traceparent("garbage") is None
+    assert parse_traceparent(None) is None
+
+
+def test_nested_spans_and_rpc_time(exporter):
+    with start_span("parent") as parent:
+        with start_span("call", SpanKind.CLIENT) as client:
+            pass
+    assert client.trace_id == parent.trace_id
+    assert client.parent_span_id == parent.span_id
+    assert parent.attributes["rpc.count"] == 1
+    assert parent.attributes["rpc.duration_ms"] == client.duration_ms
+    assert [span.name for span in exporter.spans(parent.trace_id)] == ["call", "parent"]
+
+
+def test_db_time_is_added_to_current_span(exporter):
+    engine = instrument_engine(create_engine("sqlite://"))
+    with start_span("query") as span, engine.connect() as connection:
+        connection.execute(text("select 1"))
+        connection.execute(text("select 2"))
+    assert span.attributes["db.statement_count"] == 2
+    assert span.attributes["db.duration_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_middleware_continues_remote_trace(exporter):
+    sub_app = FastAPI()
+
+    @sub_app.get("/{pet_id}")
+    async def get_pet(pet_id: int):
+        return {"pet_id": pet_id}
+
+    sub_app.add_middleware(TracingMiddleware, sub_app="app.pet_service")
+    app = FastAPI()
+    app.mount("/pet", sub_app)
+    app.add_middleware(TracingMiddleware, sub_app="app")
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+        await ac.get("/pet/1", headers={"traceparent": f"00-{TRACE_ID}-{PARENT_ID}-01"})
+
+    inner, outer = exporter.spans(TRACE_ID)
+    assert (outer.kind, outer.parent_span_id) == (SpanKind.SERVER, PARENT_ID)
+    assert (inner.kind, inner.parent_span_id) == (SpanKind.INTERNAL, outer.span_id)
+    assert inner.name == outer.name == "GET /pet/{pet_id}"
+    assert inner.attributes["sub_app"] == "app.pet_service"
+    assert inner.attributes["http.status_code"] == 200
+
+
+def test_exporter_writes_otlp_json_lines(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = SpanExporter(path=str(path))
+    for name in ("a", "b"):
+        with start_span(name) as span:
+            pass
+        exporter.export(span)
+    exporter.close()
+    spans = [
+        span
+        for line in path.read_text().splitlines()
+        for resource_spans in json.loads(line)["resourceSpans"]
+        for scope_spans in resource_spans["scopeSpans"]
+        for span in scope_spans["spans"]
+    ]
+    assert [span["name"] for span in spans] == ["a", "b"]
+    assert spans[0]["kind"] == SpanKind.INTERNAL
+
+
+@pytest.mark.asyncio
+async def test_each_app_exports_to_its_own_exporter(exporter):
+    global_spans = len(exporter.spans())
+    exporters = {name: SpanExporter(service_name=name) for name in ("app", "app1")}
+    clients = {}
+    for name, app_exporter in exporters.items():
+        app = FastAPI()
+
+        @app.get("/")
+        async def root():
+            return {}
+
+        app.add_middleware(TracingMiddleware, sub_app=name, exporter=app_exporter)
+        clients[name] = AsyncClient(transport=ASGITransport(app=app), base_url="http://test")
+
+    for name, client in clients.items():
+        async with client:
+            await client.get("/")
+    for name, app_exporter in exporters.items():
+        assert [span.attributes["sub_app"] for span in app_exporter.spans()] == [name]
+    assert len(exporter.spans()) == global_spans
+
+
+def test_exporter_starts_a_single_writer_thread(tmp_path):
+    exporter = SpanExporter(path=str(tmp_path / "traces.jsonl"))
+    with start_span("a") as span:
+        pass
+    threads = [threading.Thread(target=exporter.export, args=(span,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    workers = [t for t in threading.enumerate() if t.name == "SpanExporter"]
+    exporter.close()
+    assert len(workers) == 1
+    assert len((tmp_path / "traces.jsonl").read_text().splitlines()) >= 1
@@ -3,12 +3,23 @@ from fastapi import Depends
 from sqlalchemy import Engine
 from sqlmodel import Session, create_engine
 
+from common.db_instrumentation import DEFAULT_REPEAT_THRESHOLD, instrument_engine
 
-def init_engine(DATABASE_URL: str):
-    return create_engine(
+
+def init_engine(
+    DATABASE_URL: str,
+    query_repeat_threshold: int = DEFAULT_REPEAT_THRESHOLD,
+    slow_query_threshold_ms: float | None = None,
+):
+    engine = create_engine(
         DATABASE_URL,
         connect_args={"check_same_thread": False},  # needed only for SQLite
     )
+    return instrument_engine(
+        engine,
+        repeat_threshold=query_repeat_threshold,
+        slow_query_threshold_ms=slow_query_threshold_ms,
+    )
 
 
 async def get_engine_instance() -> Engine:
@@ -10,13 +10,18 @@ from .core.service import PetService
 from .defaults import DATABASE_URL
 
 
-def app(database_url: str = DATABASE_URL, *args, **kwargs):
+def app(
+    database_url: str = DATABASE_URL,
+    slow_query_threshold_ms: float | None = None,
+    *args,
+    **kwargs,
+):
     @asynccontextmanager
     async def lifespan(app: FastAPI):
         getContextualLogger().info(
             f"Starting app with args: database_url={database_url}, args={args}, kwargs={kwargs}"
         )
-        engine = init_engine(database_url)
+        engine = init_engine(database_url, slow_query_threshold_ms=slow_query_threshold_ms)
 
         async def get_engine_instance_override():
             return engine
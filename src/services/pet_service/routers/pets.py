@@ -1,13 +1,15 @@
 from typing import Annotated, List
 from fastapi import APIRouter, Query
 
+from common.timing import TimedAPIRoute
+
 from ..dependencies.service import PetServiceDep
 from ..dependencies.database import SessionDep
 from ..models import PetResponseObject, PetCreateObject, PetUpdateObject
 
 
 def create_router():
-    router = APIRouter()
+    router = APIRouter(route_class=TimedAPIRoute)
 
     @router.post("/", response_model=PetResponseObject)
     async def create_pet(pet: PetCreateObject, service: PetServiceDep, session: SessionDep):
@@ -1,10 +1,13 @@
 import logging
 from fastapi import APIRouter
+
+from common.timing import TimedAPIRoute
+
 from ..dependencies.service import ServiceDep, ServiceSessionDep
 
 
 def create_router():
-    router = APIRouter()
+    router = APIRouter(route_class=TimedAPIRoute)
 
     @router.get("/session")
     def call_session(session: ServiceSessionDep):
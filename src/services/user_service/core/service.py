@@ -1,8 +1,12 @@
 from typing import List
 import asyncio
+from math import ceil
 from fastapi import HTTPException
 from sqlmodel import Session, delete, select
+from common.deadline import DeadlineExceeded
 from common.logging import getContextualLogger
+from common.timing import timed
+from common.tracing import SpanKind, start_span
 from ..models import (
     UserTableObject,
     UserCreateObject,
@@ -10,7 +14,7 @@ from ..models import (
     UserPetTableObject,
     UserPetResponseObject,
 )
-from ..pet_service_client import DefaultApi
+from ..pet_service_client import DefaultApi, is_not_found, pet_service_request_headers
 
 
 class UserService:
@@ -21,29 +25,41 @@ class UserService:
     async def get_pet_from_pet_service(pet_id: int, session: Session, api_instance: DefaultApi):
         logger = getContextualLogger()
         logger.debug("Fetching pet from pet service", extra={"pet_id": pet_id})
-        pet_response = None
         try:
-            pet_response = await api_instance.get_pet_pet_id_get(pet_id)
+            with start_span("GET /pet/{pet_id}", SpanKind.CLIENT, {"pet_id": pet_id}), timed("rpc"):
+                return await api_instance.get_pet_pet_id_get(
+                    pet_id, _headers=pet_service_request_headers()
+                )
+        except DeadlineExceeded:
+            raise
         except Exception as e:
-            logger.error(
-                "Failed to fetch pet from pet service", extra={"pet_id": pet_id, "error": str(e)}
-            )
-            print("Exception when calling DefaultApi->get_pet_pet_id_get: %s\n" % e)
-        if not pet_response:
-            logger.warning(
-                "Pet not found in pet service, cleaning up references", extra={"pet_id": pet_id}
-            )
-            statement = delete(UserPetTableObject).where(
-                UserPetTableObject.pet_id == pet_id  # type: ignore
-            )
-            logger.debug(
-                "Executing SQL",
-                extra={"sql": str(statement.compile(compile_kwargs={"literal_binds": True}))},
-            )
-            session.exec(statement)  # type: ignore
-            session.commit()
-            raise HTTPException(status_code=404, detail="pet not found")
-        return pet_response
+            if not is_not_found(e):
+                # an unavailable pet service says nothing about the pet, keep its adoptions
+                logger.error(
+                    "Failed to fetch pet from pet service",
+                    extra={"pet_id": pet_id, "error": str(e)},
+                )
+                retry_after = getattr(e, "retry_after", None)
+                raise HTTPException(
+                    status_code=503,
+                    detail="pet service unavailable",
+                    headers=None
+                    if retry_after is None
+                    else {"Retry-After": str(ceil(retry_after))},
+                ) from e
+        logger.warning(
+            "Pet not found in pet service, cleaning up references", extra={"pet_id": pet_id}
+        )
+        statement = delete(UserPetTableObject).where(
+            UserPetTableObject.pet_id == pet_id  # type: ignore
+        )
+        logger.debug(
+            "Executing SQL",
+            extra={"sql": str(statement.compile(compile_kwargs={"literal_binds": True}))},
+        )
+        session.exec(statement)  # type: ignore
+        session.commit()
+        raise HTTPException(status_code=404, detail="pet not found")
 
     @staticmethod
     def format_user_response(user: UserTableObject, pets: List[UserPetResponseObject]):
@@ -84,6 +100,8 @@ class UserService:
                     logger.warning(
                         "Pet reference cleanup", extra={"pet_id": pet.pet_id, "user_id": user_id}
                     )
+                else:
+                    raise
         logger.info("Retrieved user's pets", extra={"user_id": user_id, "pet_count": len(pets)})
         return pets
 
@@ -99,6 +117,8 @@ class UserService:
             response = await UserService.cast_user_to_response(db_user, session, api_instance)
             logger.info("Successfully created user", extra={"user_id": db_user.id})
             return response
+        except (DeadlineExceeded, HTTPException):
+            raise
         except Exception as e:
             logger.error(
                 "Failed to create user", extra={"error": str(e), "user_data": user.model_dump()}
@@ -3,22 +3,41 @@ from fastapi import FastAPI
 from common.logging.getLogger import getContextualLogger
 from common.routers import status_OK
 from services.user_service.core.service import UserService
-from services.user_service.dependencies.pet_service import get_pet_service_api_client
+from services.user_service.dependencies.pet_service import (
+    get_pet_service_api_client,
+    get_pet_service_default_api_client,
+)
 from services.user_service.dependencies.service import get_user_service_instance
-from services.user_service.pet_service_client import create_pet_service_api_client
+from services.user_service.pet_service_client import (
+    Strategy,
+    create_balanced_pet_service_api,
+    create_pet_service_api_client,
+    create_pet_service_default_api_client,
+    create_resilient_pet_service_api,
+    use_unix_socket,
+)
 from .routers import users
 from .core.database import create_tables
 from .dependencies.database import get_engine_instance, init_engine
 from .defaults import DATABASE_URL, PET_SERVICE_URL
 
 
-def app(database_url: str = DATABASE_URL, pet_service_url: str = PET_SERVICE_URL, *args, **kwargs):
+def app(
+    database_url: str = DATABASE_URL,
+    pet_service_url: str | list[str] = PET_SERVICE_URL,
+    slow_query_threshold_ms: float | None = None,
+    pet_service_uds: str | None = None,
+    pet_service_balancer: Strategy = "least_outstanding",
+    pet_service_resilience: dict | None = None,
+    *args,
+    **kwargs,
+):
     @asynccontextmanager
     async def lifespan(app: FastAPI):
         getContextualLogger().info(
             f"Starting app with args: database_url={database_url}, args={args}, kwargs={kwargs}"
         )
-        engine = init_engine(database_url)
+        engine = init_engine(database_url, slow_query_threshold_ms=slow_query_threshold_ms)
 
         async def get_engine_instance_override():
             return engine
@@ -33,12 +52,35 @@ def app(database_url: str = DATABASE_URL, pet_service_url: str = PET_SERVICE_URL
 
         app.dependency_overrides[get_user_service_instance] = get_user_service_instance_override
 
-        pet_service_api_client = create_pet_service_api_client(pet_service_url)
+        if isinstance(pet_service_url, list) and len(pet_service_url) > 1:
+            if pet_service_uds is not None:
+                raise ValueError("pet_service_uds needs a single pet_service_url")
+            pet_service_api = create_balanced_pet_service_api(pet_service_url, pet_service_balancer)
+        else:
+            url = pet_service_url[0] if isinstance(pet_service_url, list) else pet_service_url
+            pet_service_api_client = create_pet_service_api_client(url)
+            if pet_service_uds is not None:
+                # pet_service_url still sets the path prefix, e.g. http://localhost/pet
+                await use_unix_socket(pet_service_api_client, pet_service_uds)
 
-        async def get_pet_service_api_client_override():
-            return pet_service_api_client
+            async def get_pet_service_api_client_override():
+                return pet_service_api_client
 
-        app.dependency_overrides[get_pet_service_api_client] = get_pet_service_api_client_override
+            app.dependency_overrides[get_pet_service_api_client] = (
+                get_pet_service_api_client_override
+            )
+            pet_service_api = create_pet_service_default_api_client(pet_service_api_client)
+        # shared by all requests, the circuit breaker sees every call
+        resilient_api = create_resilient_pet_service_api(
+            pet_service_api, **(pet_service_resilience or {})
+        )
+
+        async def get_pet_service_default_api_client_override():
+            return resilient_api
+
+        app.dependency_overrides[get_pet_service_default_api_client] = (
+            get_pet_service_default_api_client_override
+        )
         yield
 
     app = FastAPI(lifespan=lifespan)
@@ -1,6 +1,22 @@
 from typing import TYPE_CHECKING
 
+from common.deadline import deadline_headers
+from common.logging.getLogger import REQUEST_ID_HEADER, current_request_id_ctx
+from common.tracing import current_traceparent
+from common.tracing.span import TRACEPARENT_HEADER
+
+from .balancer import BalancedDefaultApi as BalancedDefaultApi
+from .balancer import Endpoint as Endpoint
+from .balancer import LoadBalancer as LoadBalancer
+from .balancer import Strategy as Strategy
+from .resilience import DEFAULT_FAILURE_THRESHOLD, DEFAULT_RESET_TIMEOUT
+from .resilience import CircuitBreaker as CircuitBreaker
+from .resilience import PetServiceUnavailable as PetServiceUnavailable
+from .resilience import ResilientDefaultApi as ResilientDefaultApi
+from .resilience import is_not_found as is_not_found
+
 if TYPE_CHECKING:
+    import aiohttp
     import pet_service_api
     from pet_service_api.api.default_api import DefaultApi
     from pet_service_api.configuration import Configuration
@@ -8,6 +24,7 @@ if TYPE_CHECKING:
     from .models import PetResponseObject as PetResponseObject
 else:
     try:
+        import aiohttp
         import pet_service_api
         from pet_service_api.api.default_api import DefaultApi
         from pet_service_api.configuration import Configuration
@@ -16,6 +33,7 @@ else:
     except ImportError:
         from unittest import mock
 
+        aiohttp = mock.Mock()
         pet_service_api = mock.Mock()
         DefaultApi = mock.Mock()
         Configuration = mock.Mock()
@@ -29,5 +47,57 @@ def create_pet_service_api_client(host: str) -> ApiClient:
     return ApiClient(configuration)
 
 
+async def use_unix_socket(api_client: ApiClient, path: str):
+    """
+    Send the requests of `api_client` over the unix socket at `path` instead of TCP, for a pet
+    service running on the same host. The url given to the client still sets the path prefix.
+    The connector keeps a pool of up to connection_pool_maxsize connections, like the TCP one.
+    """
+    rest_client = api_client.rest_client
+    if rest_client.pool_manager is not None:
+        await rest_client.pool_manager.close()
+    connector = aiohttp.UnixConnector(
+        path=path, limit=api_client.configuration.connection_pool_maxsize
+    )
+    rest_client.pool_manager = aiohttp.ClientSession(connector=connector)
+
+
 def create_pet_service_default_api_client(api_client: ApiClient):
     return DefaultApi(api_client)
+
+
+def create_balanced_pet_service_api(
+    hosts: list[str], strategy: Strategy = "least_outstanding", **kwargs
+) -> BalancedDefaultApi:
+    """A DefaultApi spreading the calls over the pet service instances at `hosts`."""
+    endpoints = [
+        Endpoint(host, create_pet_service_default_api_client(create_pet_service_api_client(host)))
+        for host in hosts
+    ]
+    return BalancedDefaultApi(LoadBalancer(endpoints, strategy, **kwargs))
+
+
+def create_resilient_pet_service_api(
+    api: "DefaultApi | BalancedDefaultApi",
+    failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+    reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+    **kwargs,
+) -> ResilientDefaultApi:
+    """
+    `api` with deadlines, retries, a circuit breaker and optional hedging,
+    see ResilientDefaultApi for the keyword arguments.
+    """
+    return ResilientDefaultApi(
+        api, breaker=CircuitBreaker(failure_threshold, reset_timeout), **kwargs
+    )
+
+
+def pet_service_request_headers() -> dict[str, str]:
+    """Headers propagating the current request context to pet_service calls."""
+    headers = {}
+    if (request_id := current_request_id_ctx.get()) is not None:
+        headers[REQUEST_ID_HEADER] = request_id
+    if (traceparent := current_traceparent()) is not None:
+        headers[TRACEPARENT_HEADER] = traceparent
+    headers.update(deadline_headers())
+    return headers
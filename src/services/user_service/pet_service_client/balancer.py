@@ -0,0 +1,160 @@
+import bisect
+import random
+import time
+import zlib
+from typing import Any, Callable, Literal, Sequence
+
+from common.logging.getLogger import getContextualLogger
+from common.metrics import REGISTRY
+
+Strategy = Literal["least_outstanding", "p2c", "consistent_hash"]
+
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_EJECTION_SECONDS = 30.0
+VIRTUAL_NODES = 100
+
+EJECTIONS = REGISTRY.counter(
+    "pet_service_endpoint_ejections",
+    "Times a pet service endpoint was ejected after consecutive failures.",
+    ("endpoint",),
+)
+
+
+class Endpoint:
+    """A pet service instance and the calls currently in flight to it."""
+
+    def __init__(self, url: str, api: Any):
+        self.url = url
+        self.api = api
+        self.outstanding = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+
+    def available(self, now: float) -> bool:
+        return now >= self.ejected_until
+
+
+def _hash(value: str) -> int:
+    return zlib.crc32(value.encode())
+
+
+class LoadBalancer:
+    """
+    Pick the pet service endpoint of each call.
+
+    * least_outstanding: the endpoint with the fewest calls in flight.
+    * p2c: the less loaded of two random endpoints, close to least_outstanding without
+      herding every caller onto the same endpoint.
+    * consistent_hash: the endpoint owning the call's key (the pet id) on a hash ring, so each
+      instance sees the same pets and their cache stays warm. Calls without a key use p2c.
+
+    Endpoints failing `failure_threshold` calls in a row (connection errors and 5xx responses)
+    are ejected for `ejection_seconds`, when every endpoint is ejected they are all used again.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[Endpoint],
+        strategy: Strategy = "least_outstanding",
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        ejection_seconds: float = DEFAULT_EJECTION_SECONDS,
+        rng: random.Random | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if not endpoints:
+            raise ValueError("At least one pet service endpoint is required")
+        if strategy not in ("least_outstanding", "p2c", "consistent_hash"):
+            raise ValueError(f"Unknown load balancing strategy: {strategy}")
+        self.endpoints = list(endpoints)
+        self.strategy = strategy
+        self.failure_threshold = failure_threshold
+        self.ejection_seconds = ejection_seconds
+        self.rng = rng or random.Random()
+        self.clock = clock
+        self._ring = sorted(
+            (_hash(f"{endpoint.url}#{i}"), index)
+            for index, endpoint in enumerate(self.endpoints)
+            for i in range(VIRTUAL_NODES)
+        )
+        self._ring_hashes = [ring_hash for ring_hash, _ in self._ring]
+
+    def _available(self) -> list[Endpoint]:
+        now = self.clock()
+        return [
+            endpoint for endpoint in self.endpoints if endpoint.available(now)
+        ] or self.endpoints
+
+    def pick(self, key: Any = None) -> Endpoint:
+        if self.strategy == "consistent_hash" and key is not None:
+            return self._owner(str(key))
+        endpoints = self._available()
+        if self.strategy == "least_outstanding":
+            fewest = min(endpoint.outstanding for endpoint in endpoints)
+            return self.rng.choice([e for e in endpoints if e.outstanding == fewest])
+        if len(endpoints) == 1:
+            return endpoints[0]
+        first, second = self.rng.sample(endpoints, 2)
+        return first if first.outstanding <= second.outstanding else second
+
+    def _owner(self, key: str) -> Endpoint:
+        """The first available endpoint clockwise from the key on the hash ring."""
+        now = self.clock()
+        start = bisect.bisect(self._ring_hashes, _hash(key))
+        for offset in range(len(self._ring)):
+            endpoint = self.endpoints[self._ring[(start + offset) % len(self._ring)][1]]
+            if endpoint.available(now):
+                return endpoint
+        return self.endpoints[self._ring[start % len(self._ring)][1]]
+
+    def succeeded(self, endpoint: Endpoint):
+        endpoint.consecutive_failures = 0
+
+    def failed(self, endpoint: Endpoint):
+        endpoint.consecutive_failures += 1
+        if endpoint.consecutive_failures >= self.failure_threshold:
+            endpoint.consecutive_failures = 0
+            endpoint.ejected_until = self.clock() + self.ejection_seconds
+            EJECTIONS.inc(endpoint.url)
+            getContextualLogger().warning(
+                "Ejecting pet service endpoint after consecutive failures",
+                extra={"endpoint": endpoint.url, "ejection_seconds": self.ejection_seconds},
+            )
+
+
+def _is_endpoint_failure(exception: Exception) -> bool:
+    """Connection errors and 5xx responses count against the endpoint, 4xx ones don't."""
+    status = getattr(exception, "status", None)
+    return not isinstance(status, int) or status >= 500
+
+
+class BalancedDefaultApi:
+    """
+    A DefaultApi spreading its calls over several pet service instances.
+    The pet id, the first argument of the pet operations, is the consistent hashing key.
+    """
+
+    def __init__(self, balancer: LoadBalancer):
+        self.balancer = balancer
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def call(*args, **kwargs):
+            key = kwargs.get("pet_id", args[0] if args else None)
+            endpoint = self.balancer.pick(key)
+            endpoint.outstanding += 1
+            try:
+                response = await getattr(endpoint.api, name)(*args, **kwargs)
+            except Exception as e:
+                if _is_endpoint_failure(e):
+                    self.balancer.failed(endpoint)
+                else:
+                    self.balancer.succeeded(endpoint)
+                raise
+            finally:
+                endpoint.outstanding -= 1
+            self.balancer.succeeded(endpoint)
+            return response
+
+        return call
@@ -0,0 +1,235 @@
+import asyncio
+import random
+import time
+from typing import Any, Callable
+
+from common.deadline import DEADLINE_HEADER, DeadlineExceeded, deadline_headers, remaining_time
+from common.logging.getLogger import getContextualLogger
+from common.metrics import REGISTRY
+
+try:
+    from aiohttp import ClientError as _ClientError
+except ImportError:
+    _ClientError = OSError
+
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_RETRIES = 2
+DEFAULT_BACKOFF = 0.05
+DEFAULT_MAX_BACKOFF = 1.0
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RESET_TIMEOUT = 30.0
+
+EXTRA_ATTEMPTS = REGISTRY.counter(
+    "pet_service_extra_attempts",
+    "Pet service calls sent again, as a retry or as a hedge of a slow call.",
+    ("kind",),
+)
+REJECTED_CALLS = REGISTRY.counter(
+    "pet_service_rejected_calls",
+    "Pet service calls failed fast because the circuit breaker is open.",
+)
+CIRCUIT_OPEN = REGISTRY.gauge(
+    "pet_service_circuit_open",
+    "1 while the pet service circuit breaker is open or half open, else 0.",
+)
+
+
+class PetServiceUnavailable(Exception):
+    """The pet service did not answer, as opposed to answering that the pet does not exist."""
+
+    def __init__(self, message: str, retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_not_found(exception: BaseException) -> bool:
+    return getattr(exception, "status", None) == 404
+
+
+def is_unavailable(exception: BaseException) -> bool:
+    """Connection errors, timeouts, 429 and 5xx responses, worth trying again."""
+    if isinstance(exception, (PetServiceUnavailable, TimeoutError, OSError, _ClientError)):
+        return True
+    status = getattr(exception, "status", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+class CircuitBreaker:
+    """
+    Fail fast while the pet service is down instead of making every request wait for it.
+
+    After `failure_threshold` unavailable calls in a row the circuit opens and calls are rejected
+    for `reset_timeout` seconds. Then it is half open: a single trial call goes through, closing
+    the circuit when it succeeds and opening it again when it fails.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_timeout: float = DEFAULT_RESET_TIMEOUT,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trial_started_at: float | None = None
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.reset_timeout - self.clock())
+
+    def allow(self) -> bool:
+        now = self.clock()
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            if now < self.opened_at + self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+            self.trial_started_at = None
+        # a trial whose outcome never came back (e.g. cancelled) doesn't block the circuit forever
+        if self.trial_started_at is None or now >= self.trial_started_at + self.reset_timeout:
+            self.trial_started_at = now
+            return True
+        return False
+
+    def succeeded(self):
+        self.consecutive_failures = 0
+        if self.state != self.CLOSED:
+            self.state = self.CLOSED
+            CIRCUIT_OPEN.set(0)
+            getContextualLogger().info("Pet service circuit breaker closed")
+
+    def failed(self):
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state == self.CLOSED:
+                getContextualLogger().warning(
+                    "Pet service circuit breaker opened",
+                    extra={
+                        "failures": self.consecutive_failures,
+                        "reset_timeout": self.reset_timeout,
+                    },
+                )
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+            self.consecutive_failures = 0
+            CIRCUIT_OPEN.set(1)
+
+
+class ResilientDefaultApi:
+    """
+    A DefaultApi (or BalancedDefaultApi) whose calls have a deadline, are retried and hedged.
+
+    :param timeout: seconds a call may take in total, retries included, and no longer than the
+        deadline of the current request.
+    :param retries: times an unavailable call is sent again, after a jittered exponential backoff.
+    :param hedge_after: seconds after which a still running call is sent a second time, the first
+        answer wins. None disables hedging.
+    :param breaker: the circuit breaker, failing calls fast while the pet service is down.
+    """
+
+    def __init__(
+        self,
+        api: Any,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        max_backoff: float = DEFAULT_MAX_BACKOFF,
+        hedge_after: float | None = None,
+        breaker: CircuitBreaker | None = None,
+        rng: random.Random | None = None,
+    ):
+        self.api = api
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self.rng = rng or random.Random()
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        method = getattr(self.api, name)
+
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            # never wait past the deadline of the request being served
+            remaining = remaining_time()
+            limited_by_request = False
+            timeout = self.timeout
+            if remaining is not None and remaining < self.timeout:
+                limited_by_request = True
+                timeout = remaining
+            deadline = loop.time() + timeout
+            attempt = 0
+            while True:
+                if "_headers" in kwargs and DEADLINE_HEADER in kwargs["_headers"]:
+                    # a retry has less time left than the first attempt
+                    kwargs["_headers"] = {**kwargs["_headers"], **deadline_headers()}
+                if not self.breaker.allow():
+                    REJECTED_CALLS.inc()
+                    raise PetServiceUnavailable(
+                        "pet service circuit breaker is open", self.breaker.retry_after()
+                    )
+                try:
+                    async with asyncio.timeout_at(deadline):
+                        response = await self._attempt(method, args, kwargs)
+                except Exception as e:
+                    if not is_unavailable(e):
+                        # the pet service answered, e.g. 404
+                        self.breaker.succeeded()
+                        raise
+                    if limited_by_request and loop.time() >= deadline:
+                        # the request ran out of time, not the pet service's fault
+                        raise DeadlineExceeded("deadline exceeded calling the pet service") from e
+                    self.breaker.failed()
+                    # full jitter spreads the retries of concurrent callers
+                    delay = self.rng.uniform(0, min(self.max_backoff, self.backoff * 2**attempt))
+                    if attempt >= self.retries or loop.time() + delay >= deadline:
+                        raise PetServiceUnavailable(f"pet service unavailable: {e!r}") from e
+                    EXTRA_ATTEMPTS.inc("retry")
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                self.breaker.succeeded()
+                return response
+
+        return call
+
+    async def _attempt(self, method, args, kwargs):
+        if self.hedge_after is None:
+            return await method(*args, **kwargs)
+        pending: set[asyncio.Future] = set()
+        try:
+            # created inside the try, a cancelled caller cancels every attempt still running
+            first = asyncio.ensure_future(method(*args, **kwargs))
+            pending.add(first)
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_after)
+            if done:
+                return first.result()
+            EXTRA_ATTEMPTS.inc("hedge")
+            pending.add(asyncio.ensure_future(method(*args, **kwargs)))
+            error: BaseException | None = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if (exception := task.exception()) is None:
+                        return task.result()
+                    if not is_unavailable(exception):
+                        raise exception
+                    error = exception
+            assert error is not None
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
@@ -1,5 +1,8 @@
 from typing import List, Annotated
 from fastapi import APIRouter, Query
+
+from common.timing import TimedAPIRoute
+
 from ..models import UserResponseObject, UserCreateObject, UserUpdateObject
 from ..dependencies.database import SessionDep
 from ..dependencies.service import UserServiceDep
@@ -7,7 +10,7 @@ from ..dependencies.pet_service import petServiceDefaultApiClientDep
 
 
 def create_router():
-    router = APIRouter()
+    router = APIRouter(route_class=TimedAPIRoute)
 
     @router.post("/", response_model=UserResponseObject)
     async def create_user(
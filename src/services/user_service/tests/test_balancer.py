@@ -0,0 +1,99 @@
+import asyncio
+import random
+from collections import Counter
+
+import pytest
+
+from ..pet_service_client import BalancedDefaultApi, Endpoint, LoadBalancer
+
+
+class FakeApi:
+    def __init__(self, name: str, status: int | None = None):
+        self.name = name
+        self.status = status
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def get_pet_pet_id_get(self, pet_id: int, _headers=None):
+        await self.release.wait()
+        if self.status is not None:
+            error = Exception(f"{self.name} failed")
+            error.status = self.status  # type: ignore
+            raise error
+        return {"id": pet_id, "served_by": self.name}
+
+
+def endpoints(*apis: FakeApi) -> list[Endpoint]:
+    return [Endpoint(f"http://{api.name}", api) for api in apis]
+
+
+@pytest.mark.asyncio
+async def test_least_outstanding_avoids_busy_endpoints():
+    slow, fast = FakeApi("slow"), FakeApi("fast")
+    slow.release.clear()
+    api = BalancedDefaultApi(LoadBalancer(endpoints(slow, fast), rng=random.Random(0)))
+    api.balancer.endpoints[1].outstanding = 1  # fast is busier, the first call goes to slow
+
+    pending = asyncio.ensure_future(api.get_pet_pet_id_get(0))
+    await asyncio.sleep(0)
+    api.balancer.endpoints[1].outstanding = 0
+    served = [(await api.get_pet_pet_id_get(pet_id))["served_by"] for pet_id in range(1, 10)]
+    assert served == ["fast"] * 9
+    slow.release.set()
+    assert (await pending)["served_by"] == "slow"
+    assert all(endpoint.outstanding == 0 for endpoint in api.balancer.endpoints)
+
+
+def test_p2c_spreads_calls():
+    balancer = LoadBalancer(
+        endpoints(FakeApi("a"), FakeApi("b"), FakeApi("c")), "p2c", rng=random.Random(0)
+    )
+    picked = Counter(balancer.pick().url for _ in range(300))
+    assert set(picked) == {"http://a", "http://b", "http://c"}
+
+
+def test_consistent_hash_is_stable_and_skips_ejected_endpoints():
+    now = 0.0
+    balancer = LoadBalancer(
+        endpoints(FakeApi("a"), FakeApi("b"), FakeApi("c")),
+        "consistent_hash",
+        failure_threshold=1,
+        clock=lambda: now,
+    )
+    owners = {pet_id: balancer.pick(pet_id) for pet_id in range(100)}
+    assert len({owner.url for owner in owners.values()}) == 3
+    assert all(balancer.pick(pet_id) is owner for pet_id, owner in owners.items())
+
+    ejected = balancer.endpoints[0]
+    balancer.failed(ejected)
+    moved = {pet_id: balancer.pick(pet_id) for pet_id in range(100)}
+    assert ejected not in moved.values()
+    # only the pets of the ejected endpoint moved
+    assert all(moved[p] is owner for p, owner in owners.items() if owner is not ejected)
+
+    now = balancer.ejection_seconds
+    assert all(balancer.pick(pet_id) is owner for pet_id, owner in owners.items())
+
+
+@pytest.mark.asyncio
+async def test_failing_endpoint_is_ejected():
+    broken, healthy = FakeApi("broken", status=503), FakeApi("healthy")
+    api = BalancedDefaultApi(
+        LoadBalancer(endpoints(broken, healthy), "p2c", failure_threshold=2, rng=random.Random(1))
+    )
+    failures = 0
+    for pet_id in range(20):
+        try:
+            await api.get_pet_pet_id_get(pet_id)
+        except Exception:
+            failures += 1
+    assert failures == 2
+    assert api.balancer.endpoints[0].ejected_until > 0
+
+
+@pytest.mark.asyncio
+async def test_not_found_does_not_count_as_failure():
+    api = BalancedDefaultApi(LoadBalancer(endpoints(FakeApi("a", status=404)), failure_threshold=1))
+    with pytest.raises(Exception):
+        await api.get_pet_pet_id_get(1)
+    assert api.balancer.endpoints[0].ejected_until == 0
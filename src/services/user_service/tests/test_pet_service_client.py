@@ -72,3 +72,20 @@ async def test_get_pet_not_found(mocker, api_instance):
 async def test_get_api_client(api_instance):
     # Test the getApiClient function
     assert isinstance(api_instance, DefaultApi)
+
+
+@pytest.mark.anyio
+async def test_use_unix_socket_replaces_the_connection_pool(mocker):
+    from .. import pet_service_client
+
+    aiohttp = mocker.patch.object(pet_service_client, "aiohttp")
+    api_client = mocker.Mock()
+    api_client.configuration.connection_pool_maxsize = 7
+    tcp_pool = api_client.rest_client.pool_manager = mocker.AsyncMock()
+
+    await pet_service_client.use_unix_socket(api_client, "/tmp/pet.sock")
+
+    tcp_pool.close.assert_awaited_once()
+    aiohttp.UnixConnector.assert_called_once_with(path="/tmp/pet.sock", limit=7)
+    aiohttp.ClientSession.assert_called_once_with(connector=aiohttp.UnixConnector.return_value)
+    assert api_client.rest_client.pool_manager is aiohttp.ClientSession.return_value
@@ -0,0 +1,205 @@
+import asyncio
+import random
+
+import pytest
+from fastapi import HTTPException
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlmodel.pool import StaticPool
+
+from common.deadline import Deadline, DeadlineExceeded, current_deadline_ctx
+
+from ..core.service import UserService
+from ..models import UserCreateObject, UserPetTableObject, UserTableObject
+from ..pet_service_client import (
+    CircuitBreaker,
+    PetServiceUnavailable,
+    ResilientDefaultApi,
+    pet_service_request_headers,
+)
+
+
+def api_error(status: int) -> Exception:
+    error = Exception(f"HTTP {status}")
+    error.status = status  # type: ignore
+    return error
+
+
+class FakeApi:
+    """Answers with `responses` in order, exceptions are raised and floats are delays."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    async def get_pet_pet_id_get(self, pet_id: int, _headers=None):
+        self.calls += 1
+        response = self.responses.pop(0) if self.responses else {"id": pet_id}
+        if isinstance(response, float):
+            await asyncio.sleep(response)
+            return {"id": pet_id, "delayed": response}
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def resilient(api: FakeApi, **kwargs) -> ResilientDefaultApi:
+    return ResilientDefaultApi(api, backoff=0.001, rng=random.Random(0), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_unavailable_calls_are_retried():
+    api = FakeApi(api_error(503), ConnectionError("refused"))
+    assert await resilient(api, retries=2).get_pet_pet_id_get(1) == {"id": 1}
+    assert api.calls == 3
+
+    api = FakeApi(api_error(503), api_error(503))
+    with pytest.raises(PetServiceUnavailable):
+        await resilient(api, retries=1).get_pet_pet_id_get(1)
+    assert api.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_not_found_is_not_retried():
+    api = FakeApi(api_error(404))
+    wrapped = resilient(api, breaker=CircuitBreaker(failure_threshold=1))
+    with pytest.raises(Exception) as info:
+        await wrapped.get_pet_pet_id_get(1)
+    assert info.value.status == 404  # type: ignore
+    assert api.calls == 1
+    assert wrapped.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.mark.asyncio
+async def test_deadline_covers_the_retries():
+    api = FakeApi(1.0, 1.0)
+    with pytest.raises(PetServiceUnavailable):
+        await resilient(api, timeout=0.05, retries=5).get_pet_pet_id_get(1)
+    assert api.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_fails_fast_and_recovers():
+    now = 0.0
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=lambda: now)
+    api = FakeApi(api_error(500), api_error(500))
+    wrapped = resilient(api, retries=0, breaker=breaker)
+    for _ in range(2):
+        with pytest.raises(PetServiceUnavailable):
+            await wrapped.get_pet_pet_id_get(1)
+    assert breaker.state == CircuitBreaker.OPEN
+
+    with pytest.raises(PetServiceUnavailable) as info:
+        await wrapped.get_pet_pet_id_get(1)
+    assert info.value.retry_after == 10
+    assert api.calls == 2
+
+    now = 10.0
+    assert await wrapped.get_pet_pet_id_get(1) == {"id": 1}
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_circuit_lets_one_trial_through():
+    now = 0.0
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now)
+    breaker.failed()
+    now = 10.0
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.failed()
+    assert breaker.state == CircuitBreaker.OPEN and not breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_slow_calls_are_hedged():
+    api = FakeApi(1.0, {"id": 1, "hedge": True})
+    response = await resilient(api, hedge_after=0.01).get_pet_pet_id_get(1)
+    assert response == {"id": 1, "hedge": True}
+    assert api.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_cancels_the_hedged_attempt():
+    started, cancelled = asyncio.Event(), asyncio.Event()
+
+    class SlowApi:
+        async def get_pet_pet_id_get(self, pet_id: int, _headers=None):
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+    wrapped = resilient(SlowApi(), hedge_after=5)  # type: ignore
+    caller = asyncio.ensure_future(wrapped.get_pet_pet_id_get(1))
+    await started.wait()
+    caller.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await caller
+    assert cancelled.is_set()
+
+
+@pytest.mark.asyncio
+async def test_request_deadline_bounds_the_call():
+    api = FakeApi(1.0)
+    wrapped = resilient(api, timeout=5, breaker=CircuitBreaker(failure_threshold=1))
+    token = current_deadline_ctx.set(Deadline(0.05))
+    try:
+        with pytest.raises(DeadlineExceeded):
+            await wrapped.get_pet_pet_id_get(1, _headers=pet_service_request_headers())
+    finally:
+        current_deadline_ctx.reset(token)
+    # the caller ran out of time, the pet service is not to blame
+    assert wrapped.breaker.state == CircuitBreaker.CLOSED
+
+
+@pytest.fixture(name="session")
+def session_fixture():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        user = UserTableObject(name="Jane Doe")
+        session.add(user)
+        session.commit()
+        assert user.id is not None
+        session.add(UserPetTableObject(user_id=user.id, pet_id=7))
+        session.commit()
+        yield session
+    SQLModel.metadata.drop_all(engine)
+
+
+def adoptions(session: Session) -> int:
+    return len(session.exec(select(UserPetTableObject)).all())
+
+
+@pytest.mark.asyncio
+async def test_unavailable_pet_service_keeps_adoptions(session: Session):
+    api = resilient(FakeApi(*[api_error(503)] * 3), retries=2)
+    with pytest.raises(HTTPException) as info:
+        await UserService.get_pet_from_pet_service(7, session, api)  # type: ignore
+    assert info.value.status_code == 503
+    assert adoptions(session) == 1
+
+
+@pytest.mark.asyncio
+async def test_deleted_pet_removes_adoptions(session: Session):
+    with pytest.raises(HTTPException) as info:
+        await UserService.get_pet_from_pet_service(7, session, FakeApi(api_error(404)))  # type: ignore
+    assert info.value.status_code == 404
+    assert adoptions(session) == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "error", [DeadlineExceeded(), HTTPException(503, "pet service unavailable")]
+)
+async def test_create_user_keeps_deadline_and_http_errors(monkeypatch, session: Session, error):
+    async def cast_user_to_response(*args):
+        raise error
+
+    monkeypatch.setattr(UserService, "cast_user_to_response", cast_user_to_response)
+    with pytest.raises(type(error)) as info:
+        await UserService.create_user(UserCreateObject(name="John Doe"), session, FakeApi())  # type: ignore
+    assert info.value is error